@@ -1,10 +1,26 @@
-import base64
-import urllib.request
-import urllib.error
+import contextlib
+import itertools
+import os
+import sqlite3
+import threading
+import time
 import json
-import urllib.parse
 import argparse
 import getpass
+import hashlib
+import subprocess
+import sys
+
+from csp_export import (
+    COMPRESSED_SUFFIXES, ColumnarExporter, CspDataWriter, export_format, iter_records, open_export, split_extension,
+)
+from csp_index import build_index, index_path_for
+from csp_offers import OFFERS_ENDPOINT, OfferCatalog
+from hybr_client import (
+    AZURE_RESERVATION_PRODUCT_TYPES, DEFAULT_PAGE_SIZE, MS_CSP_APIS, NCE_PRODUCT_TYPES, PAGED_ENDPOINTS,
+    REPORT_APIS, SOFTWARE_PRODUCT_TYPES, Flow, HybrClient, Step, endpoint_name, get_endpoint, json_loads,
+    ordered_map,
+)
 
 # --------------------------------
 # 🔧 CONFIGURATION
@@ -13,75 +29,82 @@ parser = argparse.ArgumentParser()
 parser.add_argument('--base-url', help='Base URL for the API')
 parser.add_argument('--app-id', help='Application ID')
 parser.add_argument('--username', help='Username')
-parser.add_argument('--password', help='Password')
+parser.add_argument('--password', help='Password (default: $HYBR_PASSWORD, else prompt)')
 parser.add_argument('--tenant-subscription-id', help='Default tenant subscription ID')
 parser.add_argument('--customer-id', help='Default customer ID')
+parser.add_argument('--workers', type=int, default=1, help='Threads for collection: companies are collected this many at a time, and their profile, license, offer and page requests share these threads (default: 1)')
+parser.add_argument('--pool-size', type=int, help='Keep-alive connections kept per host (default: --workers)')
+parser.add_argument('--timeout', type=float, default=60, help='Per-request timeout in seconds (default: 60)')
+parser.add_argument('--max-retries', type=int, default=4, help='Retries for throttled (429), 5xx and failed requests (default: 4)')
+parser.add_argument('--rate-limit', type=float, help='Maximum requests per second across all workers')
+parser.add_argument('--page-size', type=int, help='Page through paged endpoints (licenses, offers) with this page size')
+parser.add_argument('--output', default='csp_data.json', help='Output file for collected CSP data; .gz/.zst compresses it (default: csp_data.json)')
+parser.add_argument('--resume', action='store_true', help='Reuse companies already collected by an interrupted or failed run')
+parser.add_argument('--checkpoint', help='Checkpoint database for --resume (default: <output>.checkpoint.db)')
+parser.add_argument('--incremental', action='store_true', help='Only re-fetch companies whose data in the previous export is older than --ttl')
+parser.add_argument('--previous', help='Previous export for --incremental (default: --output)')
+parser.add_argument('--ttl', type=float, default=24, help='Hours before a company from the previous export is re-fetched (default: 24)')
+parser.add_argument('--delta', help='Delta file written by --incremental (default: the output name with .delta.jsonl as its extension, e.g. csp_data.delta.jsonl)')
+parser.add_argument('--cache-size', type=int, default=256, help='Cached reference responses kept in memory (0 disables the cache, default: 256)')
+parser.add_argument('--cache-file', help='SQLite file backing the response cache, shared between runs')
+parser.add_argument('--batch', help='Run the API jobs in this JSON/YAML job file without prompts, then exit')
+parser.add_argument('--batch-output', help='Result file for --batch (default: the job file\'s "output", or batch_results.jsonl)')
+parser.add_argument('--report-matrix', help='Comma-separated report endpoints (or "all") to fetch for every month/currency, then exit')
+parser.add_argument('--months', help='Month range for --report-matrix as YYYY-MM:YYYY-MM (default: the last 12 months)')
+parser.add_argument('--currencies', help='Comma-separated currencies for --report-matrix (default: availableCurrencySymbols per month)')
+parser.add_argument('--parent-subscription-ids', help='Comma-separated parentSubscriptionId values to add to the --report-matrix grid')
+parser.add_argument('--number-of-items', type=int, default=10, help='numberOfItems for top-N reports in --report-matrix (default: 10)')
+parser.add_argument('--report-output', default='report_matrix.json', help='Output file for --report-matrix (default: report_matrix.json)')
+parser.add_argument('--export-dir', help='Also stream collected data into typed companies/licenses/offers tables in this directory')
+parser.add_argument('--export-format', choices=['csv', 'parquet'], default='csv', help='Table format for --export-dir (default: csv, parquet needs pyarrow)')
+parser.add_argument('--output-format', choices=['json', 'jsonl'], help='Output format: streamed JSON array or JSON Lines (default: from --output extension)')
+parser.add_argument('--metrics-output', help='Write per-endpoint request metrics after a collection, batch or report-matrix run (.prom for Prometheus text, otherwise JSON)')
+# Set by --processes for its shard processes: keep raw latency samples in the metrics file so they can be merged
+parser.add_argument('--metrics-samples', action='store_true', help=argparse.SUPPRESS)
+parser.add_argument('--build-index', action='store_true', help='After collection, build a lookup index next to the output (see csp_index.py)')
+parser.add_argument('--offer-index', action='store_true', help='Answer the offers browser from a local per-tenant offer index instead of a call per filter')
+parser.add_argument('--offer-refresh', type=float, default=3600, help='Seconds before a tenant\'s offer index is rebuilt (default: 3600)')
+parser.add_argument('--collect', action='store_true', help='Collect CSP data for all mapped companies without prompts, then exit')
+parser.add_argument('--shards', type=int, help='Split collection into this many shards (default: 1, or --processes)')
+parser.add_argument('--shard-index', type=int, help='Collect only this shard (0-based) of --shards into <output>.shard-<i>-of-<n>, e.g. one per machine')
+parser.add_argument('--shard-by', choices=['hash', 'connection'], default='hash', help='Shard by a hash of the tenant subscription ID or by CspPartnerConnectionId (default: hash)')
+parser.add_argument('--connection-ids', help='Comma-separated partner connection IDs for --shard-by connection')
+parser.add_argument('--processes', type=int, help='Collect every shard in up to this many local processes, then merge them into --output')
+parser.add_argument('--merge', nargs='+', metavar='SHARD_OUTPUT', help='Merge shard outputs into --output, then exit')
 args = parser.parse_args()
-
-BASE_URL = args.base_url if args.base_url else input("Enter base URL (e.g. https://portal.hybr.cloudassert.com): ").strip()
-APP_ID = args.app_id if args.app_id else input("Enter application ID: ").strip()
-USERNAME = args.username if args.username else input("Enter username: ").strip()
-PASSWORD = args.password if args.password else getpass.getpass("Enter password: ").strip()
+args.shards = args.shards or args.processes or 1
+if args.shard_index is not None and not 0 <= args.shard_index < args.shards:
+    parser.error(f"--shard-index must be between 0 and {args.shards - 1}")
+if args.shard_by == 'connection' and args.shards > 1 and not args.connection_ids:
+    parser.error("--shard-by connection needs --connection-ids")
+if args.build_index and args.output.endswith(COMPRESSED_SUFFIXES):
+    parser.error("--build-index needs an uncompressed --output (compressed exports cannot be memory-mapped)")
+
+if args.merge:
+    # Merging shard outputs is offline, so no portal details are needed
+    BASE_URL = APP_ID = USERNAME = PASSWORD = ""
+else:
+    BASE_URL = args.base_url if args.base_url else input("Enter base URL (e.g. https://portal.hybr.cloudassert.com): ").strip()
+    APP_ID = args.app_id if args.app_id else input("Enter application ID: ").strip()
+    USERNAME = args.username if args.username else input("Enter username: ").strip()
+    PASSWORD = args.password or os.environ.get("HYBR_PASSWORD") or getpass.getpass("Enter password: ").strip()
 
 DEFAULT_TENANT_SUB_ID = getattr(args, 'tenant_subscription_id', None)
 DEFAULT_CUSTOMER_ID = getattr(args, 'customer_id', None)
 remembered_values = {}
 
-# -------------------------
-# Reference product types
-# -------------------------
-SOFTWARE_PRODUCT_TYPES = ["Software Subscription", "SUSE Linux", "Perpetual Software", "Red Hat Plans"]
-NCE_PRODUCT_TYPES = ["License", "OnlineServicesNCE"]
-AZURE_RESERVATION_PRODUCT_TYPES = ["Azure Reservation"]
-
-NCE_CATEGORIES = [
-    "Microsoft Entra","Dynamics 365","Enterprise","Exchange","Microsoft 365","Microsoft Defender",
-    "Microsoft Intune","Microsoft Teams","Office 365","OneDrive","Power Apps","Power Automate",
-    "Power BI","Project","Share Point","Visio","Windows","Others"
-]
-
-OFFER_CATEGORIES = ["Small business","Enterprise","Trial","Government","None"]
-OFFER_TYPE = ["Baseoffer","Addon"]
-OFFER_SEGMENTS = ["Commercial","GovernmentCommunityCloud","Education","Nonprofit"]
-AZURE_RESERVATION_TYPES = [
-    "App Services","Specialized Compute Azure VMware Solution","Azure Data Explorer","Azure Files Reserved Capacity",
-    "Backup","Azure storage reserved capacity","Azure Cosmos DB","Databricks","Data Factory","Dedicated Host",
-    "FabricCapacity","Azure Managed Disks","MDC","Azure Database for MySql","Nutanix","OpenAIPTU",
-    "Azure Database for PostgreSql","Azure Redis Cache - Premium","SapHana","Sql Databases",
-    "Azure Sql Data Warehouse","Synapse","Virtual Machines"
-]
+client = HybrClient(
+    BASE_URL, APP_ID, USERNAME, PASSWORD,
+    pool_size=args.pool_size or args.workers, workers=args.workers, timeout=args.timeout,
+    max_retries=args.max_retries, rate_limit=args.rate_limit,
+    # With --processes only the shard processes send requests, each with its own cache file
+    cache_size=args.cache_size, cache_file=None if args.processes else args.cache_file,
+)
+make_request = client.make_request
+build_url = client.build_url
+offer_catalog = OfferCatalog(client, args.offer_refresh, page_size=args.page_size or DEFAULT_PAGE_SIZE)
 
 # ======== HELPER FUNCTIONS =========
-def make_request(url, method="GET", params=None):
-    auth_string = f"{USERNAME}:{PASSWORD}"
-    auth_b64 = base64.b64encode(auth_string.encode()).decode()
-    headers = {"Authorization": f"Basic {auth_b64}", "Content-Type": "application/json"}
-
-    if params:
-        url += "?" + urllib.parse.urlencode(params)
-
-    req = urllib.request.Request(url, headers=headers, method=method)
-    try:
-        with urllib.request.urlopen(req) as res:
-            data = res.read().decode("utf-8")
-            try:
-                return json.loads(data)
-            except json.JSONDecodeError:
-                return data
-    except urllib.error.HTTPError as e:
-        print(f"❌ HTTP Error {e.code}: {e.reason}")
-        print(e.read().decode())
-    except urllib.error.URLError as e:
-        print(f"❌ URL Error: {e.reason}")
-    return None
-
-def build_url(path, inputs=None):
-    if inputs is None:
-        inputs = {}
-    all_inputs = {"appId": APP_ID, **inputs}
-    path = path.replace("{{", "{").replace("}}", "}")
-    return f"{BASE_URL}{path.format(**all_inputs)}"
-
 def prompt_optional_params(param_names, reference_dict=None, product_type=None):
     params = {}
     for name in param_names:
@@ -98,6 +121,189 @@ def prompt_optional_params(param_names, reference_dict=None, product_type=None):
             params[name] = val
     return params
 
+def report_metrics():
+    """Print the per-endpoint request summary and export it if --metrics-output is set."""
+    client.metrics.print_summary()
+    if args.metrics_output:
+        client.metrics.write(args.metrics_output, samples=args.metrics_samples)
+        print(f"   Request metrics written to {args.metrics_output}")
+
+def fetch_result_set(url, path, params=None):
+    """Fetch a full result set: page by page when --page-size is set and the endpoint is paged, else in one call."""
+    spec = PAGED_ENDPOINTS.get(path)
+    if spec and args.page_size:
+        return client.fetch_all_pages(url, spec, params, args.page_size)
+    return make_request(url, params=params)
+
+def output_format_for(output_file):
+    """--output-format, else the format implied by the final output's extension."""
+    return args.output_format or export_format(output_file)
+
+class CheckpointStore:
+    """SQLite journal of which tenant subscriptions have been collected.
+
+    Each company is recorded as ``done`` (with its full record), ``failed``
+    or ``skipped`` (nothing to collect) as soon as it finishes, so an
+    interrupted run can be resumed without re-fetching the companies that
+    already completed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS companies ("
+            "subscription_id TEXT PRIMARY KEY, status TEXT NOT NULL, record TEXT, updated_at REAL NOT NULL, fetched_at REAL)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(companies)")]
+        if "fetched_at" not in columns:
+            self._conn.execute("ALTER TABLE companies ADD COLUMN fetched_at REAL")
+        self._conn.commit()
+
+    def get(self, subscription_id):
+        """Return ``(record, fetched_at)`` of a completed company, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT record, COALESCE(fetched_at, updated_at) FROM companies WHERE subscription_id = ? AND status = 'done'",
+                (subscription_id,),
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def status(self, subscription_id):
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM companies WHERE subscription_id = ?", (subscription_id,)).fetchone()
+        return row[0] if row else None
+
+    def _save(self, subscription_id, status, record, fetched_at=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO companies (subscription_id, status, record, updated_at, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (subscription_id, status, record, time.time(), fetched_at),
+            )
+            self._conn.commit()
+
+    def mark_done(self, subscription_id, record, fetched_at):
+        self._save(subscription_id, "done", json.dumps(record), fetched_at)
+
+    def mark_failed(self, subscription_id):
+        self._save(subscription_id, "failed", None)
+
+    def mark_skipped(self, subscription_id):
+        self._save(subscription_id, "skipped", None)
+
+    def counts(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM companies GROUP BY status").fetchall())
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM companies")
+            self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+def is_complete(company_data):
+    """True if a company record has its profile, licenses and every offers page."""
+    return bool(
+        company_data
+        and company_data["customer_profile"]
+        and company_data["licenses"] is not None
+        and all(entry["offers"] is not None for entry in company_data["offers"])
+    )
+
+def read_records(path):
+    """Load the records of a csp_data export written as a JSON array or JSON Lines, optionally compressed."""
+    with open_export(path) as f:
+        if export_format(path) == "jsonl":
+            return [json_loads(line) for line in f if line.strip()]
+        return json_loads(f.read())
+
+def customer_id_of(company_data):
+    profile = company_data.get("customer_profile")
+    return profile[0].get("Id") if profile else None
+
+def licenses_of(company_data):
+    licenses = company_data.get("licenses")
+    if not isinstance(licenses, dict):
+        return []
+    return licenses.get("Licenses") or []
+
+class PreviousExport:
+    """A previous csp_data export indexed by company id, CustomerId (``customer_profile[0].Id``) and license id.
+
+    The CustomerId index lets a customer whose company was re-mapped under a
+    new tenant subscription ID be diffed against its old record.
+
+    Fetch times come from the ``<export>.fetched.json`` sidecar written by
+    collect_csp_data, falling back to the export's modification time.
+    """
+
+    def __init__(self, path, keep=None):
+        self.path = path
+        self.records = {}        # company.id -> record
+        self.licenses = {}       # company.id -> {LicenseId: license}
+        self.by_customer = {}    # customer_profile[0].Id -> company.id
+        for record in read_records(path):
+            if keep is not None and not keep(record):
+                continue
+            company_id = record["company"].get("id")
+            self.records[company_id] = record
+            self.licenses[company_id] = {lic.get("LicenseId"): lic for lic in licenses_of(record)}
+            if customer_id_of(record):
+                self.by_customer[customer_id_of(record)] = company_id
+
+        exported_at = os.path.getmtime(path)
+        self.fetched_at = dict.fromkeys(self.records, exported_at)
+        fetched_file = fetched_times_path(path)
+        if os.path.exists(fetched_file):
+            with open(fetched_file) as f:
+                self.fetched_at.update((k, v) for k, v in json.load(f).items() if k in self.records)
+
+    def match(self, company_id, customer_id, mapped_ids):
+        """Company id of the previous record for a collected company: the same company id, else
+        the same customer under a company id that is no longer mapped; None if it is new."""
+        if company_id in self.records:
+            return company_id
+        old_id = self.by_customer.get(customer_id)
+        return old_id if old_id is not None and old_id not in mapped_ids else None
+
+    def is_fresh(self, company_id, ttl_seconds):
+        fetched_at = self.fetched_at.get(company_id)
+        return fetched_at is not None and time.time() - fetched_at < ttl_seconds
+
+def fetched_times_path(output_file):
+    return f"{output_file}.fetched.json"
+
+def diff_company(previous, company_id, company_data, old_id):
+    """Return the delta entry for a re-fetched company, or None if nothing changed.
+
+    ``old_id`` is the company id of its previous record (see ``PreviousExport.match``).
+    """
+    old = previous.records.get(old_id)
+    entry = {"company_id": company_id, "customer_id": customer_id_of(company_data)}
+    if old is None:
+        return {"op": "add", **entry, "record": company_data}
+    if old == company_data:
+        return None
+    if old_id != company_id:
+        entry["previous_company_id"] = old_id
+
+    old_licenses = previous.licenses[old_id]
+    new_licenses = {lic.get("LicenseId"): lic for lic in licenses_of(company_data)}
+    return {
+        "op": "update",
+        **entry,
+        "changed": [key for key in ("company", "customer_profile", "licenses", "offers") if old.get(key) != company_data.get(key)],
+        "licenses": {
+            "added": [lic for lic_id, lic in new_licenses.items() if lic_id not in old_licenses],
+            "removed": [lic_id for lic_id in old_licenses if lic_id not in new_licenses],
+            "changed": [lic for lic_id, lic in new_licenses.items() if lic_id in old_licenses and old_licenses[lic_id] != lic],
+        },
+        "record": company_data,
+    }
+
 def print_context():
     print("\n📌 Current Context:")
     for k, v in remembered_values.items():
@@ -162,94 +368,362 @@ def initialize_subscription_context():
 
     print("\n✅ Subscription Context Initialized Successfully.\n")
 
+def fetch_customer_profile(tenant_subscription_id):
+    customer_profile_url = build_url(
+        "/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspCustomerProfileBySubscriptionId/{{tenant_subscription_id}}",
+        {"tenant_subscription_id": tenant_subscription_id}
+    )
+    return make_request(customer_profile_url)
+
+def profile_customer_id(customer_profile):
+    return customer_profile[0].get("Id") if customer_profile else None
+
+def fetch_customer_licenses(customer_id):
+    licenses_path = "/api/integrations/{{appId}}/admin/service/billing/csp/licenses/getCustomerLicenses/{{customer_id}}"
+    licenses_url = build_url(licenses_path, {"customer_id": customer_id})
+    return fetch_result_set(licenses_url, licenses_path)
+
+def fetch_customer_offers(tenant_subscription_id, customer_id):
+    # Product types and categories (cspProductTypes/getCspCategories) are not fetched. The call
+    # sends no productTypes filter, so it returns the offers of every product type; they are
+    # stored under "OnlineServicesNCE" as the export always has.
+    offers_path = "/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspOffersBySubscriptionIdFromDb/{{tenant_subscription_id}}/{{customer_id}}"
+    offers_url = build_url(offers_path, {"tenant_subscription_id": tenant_subscription_id, "customer_id": customer_id})
+    return fetch_result_set(offers_url, offers_path)
+
+# Each step names the fields it needs: the profile needs the tenant subscription,
+# licenses and offers only need its customer Id, so those two run concurrently.
+COMPANY_FLOW = Flow([
+    Step("customer_profile", fetch_customer_profile, needs=["tenant_subscription_id"]),
+    Step("customer_id", profile_customer_id, needs=["customer_profile"]),
+    Step("licenses", fetch_customer_licenses, needs=["customer_id"]),
+    Step("offers", fetch_customer_offers, needs=["tenant_subscription_id", "customer_id"]),
+])
+
+SKIPPED = object()
+
+def collect_company_data(company):
+    """Fetch the profile, then licenses and offers concurrently, for one mapped company.
+
+    Returns the company record, None if its profile could not be fetched, or
+    SKIPPED if there is nothing to collect (no TenantSubscriptionId, or a
+    profile without a CustomerId).
+    """
+    tenant_subscription_id = company.get("id")
+
+    if not tenant_subscription_id:
+        print(f"❌ Skipping company {company.get('Name', 'Unnamed')} due to missing TenantSubscriptionId.")
+        return SKIPPED
+
+    fields = COMPANY_FLOW.run(tenant_subscription_id=tenant_subscription_id)
+    if fields["customer_profile"] is None:
+        print(f"❌ Failed to fetch the profile of company {company.get('Name', 'Unnamed')}.")
+        return None
+    if not fields["customer_id"]:
+        print(f"❌ Skipping company {company.get('Name', 'Unnamed')} due to missing CustomerId.")
+        return SKIPPED
+
+    return {
+        "company": company,
+        "customer_profile": fields["customer_profile"],
+        "licenses": fields["licenses"],
+        "offers": [{"product_type": "OnlineServicesNCE", "offers": fields["offers"]}],
+    }
+
 def collect_csp_data():
     print("\n🔹 Collecting CSP Data for All Mapped Companies...")
 
-    # Step 1: Get all CSP mapped companies
-    mapped_companies_url = build_url("/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspMappedCompanies")
-    mapped_companies = make_request(mapped_companies_url)
-
-    if not mapped_companies or not isinstance(mapped_companies, list):
+    # Step 1: Get all CSP mapped companies (only this shard's, when sharded)
+    mapped_companies = fetch_mapped_companies()
+    if not isinstance(mapped_companies, list) or not (mapped_companies or args.shard_index is not None):
         print("❌ No mapped companies found or API error.")
         return
+    if args.shard_index is not None:
+        print(f"   Shard {args.shard_index + 1}/{args.shards}: {len(mapped_companies)} companies.")
 
-    all_data = []
+    workers = max(1, args.workers or 1)
+    if workers > 1:
+        print(f"   Using {workers} concurrent workers.")
 
-    for company in mapped_companies:
-        company_data = {"company": company, "customer_profile": None, "licenses": None, "offers": []}
-        tenant_subscription_id = company.get("id")
-
-        if not tenant_subscription_id:
-            print(f"❌ Skipping company {company.get('Name', 'Unnamed')} due to missing TenantSubscriptionId.")
-            continue
-
-        # Step 2: Get customer profile by subscription ID
-        customer_profile_url = build_url(
-            "/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspCustomerProfileBySubscriptionId/{{tenant_subscription_id}}",
-            {"tenant_subscription_id": tenant_subscription_id}
-        )
-        customer_profile = make_request(customer_profile_url)
-        company_data["customer_profile"] = customer_profile
+    exporter = None
+    if args.export_dir:
+        try:
+            exporter = ColumnarExporter(args.export_dir, args.export_format)
+        except ImportError as e:
+            print(f"❌ {e}")
+            return
 
-        customer_id = customer_profile[0].get("Id") if customer_profile else None
-        if not customer_id:
-            print(f"❌ Skipping company {company.get('Name', 'Unnamed')} due to missing CustomerId.")
-            continue
+    output_file = args.output if args.shard_index is None else shard_output_path(args.output, args.shard_index, args.shards)
+    checkpoint = CheckpointStore(args.checkpoint or f"{output_file}.checkpoint.db")
+    if args.resume:
+        print(f"   Resuming: {checkpoint.counts().get('done', 0)} companies already collected.")
+    else:
+        checkpoint.clear()
+
+    previous = None
+    if args.incremental:
+        previous_file = args.previous or output_file
+        if args.shard_index is not None and not args.previous and not os.path.exists(previous_file):
+            # First sharded run after an unsharded one: take this shard's companies from the full export
+            previous_file = args.output
+        if os.path.exists(previous_file):
+            previous = PreviousExport(previous_file, keep=in_shard if args.shard_index is not None else None)
+            print(f"   Incremental: {len(previous.records)} companies in {previous_file}, re-fetching those older than {args.ttl}h.")
+        else:
+            print(f"   Incremental: no previous export at {previous_file}, collecting everything.")
 
-        # Step 3: Get customer licenses by CSP customer ID
-        licenses_url = build_url(
-            "/api/integrations/{{appId}}/admin/service/billing/csp/licenses/getCustomerLicenses/{{customer_id}}",
-            {"customer_id": customer_id}
-        )
-        licenses = make_request(licenses_url)
-        company_data["licenses"] = licenses
-
-        # Step 4: Get product types and categories
-        # product_types_url = build_url(
-        #     "/api/integrations/{{appId}}/admin/service/billing/csp/companies/cspProductTypes/{{tenant_subscription_id}}",
-        #     {"tenant_subscription_id": tenant_subscription_id}
-        # )
-        # product_types = make_request(product_types_url)
-
-        # push OnlineServicesNCE to product_types
-        # if product_types and isinstance(product_types, list):
-        #     if "OnlineServicesNCE" not in product_types:
-        #         product_types.append("OnlineServicesNCE")
-
-        # categories_url = build_url(
-        #     "/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspCategories/{{tenant_subscription_id}}",
-        #     {"tenant_subscription_id": tenant_subscription_id}
-        # )
-        # categories = make_request(categories_url)
-
-        # Step 5: Get CSP offers for each product type and category
-       
-        offers_url = build_url(
-            "/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspOffersBySubscriptionIdFromDb/{{tenant_subscription_id}}/{{customer_id}}",
-            {
-                "tenant_subscription_id": tenant_subscription_id,
-                "customer_id": customer_id,
-                "productTypes": "OnlineServicesNCE",
-            }
-        )
-        offers = make_request(offers_url)
-        company_data["offers"].append({
-            "product_type": "OnlineServicesNCE",
-            "offers": offers
-        })
+    def collect_with_checkpoint(company):
+        """Return ``(record, fetched_at)``; the record is None for a skipped or failed company."""
+        tenant_subscription_id = company.get("id")
+        if previous is not None and previous.is_fresh(tenant_subscription_id, args.ttl * 3600):
+            return previous.records[tenant_subscription_id], previous.fetched_at[tenant_subscription_id]
+        if args.resume and tenant_subscription_id:
+            stored = checkpoint.get(tenant_subscription_id)
+            if stored is not None:
+                return stored
+            if checkpoint.status(tenant_subscription_id) == "skipped":
+                return None, None
+
+        company_data = collect_company_data(company)
+        fetched = time.time()
+        if company_data is SKIPPED:
+            if tenant_subscription_id:
+                checkpoint.mark_skipped(tenant_subscription_id)
+            return None, None
+        if tenant_subscription_id:
+            if is_complete(company_data):
+                checkpoint.mark_done(tenant_subscription_id, company_data, fetched)
+            else:
+                checkpoint.mark_failed(tenant_subscription_id)
+                if previous is not None and tenant_subscription_id in previous.records:
+                    # Keep the last good record; it stays stale and is retried on the next run
+                    return previous.records[tenant_subscription_id], previous.fetched_at[tenant_subscription_id]
+        return company_data, fetched
+
+    # Step 6: Write each company record as soon as it is collected. The writers fill a .partial file
+    # and only replace the output (which may be the previous export) once everything was written.
+    delta = None
+    if previous is not None:
+        delta_file = args.delta or f"{split_extension(output_file)[0]}.delta.jsonl"
+        delta = CspDataWriter(delta_file, "jsonl")
+    fetched_at = {}
+    mapped_ids = {company.get("id") for company in mapped_companies}
+    matched = set()  # previous company ids that a collected company was diffed against
+
+    with CspDataWriter(output_file, output_format_for(output_file)) as writer, delta or contextlib.nullcontext():
+        for company_data, fetched in ordered_map(collect_with_checkpoint, mapped_companies, workers):
+            if company_data is None:
+                continue
+            writer.write(company_data)
+            if exporter is not None:
+                exporter.add(company_data)
 
-        all_data.append(company_data)
+            company_id = company_data["company"].get("id")
+            fetched_at[company_id] = fetched
+            if previous is not None and company_data is previous.records.get(company_id):
+                continue
+            if delta is not None:
+                old_id = previous.match(company_id, customer_id_of(company_data), mapped_ids)
+                matched.add(old_id)
+                entry = diff_company(previous, company_id, company_data, old_id)
+                if entry:
+                    delta.write(entry)
+
+        not_collected = []
+        if delta is not None:
+            # Only companies that are no longer mapped are removed; a still-mapped company that was
+            # skipped or failed this run is not a deletion, nor is a customer re-mapped under a new company id
+            for company_id in previous.records.keys() - fetched_at.keys() - matched:
+                if company_id in mapped_ids:
+                    not_collected.append(company_id)
+                else:
+                    delta.write({"op": "remove", "company_id": company_id, "customer_id": customer_id_of(previous.records[company_id])})
+
+    if delta is not None:
+        print(f"   Delta: {delta.count} changed companies written to {delta.path}")
+    if not_collected:
+        print(f"⚠️ {len(not_collected)} still-mapped companies from {previous.path} were skipped or failed and are "
+              f"left out of this export and the delta: {', '.join(sorted(not_collected))}")
+
+    with open(fetched_times_path(output_file), "w") as f:
+        json.dump(fetched_at, f)
+
+    if args.build_index:
+        build_index(output_file)
+        print(f"   Lookup index written to {index_path_for(output_file)}")
+
+    if exporter is not None:
+        exporter.close()
+        print(f"   Columnar tables written to {args.export_dir}")
+
+    counts = checkpoint.counts()
+    failed = counts.get("failed", 0)
+    checkpoint.close()
+    if counts.get("skipped"):
+        print(f"   {counts['skipped']} companies skipped: nothing to collect.")
+    # Skipped companies are complete: re-running would skip them again
+    if failed:
+        print(f"\n⚠️ {failed} companies were incomplete. Re-run with --resume to fetch only those.")
+    else:
+        os.remove(checkpoint.path)
+
+    report_metrics()
+    print(f"\n✅ CSP Data collected successfully. Output written to {output_file}")
 
-    # Step 6: Write the collected data to a JSON file
-    output_file = "csp_data.json"
-    with open(output_file, "w") as f:
-        json.dump(all_data, f, indent=2)
+# ========== SHARDED COLLECTION ==========
+def shard_for(tenant_subscription_id):
+    """Stable shard number of a tenant subscription ID, the same on every machine and run."""
+    digest = hashlib.sha1(str(tenant_subscription_id).encode()).digest()
+    return int.from_bytes(digest[:8], "big") % args.shards
+
+def shard_connections():
+    """The partner connection IDs collected by this shard."""
+    connection_ids = [c.strip() for c in args.connection_ids.split(",") if c.strip()]
+    return connection_ids[args.shard_index::args.shards]
+
+def shard_output_path(output_file, index, shards):
+    root, ext = split_extension(output_file)
+    return f"{root}.shard-{index}-of-{shards}{ext}"
+
+def in_shard(company_data):
+    """True if a company record belongs to the shard this process collects."""
+    if args.shard_index is None:
+        return True
+    if args.shard_by == "connection":
+        profile = company_data.get("customer_profile")
+        return bool(profile) and profile[0].get("CspPartnerConnectionId") in shard_connections()
+    return shard_for(company_data["company"].get("id")) == args.shard_index
+
+def fetch_mapped_companies():
+    """Mapped companies to collect: all of them, or only this shard's when --shard-index is set."""
+    url = build_url("/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspMappedCompanies")
+    if args.shard_index is None:
+        return make_request(url)
+    if args.shard_by == "connection":
+        companies = []
+        for connection_id in shard_connections():
+            connection_companies = make_request(url, params={"connectionId": connection_id})
+            if not isinstance(connection_companies, list):
+                return None
+            companies.extend(connection_companies)
+        return companies
+    companies = make_request(url)
+    if not isinstance(companies, list):
+        return None
+    return [company for company in companies if shard_for(company.get("id")) == args.shard_index]
+
+def merge_outputs(parts, output_file):
+    """Combine shard outputs and their fetch-time sidecars into one export; the first copy of a company wins."""
+    exporter = None
+    if args.export_dir:
+        try:
+            exporter = ColumnarExporter(args.export_dir, args.export_format)
+        except ImportError as e:
+            print(f"❌ {e}")
+            return False
+
+    seen, fetched_at = set(), {}
+    with CspDataWriter(output_file, output_format_for(output_file)) as writer:
+        for part in parts:
+            if not os.path.exists(part):
+                print(f"⚠️ Shard output {part} not found, skipping.")
+                continue
+            for record in iter_records(part):
+                company_id = record["company"].get("id")
+                if company_id in seen:
+                    continue
+                seen.add(company_id)
+                writer.write(record)
+                if exporter is not None:
+                    exporter.add(record)
+            if os.path.exists(fetched_times_path(part)):
+                with open(fetched_times_path(part)) as f:
+                    fetched_at.update((k, v) for k, v in json.load(f).items() if k in seen)
+    with open(fetched_times_path(output_file), "w") as f:
+        json.dump(fetched_at, f)
+    print(f"\n✅ Merged {writer.count} companies from {len(parts)} shard outputs into {output_file}")
+
+    if exporter is not None:
+        exporter.close()
+        print(f"   Columnar tables written to {args.export_dir}")
+    if args.build_index:
+        build_index(output_file)
+        print(f"   Lookup index written to {index_path_for(output_file)}")
+    return True
+
+def run_sharded_collection():
+    """Collect every shard in its own process of this script, then merge the shard outputs.
+
+    Files named on the command line (cache, checkpoint, delta, metrics) get a
+    per-shard name like the output, so concurrent shards never share one.
+    """
+    shards, processes = args.shards, max(1, args.processes)
+    print(f"\n🔹 Collecting {shards} shards (by {args.shard_by}) in up to {processes} processes...")
+
+    command = [
+        sys.executable, os.path.abspath(__file__), "--collect", "--base-url", BASE_URL, "--app-id", APP_ID,
+        "--username", USERNAME, "--output", args.output, "--shards", str(shards), "--shard-by", args.shard_by,
+    ]
+    options = {
+        "--workers": args.workers, "--pool-size": args.pool_size, "--timeout": args.timeout,
+        "--max-retries": args.max_retries, "--page-size": args.page_size, "--cache-size": args.cache_size,
+        "--ttl": args.ttl, "--output-format": args.output_format, "--connection-ids": args.connection_ids,
+        "--tenant-subscription-id": DEFAULT_TENANT_SUB_ID, "--customer-id": DEFAULT_CUSTOMER_ID,
+        # The rate limit is for the whole run, so split it between the processes running at once
+        "--rate-limit": args.rate_limit / processes if args.rate_limit else None,
+    }
+    for name, value in options.items():
+        if value is not None:
+            command += [name, str(value)]
+    for name, enabled in (("--resume", args.resume), ("--incremental", args.incremental)):
+        if enabled:
+            command.append(name)
+    if args.incremental and args.previous:
+        command += ["--previous", args.previous]
+    # Pass the password through the environment rather than the (visible) command line
+    env = {**os.environ, "HYBR_PASSWORD": PASSWORD}
+
+    if args.metrics_output:
+        command.append("--metrics-samples")
+    # Shards always write JSON metrics (with raw samples) so they can be merged into --metrics-output
+    metrics_file = f"{split_extension(args.metrics_output)[0]}.json" if args.metrics_output else None
+    delta_file = args.delta if args.incremental else None
+
+    def shard_files(index):
+        """Per-shard names for the files given on the command line, as ``{option: path}``."""
+        files = {"--cache-file": args.cache_file, "--checkpoint": args.checkpoint, "--delta": delta_file,
+                 "--metrics-output": metrics_file}
+        return {name: shard_output_path(path, index, shards) for name, path in files.items() if path}
+
+    def run_shard(index):
+        shard_args = [arg for name, path in shard_files(index).items() for arg in (name, path)]
+        return index, subprocess.run(command + shard_args + ["--shard-index", str(index)], env=env).returncode
+
+    failed = [index for index, code in ordered_map(run_shard, range(shards), processes) if code != 0]
+    if failed:
+        print(f"\n❌ Shards {', '.join(map(str, failed))} failed; fix the cause and re-run with --resume.")
+        return
 
-    print(f"\n✅ CSP Data collected successfully. Output written to {output_file}")
+    parts = [shard_output_path(args.output, index, shards) for index in range(shards)]
+    if not merge_outputs(parts, args.output):
+        return
+    if args.incremental:
+        delta_file = args.delta or f"{split_extension(args.output)[0]}.delta.jsonl"
+        with open(delta_file, "w") as out:
+            for index, part in enumerate(parts):
+                shard_delta = shard_files(index).get("--delta") or f"{split_extension(part)[0]}.delta.jsonl"
+                if os.path.exists(shard_delta):
+                    with open(shard_delta) as f:
+                        out.writelines(f)
+        print(f"   Delta written to {delta_file}")
+    if args.metrics_output:
+        for index in range(shards):
+            with open(shard_files(index)["--metrics-output"]) as f:
+                client.metrics.merge(json.load(f))
+        report_metrics()
 
 # ========== EXECUTE API ==========
 def execute_api(api):
-    import urllib.parse
     print(f"\n➡️  Executing API: {api['name']}")
     print_context()
 
@@ -257,10 +731,11 @@ def execute_api(api):
         print("\nReference product types:\n", SOFTWARE_PRODUCT_TYPES + NCE_PRODUCT_TYPES + AZURE_RESERVATION_PRODUCT_TYPES)
         print("\n")
 
+    inputs = {}
     while True:
         # --- Collect required inputs ---
         for inp_name, inp_key in api.get("required_inputs", []):
-            if inp_key not in api["inputs"]:
+            if inp_key not in inputs:
                 # Default and remembered values
                 default_val = remembered_values.get(inp_key)
                 if inp_key == "tenant_subscription_id":
@@ -285,9 +760,9 @@ def execute_api(api):
                     print(f"❌ {inp_name} is required.")
                     continue
 
-                # Remember and encode inputs
+                # Remember inputs; prepare_request quotes them when building the URL
                 remembered_values[inp_key] = val
-                api["inputs"][inp_key] = urllib.parse.quote_plus(val)
+                inputs[inp_key] = val
 
         # --- Handle special sub-path logic ---
         if api["name"] == "getCspCustomerSubscriptionsByType":
@@ -303,8 +778,8 @@ def execute_api(api):
                 "3": "/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspCustomerSubscriptions/{{tenant_subscription_id}}/{{customer_id}}"
             }
 
-            api["inputs"]["sub_path"] = sub_paths.get(choice)
-            if not api["inputs"]["sub_path"]:
+            inputs["sub_path"] = sub_paths.get(choice)
+            if not inputs["sub_path"]:
                 print("❌ Invalid choice. Skipping API.")
                 return
 
@@ -312,30 +787,35 @@ def execute_api(api):
         params = prompt_optional_params(
             api.get("optional_params", []),
             reference_dict=api.get("reference_values"),
-            product_type=api["inputs"].get("productTypes")
+            product_type=inputs.get("productTypes")
         )
 
-        # --- Build final URL ---
-        final_path = api["inputs"].get("sub_path", api["path"])
+        # --- Build final URL; inputs not in the path become query params ---
         try:
-            url = build_url(final_path, api["inputs"])
-        except KeyError as e:
-            print(f"❌ Missing required input for URL: {e}")
+            final_path, url, query = client.prepare_request(api, inputs)
+        except ValueError as e:
+            print(f"❌ {e}")
             return
-
-        # --- Add remaining inputs as query params ---
-        for key, val in api["inputs"].items():
-            if val and f"{{{{{key}}}}}" not in final_path and key not in params:
-                params[key] = val
+        for key, val in query.items():
+            params.setdefault(key, val)
 
         # --- Execute API request ---
-        res = make_request(url, params=params)
+        spec = PAGED_ENDPOINTS.get(final_path)
+        if args.offer_index and endpoint_name(api) == OFFERS_ENDPOINT and "sub_path" not in inputs:
+            # Filters are answered from the tenant's local offer index, built on first use
+            filters = {key: val for key, val in params.items() if key != "connectionId"}
+            res = offer_catalog.query(inputs["tenant_subscription_id"], inputs["customer_id"], **filters)
+        elif spec and spec["page_param"] not in params and spec["size_param"] not in params \
+                and input("Fetch all pages? (y/n): ").strip().lower() == "y":
+            res = client.fetch_all_pages(url, spec, params, args.page_size or DEFAULT_PAGE_SIZE)
+        else:
+            res = make_request(url, params=params)
         print(f"\n📘 {api['name']} Result:\n", json.dumps(res, indent=2))
 
         retry = input("\nRun this API again with different inputs? (y/n): ").strip().lower()
         if retry != "y":
             break
-        api["inputs"] = {}
+        inputs = {}
 
 ##def execute_api(api):
 ##    print(f"\n➡️  Executing API: {api['name']}")
@@ -399,107 +879,186 @@ def execute_api(api):
 ##    result = make_request(url, params=params)
 ##    print(f"\n📘 Result:\n", json.dumps(result, indent=2))
 
-# ========== API GROUPS ==========
-
-MS_CSP_APIS = [
-    {"name": "Get CSP Mapped Companies HYBR Tenant Subscriptions",
-     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspMappedCompanies",
-     "required_inputs": [], "optional_params": ["connectionId"], "inputs": {}},
-
-    {"name": "Get CSP Customer Profile By HYBR Subscription ID",
-     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspCustomerProfileBySubscriptionId/{{tenant_subscription_id}}",
-     "required_inputs": [("Tenant Subscription ID", "tenant_subscription_id")],
-     "optional_params": ["connectionId"], "inputs": {}},
-
-    {"name": "getCspCustomerSubscriptionsByType",
-     "path": "{{sub_path}}",
-     "required_inputs": [("Tenant Subscription ID", "tenant_subscription_id"), ("Customer ID", "customer_id")],
-     "optional_params": ["subscriptionType", "status"],
-     "reference_values": {
-         "subscriptionType": ["ServiceProvider", "Reseller", "Customer"],
-         "status": ["1 - Active", "2 - Suspended", "3 - Deleted", "6 - Disabled"]
-     }, "inputs": {}},
-
-    {"name": "Get CSP Customer Licenses By CSP Customer ID",
-     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/licenses/getCustomerLicenses/{{customer_id}}",
-     "required_inputs": [("Customer ID", "customer_id")],
-     "optional_params": ["page", "page_Size"], "inputs": {}},
-
-    {"name": "Get CSP Product Types By HYBR Tenant Subscription ID",
-     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/companies/cspProductTypes/{{tenant_subscription_id}}",
-     "required_inputs": [("Tenant Subscription ID", "tenant_subscription_id")],
-     "optional_params": ["connectionId"], "inputs": {}},
-
-    {"name": "Get CSP Categories By HYBR Tenant Subscription ID",
-     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspCategories/{{tenant_subscription_id}}",
-     "required_inputs": [("Tenant Subscription ID", "tenant_subscription_id")],
-     "optional_params": ["connectionId"], "inputs": {}},
-
-    {"name": "Get CSP Offers By HYBR Tenant Subscription ID",
-     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspOffersBySubscriptionIdFromDb/{{tenant_subscription_id}}/{{customer_id}}",
-     "required_inputs": [("Tenant Subscription ID", "tenant_subscription_id"), ("Customer ID", "customer_id"), ("productTypes", "productTypes")],
-     "optional_params": ["connectionId", "reservationProductTypes", "cspOfferCategories", "offerType", "segments", "search", "skip", "take"],
-     "reference_values": {
-         "productTypes": SOFTWARE_PRODUCT_TYPES + NCE_PRODUCT_TYPES + AZURE_RESERVATION_PRODUCT_TYPES,
-         "reservationProductTypes": AZURE_RESERVATION_TYPES,
-         "cspOfferCategories": OFFER_CATEGORIES,
-         "offerType": OFFER_TYPE,
-         "segments": OFFER_SEGMENTS
-     }, "inputs": {}}
+# ========== BATCH MODE ==========
+# A job file is a list of jobs, or {"output": ..., "workers": ..., "jobs": [...]}. Each job names an
+# API (its catalog name or endpoint, e.g. "topCustomersByRevenue") and its inputs. An optional
+# "matrix" of input lists runs the job once per combination, and "all_pages" pages through paged
+# endpoints:
+#   {"api": "topCustomersByRevenue", "inputs": {"numberOfItems": 10},
+#    "matrix": {"year": [2024, 2025], "month": [1, 2, 3], "currency": ["USD", "EUR"]}}
+
+def load_jobs(path):
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise SystemExit("❌ PyYAML is required for YAML job files (pip install pyyaml).")
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+    return {"jobs": spec} if isinstance(spec, list) else spec
+
+def expand_jobs(jobs):
+    """Yield one job per combination of each job's ``matrix`` values."""
+    for job in jobs:
+        matrix = job.get("matrix") or {}
+        keys = list(matrix)
+        value_lists = [matrix[key] if isinstance(matrix[key], list) else [matrix[key]] for key in keys]
+        for values in itertools.product(*value_lists):
+            yield {**job, "inputs": {**job.get("inputs", {}), **dict(zip(keys, values))}}
+
+def default_inputs():
+    inputs = {}
+    if DEFAULT_TENANT_SUB_ID:
+        inputs["tenant_subscription_id"] = DEFAULT_TENANT_SUB_ID
+    if DEFAULT_CUSTOMER_ID:
+        inputs["customer_id"] = DEFAULT_CUSTOMER_ID
+    return inputs
+
+def job_inputs(job, endpoint):
+    """A job's inputs on top of the default tenant/customer IDs, where the endpoint takes them."""
+    defaults = {key: val for key, val in default_inputs().items() if key in endpoint.inputs}
+    return {**defaults, **job.get("inputs", {})}
+
+def validate_jobs(jobs):
+    """Check every job, and every combination of its matrix, against the endpoint registry.
+
+    Makes no network calls; returns one error per invalid job.
+    """
+    errors = []
+    for number, job in enumerate(jobs, 1):
+        for expanded in expand_jobs([job]):
+            try:
+                endpoint = get_endpoint(expanded.get("api"))
+                endpoint.split(job_inputs(expanded, endpoint))
+            except ValueError as e:
+                errors.append(f"job {number}: {e}")
+                break
+    return errors
+
+def run_job(job):
+    result = {"api": job.get("api"), "inputs": job.get("inputs", {}), "ok": False, "result": None}
+    try:
+        endpoint = get_endpoint(job.get("api"))
+        path, url, params = client.prepare_request(endpoint.api, job_inputs(job, endpoint))
+    except ValueError as e:
+        result["error"] = str(e)
+        return result
+
+    spec = PAGED_ENDPOINTS.get(path)
+    if job.get("all_pages") and spec:
+        res = client.fetch_all_pages(url, spec, params, args.page_size or DEFAULT_PAGE_SIZE)
+    else:
+        res = make_request(url, params=params)
+    result.update(ok=res is not None, result=res)
+    return result
+
+def run_batch(job_file):
+    spec = load_jobs(job_file)
+    output_file = args.batch_output or spec.get("output") or "batch_results.jsonl"
+    workers = max(1, spec.get("workers") or args.workers or 1)
+    errors = validate_jobs(spec.get("jobs", []))
+    if errors:
+        for error in errors:
+            print(f"❌ {error}")
+        raise SystemExit(f"\n❌ {len(errors)} of {len(spec.get('jobs', []))} jobs are invalid; nothing was run.")
+    jobs = list(expand_jobs(spec.get("jobs", [])))
+    print(f"\n🔹 Running {len(jobs)} batch jobs from {job_file} with {workers} workers...")
+
+    failed = 0
+    with CspDataWriter(output_file, "jsonl") as writer:
+        for result in ordered_map(run_job, jobs, workers):
+            if not result["ok"]:
+                failed += 1
+                print(f"❌ {result['api']} {result['inputs']}: {result.get('error', 'request failed')}")
+            writer.write(result)
+
+    report_metrics()
+    print(f"\n✅ {writer.count} jobs run, {failed} failed. Results written to {output_file}")
+
+# ========== REPORT MATRIX ==========
+MATRIX_REPORTS = [
+    "topProductsByRevenue", "topCustomersByRevenue", "monthlyResellerMargin", "monthlyResellerMarginPerResource",
+    "monthlyResellerMarginPerSubscription", "monthlyProductsResellerMarginBySubscription",
+    "estimatedCostByServiceTypePerCustomer",
 ]
 
-REPORT_APIS = [
-    #{"name": "List Subscriptions", "path": "/api/integrations/{{appId}}/admin/service/core/subscriptions", "inputs": {}},
-    {"name": "Get Subscriptions and their Relationships",
-     "path": "/api/integrations/{{appId}}/admin/service/core/subscriptions/subscriptionRelationships",
-     "inputs": {}},
-    
-    {"name": "List Available Currency Codes", "path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/availableCurrencySymbols",
-     "required_inputs": [("Month", "month"), ("Year", "year")],
-     "optional_params": ["parentSubscriptionId"], "inputs": {}},
-
-    {"name": "Top Products By Revenue",
-     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/topProductsByRevenue",
-     "required_inputs": [("Month", "month"), ("Year", "year"), ("Number Of Items", "numberOfItems"), ("Currency", "currency")],
-     "optional_params": ["parentSubscriptionId"], "inputs": {}},
-
-    {"name": "Top Customers By Revenue",
-     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/topCustomersByRevenue",
-     "required_inputs": [("Month", "month"), ("Year", "year"), ("Number Of Items", "numberOfItems"), ("Currency", "currency")],
-     "optional_params": ["parentSubscriptionId"], "inputs": {}},
-    
-    {"name": "Monthly Reseller Margin",
-     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/monthlyResellerMargin",
-     "required_inputs": [("Month", "month"), ("Year", "year"), ("Currency", "currency")],
-     "optional_params": ["parentSubscriptionId"], "inputs": {}},
-
-    {"name": "Monthly Reseller Margin Per Resource",
-     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/monthlyResellerMarginPerResource",
-     "required_inputs": [("Month", "month"), ("Year", "year"), ("Currency", "currency")],
-     "optional_params": ["parentSubscriptionId"], "inputs": {}},
-
-    {"name": "Monthly Reseller Margin Per Subscription",
-     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/monthlyResellerMarginPerSubscription",
-     "required_inputs": [("Month", "month"), ("Year", "year"), ("Currency", "currency")],
-     "optional_params": ["parentSubscriptionId"], "inputs": {}},
-
-    {"name": "Monthly Products Reseller Margin By Subscription",
-     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/monthlyProductsResellerMarginBySubscription",
-     "required_inputs": [("Month", "month"), ("Year", "year"), ("Tenant Subscription ID", "customerSubscriptionId"), ("Currency", "currency")],
-     "inputs": {}},
-
-     #{"name": "Monthly Subscription Reseller Margin By Product",
-     #"path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/monthlySubscriptionResellerMarginByProduct",
-     #"required_inputs": [("Month", "month"), ("Year", "year"), ("Metered Resource Name", "meteredResourceName"), ("Currency", "currency")],
-     #"optional_params": ["parentSubscriptionId"], "inputs": {}},
-    
-    {"name": "Current Month Estimate",
-     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/estimatedCostByServiceTypePerCustomer",
-     "required_inputs": [("Tenant Subscription ID", "customerSubscriptionId"), ("Month", "month"), ("Year", "year")],
-     "inputs": {}}
-]
+def parse_month_range(value):
+    """Expand 'YYYY-MM:YYYY-MM' into a list of (year, month); defaults to the last 12 months.
+
+    Raises ValueError for a malformed or empty range.
+    """
+    if value:
+        start, _, end = value.partition(":")
+        try:
+            (start_year, start_month), (end_year, end_month) = (
+                tuple(int(n) for n in part.strip().split("-")) for part in (start, end or start))
+        except ValueError:
+            raise ValueError(f"--months must look like YYYY-MM or YYYY-MM:YYYY-MM, not {value!r}")
+        if not (1 <= start_month <= 12 and 1 <= end_month <= 12):
+            raise ValueError(f"--months has a month outside 1-12: {value!r}")
+        if (start_year, start_month) > (end_year, end_month):
+            raise ValueError(f"--months starts after it ends: {value!r}")
+    else:
+        today = time.localtime()
+        end_year, end_month = today.tm_year, today.tm_mon
+        start_year, start_month = (end_year - 1, end_month + 1) if end_month < 12 else (end_year, 1)
+    periods = []
+    year, month = start_year, start_month
+    while (year, month) <= (end_year, end_month):
+        periods.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
+def run_report_matrix(reports):
+    reports = MATRIX_REPORTS if reports == "all" else [r.strip() for r in reports.split(",") if r.strip()]
+    try:
+        periods = parse_month_range(args.months)
+    except ValueError as e:
+        parser.error(str(e))
+    currencies = [c.strip() for c in args.currencies.split(",")] if args.currencies else None
+    parents = [p.strip() for p in args.parent_subscription_ids.split(",")] if args.parent_subscription_ids else None
+    extra_inputs = {"numberOfItems": args.number_of_items, **default_inputs()}
+    if DEFAULT_TENANT_SUB_ID:
+        extra_inputs["customerSubscriptionId"] = DEFAULT_TENANT_SUB_ID
+    print(f"\n🔹 Fetching {len(reports)} reports for {len(periods)} months with {args.workers} workers...")
+
+    results = {}
+    for report in reports:
+        try:
+            endpoint = get_endpoint(report)
+        except ValueError:
+            print(f"❌ Unknown report: {report}")
+            continue
+        # Only pass the extra inputs the report actually takes
+        inputs = {key: val for key, val in extra_inputs.items() if key in endpoint.inputs}
+        result = client.report_matrix(report, periods, currencies, parents, **inputs)
+        print(f"   {report}: {result['rows']} rows, {len(result['failed_cells'])} failed cells")
+        results[report] = result
+
+    with open(args.report_output, "w") as f:
+        json.dump(results, f)
+    report_metrics()
+    print(f"\n✅ Report matrix written to {args.report_output}")
 
 # ========== MAIN MENU ==========
+if args.merge:
+    merge_outputs(args.merge, args.output)
+    exit()
+if args.processes:
+    run_sharded_collection()
+    exit()
+if args.collect:
+    collect_csp_data()
+    exit()
+if args.batch:
+    run_batch(args.batch)
+    exit()
+if args.report_matrix:
+    run_report_matrix(args.report_matrix)
+    exit()
+
 print("\n🔹 CSP API Interactive CLI\n")
 print("Select API Group:")
 print("1️⃣ Microsoft CSP APIs")
@@ -531,9 +1090,15 @@ elif mode == "2":
         print("\nAvailable APIs:")
         for idx, api in enumerate(selected_apis, start=1):
             print(f"{idx}. {api['name']}")
-        choice = input("Enter API number to run (or 'exit' to quit): ").strip()
+        choice = input("Enter API number to run ('refresh' to clear cached responses, 'exit' to quit): ").strip()
         if choice.lower() == "exit":
             break
+        if choice.lower() == "refresh":
+            if client.cache is not None:
+                client.cache.invalidate()
+            offer_catalog.invalidate()
+            print("🔄 Cached responses and offer indexes cleared.")
+            continue
         if choice.isdigit() and 1 <= int(choice) <= len(selected_apis):
 ##            if remembered_values:
 ##                if remembered_values.get("tenant_subscription_id"):
@@ -0,0 +1,338 @@
+"""Local stand-in for the Hybr portal, for benchmarks and offline runs.
+
+Serves the ``/api/integrations/{appId}/admin/service/...`` endpoints used by
+MS_CSP_APIS, REPORT_APIS and collect_csp_data with synthetic, deterministic
+payloads in the csp_data.json shape for N companies. Latency, page-size caps
+and 429/500 injection are configurable; bodies over 1 KiB are gzipped for
+clients that accept it; any credentials are accepted::
+
+    python benchmarks/mock_portal.py --companies 500 --latency 0.02 --throttle-rate 0.01
+    python Csp-Flow-Sample.py --base-url http://127.0.0.1:8765 --app-id bench --username u --password p
+
+``GET /__stats`` returns the requests, statuses, bytes and connections served so far.
+"""
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+import urllib.parse
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SKUS = [
+    ("OFFICESUBSCRIPTION", "Microsoft 365 Apps for enterprise"), ("O365_BUSINESS_ESSENTIALS", "Microsoft 365 Business Basic"),
+    ("O365_BUSINESS_PREMIUM", "Microsoft 365 Business Standard"), ("SPE_E3", "Microsoft 365 E3"), ("SPE_E5", "Microsoft 365 E5"),
+    ("VISIOCLIENT", "Visio Plan 2"), ("PROJECTPREMIUM", "Project Plan 5"), ("PBI_PREMIUM_PER_USER", "Power BI Premium Per User"),
+    ("EMS", "Enterprise Mobility + Security E3"), ("Microsoft_Intune_Advanced_Analytics", "Intune Advanced Analytics"),
+]
+PRODUCT_TYPES = ["OnlineServicesNCE", "License", "Software Subscription", "Azure Reservation"]
+CATEGORIES = ["Microsoft 365", "Dynamics 365", "Power Platform", "Security", "Azure"]
+SEGMENTS = ["Commercial", "Education", "Government", "Nonprofit"]
+OFFER_TYPES = ["Base", "AddOn", "Trial"]
+CURRENCIES = [("USD", "$"), ("EUR", "€"), ("GBP", "£")]
+REPORT_NAMES = [
+    "topProductsByRevenue", "topCustomersByRevenue", "monthlyResellerMargin", "monthlyResellerMarginPerResource",
+    "monthlyResellerMarginPerSubscription", "monthlyProductsResellerMarginBySubscription",
+    "estimatedCostByServiceTypePerCustomer",
+]
+
+def _uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+class SyntheticData:
+    """Deterministic synthetic tenants: ``companies`` mapped companies spread over ``connections`` partner connections."""
+
+    def __init__(self, companies=100, connections=1, licenses=8, offers=60, seed=0):
+        rng = random.Random(seed)
+        self.connections = [_uuid(rng) for _ in range(max(1, connections))]
+        self.companies = []
+        self.by_subscription = {}
+        self.by_customer = {}
+        for i in range(companies):
+            subscription_id, customer_id = _uuid(rng), _uuid(rng)
+            name = f"Contoso {i:05d}"
+            domain = f"contoso{i:05d}.onmicrosoft.com"
+            profile = {
+                "SubscriptionId": subscription_id, "AllowDelegatedAccess": None, "AssociatedPartnerId": None,
+                "CommerceId": None, "Id": customer_id, "FirstName": None, "LastName": None, "CompanyName": name,
+                "Email": f"admin@{domain}", "TenantId": customer_id, "AddressLine1": f"{i} Main St", "AddressLine2": None,
+                "City": "Redmond", "Region": "WA", "State": "WA", "PostalCode": "98052", "Country": "US",
+                "PhoneNumber": None, "Language": "en", "Culture": "en-US", "Domain": domain, "id": customer_id,
+                "name": customer_id, "displayName": f" - {customer_id}", "WapUserId": f"admin@{domain}",
+                "Status": "Customer Created Successfully", "SignupState": 20, "SignupStateString": "Approved",
+                "Type": "CspCustomerProfile", "RelationshipToPartner": 0, "Qualification": "None",
+                "IsAADConsentGivenForCPVApp": False, "CPVAppPermissionsJson": None,
+                "CspPartnerConnectionId": self.connections[i % len(self.connections)],
+            }
+            company_licenses = []
+            for sku, license_name in rng.sample(SKUS, min(licenses, len(SKUS))):
+                total = rng.randint(1, 200)
+                consumed = rng.randint(0, total)
+                suspended = rng.randint(0, total - consumed) if rng.random() < 0.1 else 0
+                company_licenses.append({
+                    "LicenseId": _uuid(rng), "LicenseGroupId": "Group1", "LicenseName": license_name,
+                    "SkuPartNumber": sku, "TargetType": "User", "ActiveUnits": total - suspended,
+                    "AvailableUnits": total - suspended - consumed, "CapabilityStatus": "Enabled",
+                    "ConsumedUnits": consumed, "SuspendedUnits": suspended, "TotalUnits": total, "WarningUnits": 0,
+                    "AssignedUsers": [f"user{u}@{domain}" for u in range(min(consumed, 5))],
+                })
+            tenant = {
+                "company": {"id": subscription_id, "text": name},
+                "profile": profile,
+                "licenses": {"CustomerId": customer_id, "BillingSubscriptionId": subscription_id,
+                             "CustomerProfileId": i + 1, "Licenses": company_licenses},
+                "offer_count": offers,
+                "seed": rng.getrandbits(32),
+            }
+            self.companies.append(tenant)
+            self.by_subscription[subscription_id] = tenant
+            self.by_customer[customer_id] = tenant
+
+    def offers(self, tenant):
+        """Offer items for a tenant, generated on demand so large catalogs do not sit in memory."""
+        rng = random.Random(tenant["seed"])
+        items = []
+        for k in range(tenant["offer_count"]):
+            product_type = rng.choice(PRODUCT_TYPES)
+            items.append({
+                "Id": f"{tenant['company']['id'][:8]}-{k:05d}", "OfferId": _uuid(rng),
+                "Name": f"{rng.choice(SKUS)[1]} ({rng.choice(['Monthly', 'Annual', 'Triennial'])})",
+                "Description": "Synthetic offer for benchmarking", "ProductType": product_type,
+                "ReservationProductType": "VirtualMachines" if product_type == "Azure Reservation" else None,
+                "Category": rng.choice(CATEGORIES), "Segment": rng.choice(SEGMENTS), "OfferType": rng.choice(OFFER_TYPES),
+                "BillingFrequency": rng.choice(["Monthly", "Annual"]), "UnitPrice": round(rng.uniform(1, 60), 2),
+                "Currency": "USD",
+            })
+        return items
+
+class PortalServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections when an async client opens hundreds at once
+    request_queue_size = 1024
+
+class MockPortal:
+    """Threaded HTTP server serving SyntheticData with configurable latency and fault injection.
+
+    ``latency`` seconds (plus up to ``jitter``) are added to every response;
+    ``throttle_rate``/``error_rate`` are the chances of answering 429 (with
+    ``Retry-After: retry_after``) or 500 instead. ``max_page_size`` caps the
+    page size honoured by paged endpoints. ``compress`` gzips larger bodies
+    when the client sends ``Accept-Encoding: gzip``. With ``keep_alive``
+    False every connection is closed after one response without a
+    ``Connection: close`` header, like a server dropping idle connections.
+    """
+
+    def __init__(self, data, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, throttle_rate=0.0,
+                 error_rate=0.0, retry_after=0.2, max_page_size=None, compress=True, keep_alive=True, seed=0):
+        self.data = data
+        self.compress = compress
+        self.keep_alive = keep_alive
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.max_page_size = max_page_size
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "bytes": 0, "statuses": {}, "connections": 0}
+        self.server = PortalServer((host, port), self._handler_class())
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def setup(self):
+                super().setup()
+                with portal._lock:
+                    portal.stats["connections"] += 1
+
+            def do_GET(self):
+                status, body, headers = portal.handle(self.path)
+                raw = json.dumps(body).encode()
+                if portal.compress and len(raw) > 1024 and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    raw = gzip.compress(raw, compresslevel=5)
+                    headers = {**headers, "Content-Encoding": "gzip"}
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                # Count first, so the stats already include a response once the client has it
+                portal._count(status, len(raw))
+                self.wfile.write(raw)
+                if not portal.keep_alive:
+                    self.close_connection = True
+
+        return Handler
+
+    def _count(self, status, nbytes):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["bytes"] += nbytes
+            self.stats["statuses"][str(status)] = self.stats["statuses"].get(str(status), 0) + 1
+
+    def _page(self, items, start, size):
+        if self.max_page_size:
+            size = min(size, self.max_page_size)
+        return items[start:start + size]
+
+    def handle(self, raw_path):
+        """Return ``(status, body, headers)`` for a request path."""
+        parts = urllib.parse.urlsplit(raw_path)
+        query = {key: values[-1] for key, values in urllib.parse.parse_qs(parts.query).items()}
+        segments = [urllib.parse.unquote(seg) for seg in parts.path.split("/") if seg]
+        if segments == ["__stats"]:
+            with self._lock:
+                return 200, {**self.stats, "statuses": dict(self.stats["statuses"])}, {}
+
+        delay = self.latency + (self.jitter * self._rng.random() if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+        with self._lock:
+            roll = self._rng.random()
+        if roll < self.throttle_rate:
+            return 429, {"error": "Too many requests"}, {"Retry-After": str(self.retry_after)}
+        if roll < self.throttle_rate + self.error_rate:
+            return 500, {"error": "Injected server error"}, {}
+
+        if len(segments) < 5 or segments[:2] != ["api", "integrations"] or segments[3:5] != ["admin", "service"]:
+            return 404, {"error": f"Unknown path {parts.path}"}, {}
+        try:
+            return self.route(segments[5:], query)
+        except (KeyError, ValueError) as e:
+            return 404, {"error": f"Not found: {e}"}, {}
+
+    def route(self, segments, query):
+        data = self.data
+        area = "/".join(segments[:3])
+        endpoint = segments[3] if len(segments) > 3 else None
+        args = segments[4:]
+
+        if segments == ["core", "subscriptions", "subscriptionRelationships"]:
+            return 200, [
+                {"SubscriptionId": t["company"]["id"], "ParentSubscriptionId": data.companies[0]["company"]["id"],
+                 "Name": t["company"]["text"]}
+                for t in data.companies[:50]
+            ], {}
+
+        if area == "billing/csp/companies":
+            if endpoint == "getCspMappedCompanies":
+                connection = query.get("connectionId")
+                return 200, [
+                    t["company"] for t in data.companies
+                    if not connection or t["profile"]["CspPartnerConnectionId"] == connection
+                ], {}
+            if endpoint == "getCspCustomerProfileBySubscriptionId":
+                return 200, [data.by_subscription[args[0]]["profile"]], {}
+            if endpoint in ("cspProductTypes", "getCspCategories"):
+                if args[0] not in data.by_subscription:
+                    raise KeyError(args[0])
+                return 200, PRODUCT_TYPES if endpoint == "cspProductTypes" else CATEGORIES, {}
+            if endpoint == "getCspOffersBySubscriptionIdFromDb":
+                tenant = data.by_subscription[args[0]]
+                items = data.offers(tenant)
+                for param, field in (("productTypes", "ProductType"), ("cspOfferCategories", "Category"),
+                                     ("segments", "Segment"), ("offerType", "OfferType")):
+                    if query.get(param):
+                        wanted = set(query[param].split(","))
+                        items = [item for item in items if item[field] in wanted]
+                if query.get("search"):
+                    items = [item for item in items if query["search"].lower() in item["Name"].lower()]
+                skip, take = int(query.get("skip", 0)), int(query.get("take", len(items) or 1))
+                return 200, {"items": self._page(items, skip, take), "filteredTotalCount": len(items),
+                             "totalCount": tenant["offer_count"]}, {}
+
+        if area == "billing/csp/licenses" and endpoint == "getCustomerLicenses":
+            licenses = data.by_customer[args[0]]["licenses"]
+            if "page" not in query:
+                return 200, licenses, {}
+            page, size = int(query["page"]), int(query.get("page_Size", 100))
+            return 200, dict(licenses, Licenses=self._page(licenses["Licenses"], (page - 1) * size, size)), {}
+
+        if area == "billing/csp/reports":
+            if endpoint == "availableCurrencySymbols":
+                return 200, [{"CurrencyCode": code, "Symbol": symbol} for code, symbol in CURRENCIES], {}
+            if endpoint in REPORT_NAMES:
+                rng = random.Random(f"{endpoint}:{sorted(query.items())}")
+                rows = int(query.get("numberOfItems", 25))
+                return 200, [
+                    {"Name": data.companies[rng.randrange(len(data.companies))]["company"]["text"] if data.companies else f"Item {k}",
+                     "Revenue": round(rng.uniform(10, 10000), 2), "Cost": round(rng.uniform(5, 8000), 2),
+                     "Currency": query.get("currency"), "Month": query.get("month"), "Year": query.get("year")}
+                    for k in range(rows)
+                ], {}
+
+        raise KeyError("/".join(segments))
+
+    def start(self):
+        """Serve on a background thread; returns the base URL."""
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def add_portal_arguments(parser):
+    parser.add_argument('--companies', type=int, default=100, help='Synthetic mapped companies (default: 100)')
+    parser.add_argument('--connections', type=int, default=1, help='Partner connections the companies are spread over (default: 1)')
+    parser.add_argument('--licenses', type=int, default=8, help=f'Licenses per company, at most {len(SKUS)} (default: 8)')
+    parser.add_argument('--offers', type=int, default=60, help='Offer catalog items per company (default: 60)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response (default: 0)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many extra random seconds per response (default: 0)')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Fraction of requests answered with 429 (default: 0)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 500 (default: 0)')
+    parser.add_argument('--retry-after', type=float, default=0.2, help='Retry-After seconds sent with 429s (default: 0.2)')
+    parser.add_argument('--max-page-size', type=int, help='Cap on the page size paged endpoints honour')
+    parser.add_argument('--no-compression', action='store_true', help='Never gzip response bodies')
+    parser.add_argument('--no-keep-alive', action='store_true', help='Close every connection after one response, without saying so')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the synthetic data and fault injection (default: 0)')
+
+def portal_from_args(args, port=0):
+    data = SyntheticData(args.companies, args.connections, args.licenses, args.offers, args.seed)
+    return MockPortal(
+        data, port=port, latency=args.latency, jitter=args.jitter, throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate, retry_after=args.retry_after, max_page_size=args.max_page_size,
+        compress=not args.no_compression, keep_alive=not args.no_keep_alive, seed=args.seed,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a synthetic Hybr portal for benchmarks and offline runs.")
+    parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+    add_portal_arguments(parser)
+    args = parser.parse_args()
+
+    portal = portal_from_args(args, args.port)
+    print(f"🔹 Mock Hybr portal with {args.companies} companies at {portal.base_url} (Ctrl+C to stop)")
+    try:
+        portal.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        portal.server.server_close()
+
+if __name__ == "__main__":
+    main()
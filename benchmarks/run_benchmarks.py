@@ -0,0 +1,151 @@
+"""Collector benchmarks against the local mock portal.
+
+Starts benchmarks/mock_portal.py in its own process, runs Csp-Flow-Sample.py
+end to end against it for each scenario and reports wall time, requests/sec,
+bytes/sec and peak RSS. Results can be saved and compared with a baseline to
+catch regressions::
+
+    python benchmarks/run_benchmarks.py --companies 200 --latency 0.02 --json baseline.json
+    python benchmarks/run_benchmarks.py --companies 200 --latency 0.02 --compare baseline.json
+
+Peak RSS comes from ``resource`` and is only available on Unix.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import urllib.request
+
+from mock_portal import add_portal_arguments, portal_from_args
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(os.path.dirname(HERE), "Csp-Flow-Sample.py")
+
+# Runs the CLI script in-process so the child can report its own wall time and peak RSS
+RUNNER = """
+import os, resource, runpy, sys, time
+script = sys.argv[1]
+sys.argv = sys.argv[1:]
+sys.path.insert(0, os.path.dirname(script))
+started = time.perf_counter()
+try:
+    runpy.run_path(script, run_name="__main__")
+except SystemExit:
+    pass
+finally:
+    print(f"__benchmark__ {time.perf_counter() - started} {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}", file=sys.stderr)
+"""
+
+def serve_portal(args, ready):
+    portal = portal_from_args(args)
+    ready.put(portal.base_url)
+    portal.server.serve_forever()
+
+def portal_stats(base_url):
+    with urllib.request.urlopen(f"{base_url}/__stats") as res:
+        return json.load(res)
+
+def scenarios(args):
+    """``(name, extra CLI args, stdin)`` per benchmark."""
+    page_size = ["--page-size", str(args.page_size)] if args.page_size else []
+    for workers in args.workers:
+        yield f"collect-w{workers}", ["--output", "csp_data.json", "--workers", str(workers), *page_size], "3\n"
+    for workers in args.workers:
+        yield (f"reports-w{workers}", ["--report-matrix", "all", "--months", args.months, "--workers", str(workers),
+                                       "--tenant-subscription-id", "bench"], "")
+
+def run_scenario(base_url, name, extra_args, stdin):
+    before = portal_stats(base_url)
+    with tempfile.TemporaryDirectory() as workdir:
+        proc = subprocess.run(
+            [sys.executable, "-c", RUNNER, SCRIPT, "--base-url", base_url, "--app-id", "bench",
+             "--username", "bench", "--password", "bench", *extra_args],
+            input=stdin, capture_output=True, text=True, cwd=workdir,
+        )
+    after = portal_stats(base_url)
+    marker = [line for line in proc.stderr.splitlines() if line.startswith("__benchmark__ ")]
+    if proc.returncode != 0 or not marker:
+        print(proc.stdout[-2000:], proc.stderr[-2000:], sep="\n")
+        raise SystemExit(f"❌ Benchmark {name} failed (exit code {proc.returncode})")
+    _, wall, peak_rss_kb = marker[-1].split()
+    wall = float(wall)
+    requests = after["requests"] - before["requests"]
+    received = after["bytes"] - before["bytes"]
+    throttled = after["statuses"].get("429", 0) - before["statuses"].get("429", 0)
+    errors = after["statuses"].get("500", 0) - before["statuses"].get("500", 0)
+    return {
+        "wall_s": round(wall, 3), "requests": requests, "requests_per_s": round(requests / wall, 1),
+        "bytes": received, "bytes_per_s": round(received / wall), "peak_rss_mb": round(int(peak_rss_kb) / 1024, 1),
+        "throttled": throttled, "server_errors": errors,
+    }
+
+def compare(results, baseline, tolerance):
+    """Print regressions against a baseline run; returns True if any were found."""
+    regressed = False
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        for metric, higher_is_worse in (("wall_s", True), ("requests_per_s", False), ("peak_rss_mb", True)):
+            old, new = base[metric], result[metric]
+            if not old:
+                continue
+            change = (new - old) / old
+            if (change > tolerance) if higher_is_worse else (change < -tolerance):
+                regressed = True
+                print(f"⚠️ {name}: {metric} {old} -> {new} ({change:+.0%})")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CSP collector and report paths against a mock portal.")
+    add_portal_arguments(parser)
+    parser.add_argument('--workers', default='1,8', help='Comma-separated --workers values to benchmark (default: 1,8)')
+    parser.add_argument('--page-size', type=int, default=50, help='--page-size for collection runs (default: 50, 0 disables paging)')
+    parser.add_argument('--months', default='2025-01:2025-06', help='Month range for the report runs (default: 2025-01:2025-06)')
+    parser.add_argument('--only', help='Comma-separated scenario names to run (e.g. collect-w8)')
+    parser.add_argument('--json', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Baseline JSON from an earlier --json run; exit 1 on regressions')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Allowed relative change before flagging a regression (default: 0.15)')
+    args = parser.parse_args()
+    args.workers = [int(w) for w in args.workers.split(",") if w.strip()]
+    only = set(args.only.split(",")) if args.only else None
+
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve_portal, args=(args, ready), daemon=True)
+    server.start()
+    base_url = ready.get(timeout=120)
+    print(f"🔹 Mock portal with {args.companies} companies at {base_url} (latency {args.latency}s, "
+          f"429 rate {args.throttle_rate}, 500 rate {args.error_rate})")
+
+    results = {}
+    try:
+        for name, extra_args, stdin in scenarios(args):
+            if only and name not in only:
+                continue
+            print(f"⏳ {name}...")
+            result = results[name] = run_scenario(base_url, name, extra_args, stdin)
+            print(f"   {result['wall_s']}s, {result['requests']} requests ({result['requests_per_s']}/s), "
+                  f"{result['bytes_per_s'] / 1024:.1f} KiB/s, peak RSS {result['peak_rss_mb']} MB, "
+                  f"{result['throttled']} throttled, {result['server_errors']} server errors")
+    finally:
+        server.terminate()
+
+    config = {key: value for key, value in vars(args).items() if key not in ("json", "compare", "only")}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": config, "results": results}, f, indent=2)
+        print(f"\n✅ Results written to {args.json}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print("⚠️ Baseline was recorded with different settings; comparing anyway.")
+        if compare(results, baseline, args.tolerance):
+            raise SystemExit(1)
+        print("✅ No regressions against the baseline.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""License utilization and waste analytics over collected CSP data.
+
+Loads every ``Licenses`` record of a csp_data export (or the licenses table
+written by csp_export) into NumPy columns once, then computes per-tenant and
+per-SKU rollups with grouped array operations instead of Python loops::
+
+    python csp_analytics.py csp_data.json --top 20
+    python csp_analytics.py export/licenses.csv --json utilization.json
+
+Runs fully offline; NumPy is required.
+"""
+import argparse
+import csv
+import json
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("csp_analytics needs NumPy (pip install numpy).")
+
+from csp_export import LICENSE_UNIT_FIELDS, iter_records, to_int
+
+class LicenseColumns:
+    """Array-backed license table: one row per (tenant, license).
+
+    ``tenant`` and ``sku`` are integer codes into ``tenants``/``skus``; unit
+    columns are int64 arrays keyed by the Licenses field name, plus
+    ``AssignedUsers`` (number of assigned users). Unit values that are not
+    integers (``"12.0"`` is) count as 0 and are tallied in ``invalid_units``.
+    """
+
+    UNIT_FIELDS = LICENSE_UNIT_FIELDS + ["AssignedUsers"]
+
+    def __init__(self):
+        self.tenants = []        # code -> company id
+        self.tenant_names = []   # code -> company name
+        self.skus = []           # code -> SkuPartNumber
+        self._tenant_codes = {}
+        self._sku_codes = {}
+        self._tenant = array("i")
+        self._sku = array("i")
+        self._units = {field: array("q") for field in self.UNIT_FIELDS}
+        self.tenant = self.sku = None
+        self.units = {}
+        self.invalid_units = 0
+
+    def _code(self, codes, values, key):
+        code = codes.get(key)
+        if code is None:
+            code = codes[key] = len(values)
+            values.append(key)
+        return code
+
+    def add_tenant(self, company_id, name=None):
+        code = self._code(self._tenant_codes, self.tenants, company_id)
+        if code == len(self.tenant_names):
+            self.tenant_names.append(name)
+        return code
+
+    def add_row(self, tenant_code, sku, units):
+        self._tenant.append(tenant_code)
+        self._sku.append(self._code(self._sku_codes, self.skus, sku or ""))
+        for field in self.UNIT_FIELDS:
+            value = units.get(field)
+            try:
+                value = to_int(value) if value not in (None, "") else 0
+            except ValueError:
+                self.invalid_units += 1
+                value = 0
+            self._units[field].append(value)
+
+    def finish(self):
+        """Freeze the appended rows into NumPy arrays; returns self."""
+        self.tenant = _frozen(self._tenant, np.int32)
+        self.sku = _frozen(self._sku, np.int32)
+        self.units = {field: _frozen(values, np.int64) for field, values in self._units.items()}
+        return self
+
+    @classmethod
+    def from_records(cls, records):
+        table = cls()
+        for record in records:
+            company = record.get("company") or {}
+            profile = (record.get("customer_profile") or [{}])[0] or {}
+            tenant = table.add_tenant(company.get("id"), profile.get("CompanyName") or company.get("text"))
+            licenses = record.get("licenses")
+            for lic in (licenses.get("Licenses") or []) if isinstance(licenses, dict) else []:
+                table.add_row(tenant, lic.get("SkuPartNumber"), {**lic, "AssignedUsers": len(lic.get("AssignedUsers") or [])})
+        return table.finish()
+
+    @classmethod
+    def from_export(cls, path):
+        """Load a csp_data export (.json or .jsonl), streaming records."""
+        return cls.from_records(iter_records(path))
+
+    @classmethod
+    def from_licenses_csv(cls, path):
+        """Load the licenses.csv table written by csp_export."""
+        table = cls()
+        with open(path, newline="") as f:
+            for row in csv.DictReader(f):
+                tenant = table.add_tenant(row["company_id"])
+                table.add_row(tenant, row["sku_part_number"], {**row, "AssignedUsers": row["assigned_users"]})
+        return table.finish()
+
+    def __len__(self):
+        return len(self.tenant)
+
+    @property
+    def unused(self):
+        """Active seats not consumed, per row (never negative)."""
+        return np.maximum(self.units["ActiveUnits"] - self.units["ConsumedUnits"], 0)
+
+def _frozen(values, dtype):
+    # Older NumPy releases reject a zero-length buffer
+    return np.frombuffer(values, dtype=dtype) if len(values) else np.empty(0, dtype=dtype)
+
+def _rollup(codes, n_groups, table):
+    """Sum every unit column per group code with np.bincount."""
+    sums = {
+        field: np.bincount(codes, weights=values, minlength=n_groups).astype(np.int64)
+        for field, values in table.units.items()
+    }
+    sums["UnusedUnits"] = np.bincount(codes, weights=table.unused, minlength=n_groups).astype(np.int64)
+    active = sums["ActiveUnits"]
+    # Utilization is consumed / active seats; groups with no active seats get NaN
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sums["Utilization"] = np.where(active > 0, sums["ConsumedUnits"] / active, np.nan)
+    return sums
+
+def per_tenant(table):
+    """Unit totals, unused seats and utilization per tenant (index = tenant code)."""
+    sums = _rollup(table.tenant, len(table.tenants), table)
+    sums["SkuCount"] = np.bincount(table.tenant, minlength=len(table.tenants))
+    return sums
+
+def per_sku(table):
+    """Cross-tenant unit totals, unused seats, utilization and tenant count per SKU (index = sku code)."""
+    sums = _rollup(table.sku, len(table.skus), table)
+    pairs = np.unique(table.tenant.astype(np.int64) * max(1, len(table.skus)) + table.sku)
+    sums["TenantCount"] = np.bincount(pairs % max(1, len(table.skus)), minlength=len(table.skus))
+    return sums
+
+def totals(table):
+    """Portfolio-wide rollup across every tenant and SKU."""
+    result = {field: int(values.sum()) for field, values in table.units.items()}
+    result["UnusedUnits"] = int(table.unused.sum())
+    result["Utilization"] = result["ConsumedUnits"] / result["ActiveUnits"] if result["ActiveUnits"] else None
+    result["Tenants"] = len(table.tenants)
+    result["Skus"] = len(table.skus)
+    result["Licenses"] = len(table)
+    return result
+
+def top_waste(table, n=20):
+    """The ``n`` (tenant, SKU) license rows with the most unused seats."""
+    unused = table.unused
+    n = min(n, len(unused))
+    if n == 0:
+        return []
+    top = np.argpartition(-unused, n - 1)[:n]
+    top = top[np.argsort(-unused[top], kind="stable")]
+    return [
+        {
+            "company_id": table.tenants[table.tenant[i]],
+            "company_name": table.tenant_names[table.tenant[i]],
+            "sku": table.skus[table.sku[i]],
+            "ActiveUnits": int(table.units["ActiveUnits"][i]),
+            "ConsumedUnits": int(table.units["ConsumedUnits"][i]),
+            "UnusedUnits": int(unused[i]),
+        }
+        for i in top
+        if unused[i] > 0
+    ]
+
+def _records(labels, sums, key):
+    fields = list(sums)
+    return [
+        {key: label, **{field: (None if np.isnan(v) else float(v)) if field == "Utilization" else int(v)
+                        for field, v in zip(fields, (sums[field][i] for field in fields))}}
+        for i, label in enumerate(labels)
+    ]
+
+def analyze(table, top=20):
+    """Full utilization report as plain Python data."""
+    return {
+        "totals": totals(table),
+        "per_sku": sorted(_records(table.skus, per_sku(table), "sku"), key=lambda r: -r["UnusedUnits"]),
+        "per_tenant": sorted(_records(table.tenants, per_tenant(table), "company_id"), key=lambda r: -r["UnusedUnits"]),
+        "top_waste": top_waste(table, top),
+    }
+
+def _pct(value):
+    return "-" if value is None else f"{value:.0%}"
+
+def main():
+    parser = argparse.ArgumentParser(description="License utilization and waste analytics for collected CSP data.")
+    parser.add_argument('source', help='csp_data export (.json/.jsonl) or licenses.csv from csp_export')
+    parser.add_argument('--top', type=int, default=20, help='Rows to show per ranking (default: 20)')
+    parser.add_argument('--json', help='Write the full report to this JSON file')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    table = LicenseColumns.from_licenses_csv(args.source) if args.source.endswith(".csv") else LicenseColumns.from_export(args.source)
+    loaded = time.perf_counter()
+    report = analyze(table, args.top)
+    computed = time.perf_counter()
+
+    t = report["totals"]
+    print(f"\n📊 {t['Licenses']} licenses, {t['Tenants']} tenants, {t['Skus']} SKUs "
+          f"(load {loaded - started:.3f}s, analytics {computed - loaded:.3f}s)")
+    print(f"   Active {t['ActiveUnits']}, consumed {t['ConsumedUnits']}, unused {t['UnusedUnits']}, utilization {_pct(t['Utilization'])}")
+    if table.invalid_units:
+        print(f"⚠️ {table.invalid_units} unit values were not integers and were counted as 0.")
+
+    print("\nSKUs by unused seats:")
+    for row in report["per_sku"][:args.top]:
+        print(f" - {row['sku']}: {row['UnusedUnits']} unused of {row['ActiveUnits']} "
+              f"({_pct(row['Utilization'])} used) across {row['TenantCount']} tenants")
+
+    print("\nLargest unused assignments:")
+    for row in report["top_waste"]:
+        print(f" - {row['company_name'] or row['company_id']} / {row['sku']}: {row['UnusedUnits']} unused of {row['ActiveUnits']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.json}")
+
+if __name__ == "__main__":
+    main()
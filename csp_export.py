@@ -0,0 +1,446 @@
+"""Columnar export of collected CSP data.
+
+Flattens csp_data records into typed tables (companies, licenses, offers) and
+report-matrix results into one table per report, written as CSV or, when
+pyarrow is installed, Parquet. Records are streamed in, so exporting a large
+collection never holds more than one batch of rows in memory. Exports may be
+gzip (``.gz``) or zstandard (``.zst``) compressed::
+
+    python csp_export.py csp_data.json --out-dir export --format parquet
+    python csp_export.py --reports report_matrix.json --out-dir export
+"""
+import argparse
+import csv
+import gzip
+import importlib.util
+import json
+import os
+
+from hybr_client import json_dumps, json_loads
+
+# (column, type) per table; types are "string", "int64", "float64" or "bool"
+COMPANY_COLUMNS = [
+    ("company_id", "string"), ("company_text", "string"), ("customer_id", "string"), ("tenant_id", "string"),
+    ("company_name", "string"), ("domain", "string"), ("email", "string"), ("country", "string"),
+    ("partner_connection_id", "string"), ("signup_state", "string"), ("relationship_to_partner", "int64"),
+    ("license_count", "int64"), ("offer_count", "int64"),
+]
+LICENSE_UNIT_FIELDS = ["ActiveUnits", "AvailableUnits", "ConsumedUnits", "SuspendedUnits", "TotalUnits", "WarningUnits"]
+LICENSE_COLUMNS = [
+    ("company_id", "string"), ("customer_id", "string"), ("license_id", "string"), ("license_group_id", "string"),
+    ("license_name", "string"), ("sku_part_number", "string"), ("target_type", "string"), ("capability_status", "string"),
+    *[(field, "int64") for field in LICENSE_UNIT_FIELDS],
+    ("assigned_users", "int64"),
+]
+OFFER_COLUMNS = [
+    ("company_id", "string"), ("customer_id", "string"), ("product_type", "string"),
+    ("offer_id", "string"), ("offer_name", "string"), ("offer_json", "string"),
+]
+TABLES = {"companies": COMPANY_COLUMNS, "licenses": LICENSE_COLUMNS, "offers": OFFER_COLUMNS}
+
+COMPRESSED_SUFFIXES = (".gz", ".zst")
+
+def export_format(path):
+    """``jsonl`` or ``json``, from the export's extension with any compression suffix removed."""
+    for suffix in COMPRESSED_SUFFIXES:
+        if path.endswith(suffix):
+            path = path[:-len(suffix)]
+    return "jsonl" if path.endswith(".jsonl") else "json"
+
+def split_extension(path):
+    """Split an export path into root and extension, keeping compression: ``x.jsonl.gz`` -> ``("x", ".jsonl.gz")``."""
+    root, ext = os.path.splitext(path)
+    if ext in COMPRESSED_SUFFIXES:
+        root, inner = os.path.splitext(root)
+        ext = inner + ext
+    return root, ext
+
+def partial_path(path):
+    """Temporary file an export is written to before being moved into place; keeps the extension so compression matches."""
+    root, ext = split_extension(path)
+    return f"{root}.partial{ext}"
+
+def open_export(path, mode="r"):
+    """Open an export as UTF-8 text, (de)compressing ``.gz`` and ``.zst`` files transparently."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstandard is required for .zst exports (pip install zstandard).")
+        return zstandard.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+def iter_records(path):
+    """Stream the records of a csp_data export (JSON array or JSON Lines, optionally compressed) one at a time."""
+    with open_export(path) as f:
+        if export_format(path) == "jsonl":
+            for line in f:
+                if line.strip():
+                    yield json_loads(line)
+            return
+
+        decoder = json.JSONDecoder()
+        buffer = f.read(1 << 16)
+        pos = buffer.index("[") + 1
+        while True:
+            # Skip whitespace and separators, refilling the buffer as needed
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                    pos += 1
+                if pos < len(buffer):
+                    break
+                chunk = f.read(1 << 16)
+                if not chunk:
+                    return
+                buffer, pos = chunk, 0
+            if buffer[pos] == "]":
+                return
+            while True:
+                try:
+                    record, end = decoder.raw_decode(buffer, pos)
+                    break
+                except json.JSONDecodeError:
+                    chunk = f.read(1 << 16)
+                    if not chunk:
+                        raise
+                    buffer, pos = buffer[pos:] + chunk, 0
+            yield record
+            pos = end
+
+class CspDataWriter:
+    """Streams company records to disk as they are collected.
+
+    ``json`` writes a JSON array identical to ``json.dump(records, f, indent=2)``;
+    ``jsonl`` writes one compact record per line. ``.gz``/``.zst`` paths are
+    compressed and always compact (a JSON array gets one record per line).
+    Only the current record is held in memory.
+
+    Records go to ``partial_path(path)``, which replaces ``path`` only when
+    the writer is closed cleanly, so an existing export is never truncated.
+    If the ``with`` block raises, the partial file is left unterminated
+    beside it with everything written so far.
+    """
+
+    def __init__(self, path, fmt=None):
+        if fmt is None:
+            fmt = export_format(path)
+        self.path = path
+        self.partial_path = partial_path(path)
+        self.fmt = fmt
+        self.compressed = path.endswith(COMPRESSED_SUFFIXES)
+        self.count = 0
+        self._file = open_export(self.partial_path, "w")
+
+    def write(self, record):
+        if self.fmt == "jsonl":
+            self._file.write(json_dumps(record) + "\n")
+        elif self.compressed:
+            self._file.write(("[\n" if self.count == 0 else ",\n") + json_dumps(record))
+        else:
+            # JSON strings never contain raw newlines, so re-indenting by line is safe
+            text = json.dumps(record, indent=2).replace("\n", "\n  ")
+            self._file.write(("[\n  " if self.count == 0 else ",\n  ") + text)
+        if not self.compressed:
+            # Flushing a compressed stream per record would cost most of the compression
+            self._file.flush()
+        self.count += 1
+
+    def close(self):
+        """Terminate the export and move it into place."""
+        if self.fmt == "json":
+            self._file.write("\n]" if self.count else "[]")
+        self._file.close()
+        os.replace(self.partial_path, self.path)
+
+    def abort(self):
+        """Stop writing and leave the partial file as it is; ``path`` is not touched."""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def _first(value):
+    return value[0] if isinstance(value, list) and value else None
+
+def _licenses(record):
+    licenses = record.get("licenses")
+    return (licenses.get("Licenses") or []) if isinstance(licenses, dict) else []
+
+def _offer_items(entry):
+    offers = entry.get("offers")
+    if isinstance(offers, dict):
+        return offers.get("items") or []
+    return offers if isinstance(offers, list) else []
+
+def flatten_record(record):
+    """Split one company record into ``{table: [row dict, ...]}``."""
+    company = record.get("company") or {}
+    profile = _first(record.get("customer_profile")) or {}
+    company_id = company.get("id")
+    customer_id = profile.get("Id")
+    licenses = _licenses(record)
+    offer_entries = record.get("offers") or []
+
+    license_rows = [
+        {
+            "company_id": company_id, "customer_id": customer_id, "license_id": lic.get("LicenseId"),
+            "license_group_id": lic.get("LicenseGroupId"), "license_name": lic.get("LicenseName"),
+            "sku_part_number": lic.get("SkuPartNumber"), "target_type": lic.get("TargetType"),
+            "capability_status": lic.get("CapabilityStatus"),
+            **{field: lic.get(field) for field in LICENSE_UNIT_FIELDS},
+            "assigned_users": len(lic.get("AssignedUsers") or []),
+        }
+        for lic in licenses
+    ]
+    offer_rows = [
+        {
+            "company_id": company_id, "customer_id": customer_id, "product_type": entry.get("product_type"),
+            "offer_id": item.get("Id") or item.get("OfferId"), "offer_name": item.get("Name") or item.get("OfferName"),
+            "offer_json": json.dumps(item),
+        }
+        for entry in offer_entries
+        for item in _offer_items(entry)
+        if isinstance(item, dict)
+    ]
+    company_row = {
+        "company_id": company_id, "company_text": company.get("text"), "customer_id": customer_id,
+        "tenant_id": profile.get("TenantId"), "company_name": profile.get("CompanyName"), "domain": profile.get("Domain"),
+        "email": profile.get("Email"), "country": profile.get("Country"),
+        "partner_connection_id": profile.get("CspPartnerConnectionId"), "signup_state": profile.get("SignupStateString"),
+        "relationship_to_partner": profile.get("RelationshipToPartner"),
+        "license_count": len(license_rows), "offer_count": len(offer_rows),
+    }
+    return {"companies": [company_row], "licenses": license_rows, "offers": offer_rows}
+
+def to_int(value):
+    """An integer from an int, an integral float or numeric text (``"12"``, ``"12.0"``, ``"1e3"``).
+
+    Raises ValueError for anything else instead of truncating or guessing.
+    """
+    if isinstance(value, int):
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value)
+        except ValueError:
+            pass
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{value!r} is not a number")
+    if not number.is_integer():
+        raise ValueError(f"{value!r} is not an integer")
+    return int(number)
+
+def coerce(value, column_type):
+    """Convert a JSON value to a column type; None and "" become None.
+
+    Raises ValueError if the value does not fit the type, e.g. ``12.5`` or
+    ``"n/a"`` in an int64 column; see ``TableWriter.write``.
+    """
+    if value is None or value == "":
+        return None
+    if column_type == "int64":
+        return to_int(value)
+    if column_type == "float64":
+        try:
+            return float(value)
+        except TypeError:
+            raise ValueError(f"{value!r} is not a number")
+    if column_type == "bool":
+        return value if isinstance(value, bool) else str(value).lower() in ("true", "1")
+    if column_type == "string" and not isinstance(value, str):
+        return json.dumps(value)
+    return value
+
+def _is_number(value):
+    try:
+        float(value)
+        return not isinstance(value, bool)
+    except (TypeError, ValueError):
+        return False
+
+def infer_type(values):
+    """Narrowest column type that fits every non-null value."""
+    types = {type(v) for v in values if v is not None}
+    if not types:
+        return "string"
+    if types == {bool}:
+        return "bool"
+    if types <= {int}:
+        return "int64"
+    if types <= {int, float}:
+        return "float64"
+    return "string"
+
+class TableWriter:
+    """Writes rows of one typed table, buffering ``batch_size`` rows at a time.
+
+    A value that does not fit its column's type widens the column (int64 to
+    float64 for a fractional number, otherwise to string) rather than being
+    lost. Once a Parquet file has its schema that is no longer possible; such
+    values are written as null and counted in ``dropped``, with a warning on
+    close.
+    """
+
+    def __init__(self, path, columns, fmt="csv", batch_size=10000):
+        self.path = path
+        self.columns = list(columns)
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.count = 0
+        self.dropped = {}
+        self._rows = []
+        self._writer = None
+        if fmt == "parquet":
+            if importlib.util.find_spec("pyarrow") is None:
+                raise ImportError("pyarrow is required for Parquet export (pip install pyarrow).")
+        else:
+            self._file = open(path, "w", newline="")
+            self._csv = csv.writer(self._file)
+            self._csv.writerow([name for name, _ in columns])
+
+    def write(self, row):
+        values = []
+        for i, (name, column_type) in enumerate(self.columns):
+            value = row.get(name)
+            try:
+                values.append(coerce(value, column_type))
+            except ValueError:
+                values.append(self._widen(i, value))
+        self._rows.append(values)
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def _widen(self, i, value):
+        """Widen column ``i`` so ``value`` fits, and return ``value`` coerced to the new type."""
+        name, column_type = self.columns[i]
+        if self._writer is not None:
+            # The Parquet schema is already written
+            self.dropped[name] = self.dropped.get(name, 0) + 1
+            return None
+        wider = "float64" if column_type == "int64" and _is_number(value) else "string"
+        self.columns[i] = (name, wider)
+        for row in self._rows:
+            row[i] = coerce(row[i], wider)
+        return coerce(value, wider)
+
+    def flush(self):
+        if not self._rows:
+            return
+        if self.fmt == "parquet":
+            self._write_parquet()
+        else:
+            self._csv.writerows(self._rows)
+        self.count += len(self._rows)
+        self._rows = []
+
+    def _arrow_schema(self):
+        import pyarrow as pa
+
+        arrow_types = {"string": pa.string(), "int64": pa.int64(), "float64": pa.float64(), "bool": pa.bool_()}
+        return pa.schema([(name, arrow_types[column_type]) for name, column_type in self.columns])
+
+    def _write_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        schema = self._arrow_schema()
+        arrays = [pa.array([row[i] for row in self._rows], type=schema.field(i).type) for i in range(len(self.columns))]
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, schema)
+        self._writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+    def close(self):
+        self.flush()
+        if self.fmt == "parquet":
+            if self._writer is None:
+                # No rows at all: still write an empty file with the schema
+                import pyarrow.parquet as pq
+                pq.write_table(self._arrow_schema().empty_table(), self.path)
+            else:
+                self._writer.close()
+        else:
+            self._file.close()
+        for name, count in self.dropped.items():
+            print(f"⚠️ {self.path}: {count} values of {name} did not fit its type and were written as null")
+
+class ColumnarExporter:
+    """Streams company records into companies/licenses/offers tables in ``directory``."""
+
+    def __init__(self, directory, fmt="csv", batch_size=10000):
+        os.makedirs(directory, exist_ok=True)
+        extension = "parquet" if fmt == "parquet" else "csv"
+        self.tables = {
+            name: TableWriter(os.path.join(directory, f"{name}.{extension}"), columns, fmt, batch_size)
+            for name, columns in TABLES.items()
+        }
+
+    def add(self, record):
+        for name, rows in flatten_record(record).items():
+            for row in rows:
+                self.tables[name].write(row)
+
+    def close(self):
+        for table in self.tables.values():
+            table.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def export_reports(results, directory, fmt="csv"):
+    """Write each report of a report-matrix result (see HybrClient.report_matrix) as its own typed table."""
+    os.makedirs(directory, exist_ok=True)
+    extension = "parquet" if fmt == "parquet" else "csv"
+    paths = []
+    for report, result in results.items():
+        columns = result["columns"]
+        schema = [(name, infer_type(values)) for name, values in columns.items()]
+        path = os.path.join(directory, f"report_{report}.{extension}")
+        table = TableWriter(path, schema, fmt, batch_size=max(1, result["rows"]))
+        for i in range(result["rows"]):
+            table.write({name: values[i] for name, values in columns.items()})
+        table.close()
+        paths.append(path)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Export collected CSP data as typed columnar tables.")
+    parser.add_argument('export', nargs='?', help='csp_data export to flatten (.json or .jsonl)')
+    parser.add_argument('--reports', help='report_matrix.json written by --report-matrix')
+    parser.add_argument('--out-dir', default='export', help='Directory for the tables (default: export)')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv', help='Table format (default: csv)')
+    args = parser.parse_args()
+    if not args.export and not args.reports:
+        parser.error("give an export file and/or --reports")
+
+    try:
+        export_main(args)
+    except ImportError as e:
+        raise SystemExit(f"❌ {e}")
+
+def export_main(args):
+    if args.export:
+        with ColumnarExporter(args.out_dir, args.format) as exporter:
+            for record in iter_records(args.export):
+                exporter.add(record)
+        for name, table in exporter.tables.items():
+            print(f"✅ {name}: {table.count} rows -> {table.path}")
+    if args.reports:
+        with open(args.reports) as f:
+            for path in export_reports(json.load(f), args.out_dir, args.format):
+                print(f"✅ {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""Indexed lookup over large csp_data exports.
+
+Building an index scans the export once and stores, in a small SQLite file
+next to it (``<export>.idx``), the byte offset and length of every company
+record together with its lookup keys: ``company.id``, the profile's customer
+``Id``/``CustomerId`` and ``TenantId``, ``Domain`` and every ``LicenseId``.
+Lookups then memory-map the export and decode only the matching record, so
+finding one tenant in a multi-GB snapshot takes milliseconds::
+
+    python csp_index.py csp_data.json --build
+    python csp_index.py csp_data.json --domain contoso.onmicrosoft.com
+
+    from csp_index import ExportIndex
+
+    with ExportIndex("csp_data.json") as index:
+        record = index.company("sub-00042")
+"""
+import argparse
+import codecs
+import json
+import mmap
+import os
+import sqlite3
+
+from csp_export import COMPRESSED_SUFFIXES
+
+KINDS = ("company", "customer", "tenant", "domain", "license")
+
+def index_path_for(export_path):
+    return f"{export_path}.idx"
+
+def _check_uncompressed(path):
+    if path.endswith(COMPRESSED_SUFFIXES):
+        raise ValueError(f"{path} is compressed and cannot be memory-mapped; index an uncompressed export")
+
+def iter_record_spans(path):
+    """Yield ``(offset, length, record)`` for each record of an export; offsets are in bytes."""
+    _check_uncompressed(path)
+    with open(path, "rb") as f:
+        if path.endswith(".jsonl"):
+            offset = 0
+            for line in f:
+                if line.strip():
+                    yield offset, len(line.rstrip(b"\r\n")), json.loads(line)
+                offset += len(line)
+            return
+
+        decoder = json.JSONDecoder()
+        text = codecs.getincrementaldecoder("utf-8")()
+        buffer = text.decode(f.read(1 << 16))
+        pos = buffer.index("[") + 1
+        offset = len(buffer[:pos].encode())
+        while True:
+            # Skip whitespace and separators (all single-byte), refilling as needed
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                    pos += 1
+                    offset += 1
+                if pos < len(buffer):
+                    break
+                chunk = f.read(1 << 16)
+                if not chunk:
+                    return
+                buffer, pos = text.decode(chunk), 0
+            if buffer[pos] == "]":
+                return
+            while True:
+                try:
+                    record, end = decoder.raw_decode(buffer, pos)
+                    break
+                except json.JSONDecodeError:
+                    chunk = f.read(1 << 16)
+                    if not chunk:
+                        raise
+                    buffer, pos = buffer[pos:] + text.decode(chunk), 0
+            length = len(buffer[pos:end].encode())
+            yield offset, length, record
+            offset += length
+            pos = end
+
+def record_keys(record):
+    """``(kind, key)`` pairs a record can be looked up by."""
+    keys = []
+    company_id = (record.get("company") or {}).get("id")
+    if company_id:
+        keys.append(("company", str(company_id)))
+    for profile in record.get("customer_profile") or []:
+        if not isinstance(profile, dict):
+            continue
+        for field in ("Id", "CustomerId"):
+            if profile.get(field):
+                keys.append(("customer", str(profile[field])))
+        if profile.get("TenantId"):
+            keys.append(("tenant", str(profile["TenantId"])))
+        if profile.get("Domain"):
+            keys.append(("domain", str(profile["Domain"]).lower()))
+    licenses = record.get("licenses")
+    for lic in (licenses.get("Licenses") or []) if isinstance(licenses, dict) else []:
+        if lic.get("LicenseId"):
+            keys.append(("license", str(lic["LicenseId"])))
+    return list(dict.fromkeys(keys))
+
+def _export_stamp(export_path):
+    stat = os.stat(export_path)
+    return {"size": str(stat.st_size), "mtime_ns": str(stat.st_mtime_ns)}
+
+def build_index(export_path, index_path=None, batch_size=5000):
+    """Scan an export once and write its lookup index; returns the number of records indexed."""
+    index_path = index_path or index_path_for(export_path)
+    tmp_path = f"{index_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript(
+        "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+        "CREATE TABLE records (ordinal INTEGER PRIMARY KEY, offset INTEGER NOT NULL, length INTEGER NOT NULL);"
+        "CREATE TABLE keys (kind TEXT NOT NULL, key TEXT NOT NULL, ordinal INTEGER NOT NULL);"
+    )
+    records, keys, count = [], [], 0
+    for ordinal, (offset, length, record) in enumerate(iter_record_spans(export_path)):
+        records.append((ordinal, offset, length))
+        keys.extend((kind, key, ordinal) for kind, key in record_keys(record))
+        count += 1
+        if len(records) >= batch_size:
+            conn.executemany("INSERT INTO records VALUES (?, ?, ?)", records)
+            conn.executemany("INSERT INTO keys VALUES (?, ?, ?)", keys)
+            records, keys = [], []
+    conn.executemany("INSERT INTO records VALUES (?, ?, ?)", records)
+    conn.executemany("INSERT INTO keys VALUES (?, ?, ?)", keys)
+    # Build the lookup index after the bulk insert; it is much faster than maintaining it row by row
+    conn.execute("CREATE INDEX keys_lookup ON keys (kind, key)")
+    conn.executemany("INSERT INTO meta VALUES (?, ?)", _export_stamp(export_path).items())
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, index_path)
+    return count
+
+class ExportIndex:
+    """Read-only lookups into an export through its index and a memory map of the file.
+
+    Raises ``ValueError`` if the export changed since the index was built.
+    """
+
+    def __init__(self, export_path, index_path=None):
+        self.export_path = export_path
+        self.index_path = index_path or index_path_for(export_path)
+        _check_uncompressed(export_path)
+        if not os.path.exists(self.index_path):
+            raise FileNotFoundError(f"No index at {self.index_path}; build it with: python csp_index.py {export_path} --build")
+        self._conn = sqlite3.connect(f"file:{self.index_path}?mode=ro", uri=True)
+        stamp = dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+        if stamp != _export_stamp(export_path):
+            self._conn.close()
+            raise ValueError(f"{self.index_path} is out of date for {export_path}; rebuild it with --build")
+        self._file = open(export_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def record(self, ordinal):
+        """Decode the record at position ``ordinal`` of the export."""
+        row = self._conn.execute("SELECT offset, length FROM records WHERE ordinal = ?", (ordinal,)).fetchone()
+        if row is None:
+            return None
+        offset, length = row
+        return json.loads(self._map[offset:offset + length])
+
+    def find(self, kind, key):
+        """All records matching one lookup key (``kind`` is one of ``KINDS``)."""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown lookup kind {kind!r}; expected one of {', '.join(KINDS)}")
+        if kind == "domain":
+            key = key.lower()
+        ordinals = self._conn.execute(
+            "SELECT DISTINCT ordinal FROM keys WHERE kind = ? AND key = ? ORDER BY ordinal", (kind, str(key))
+        ).fetchall()
+        return [self.record(ordinal) for ordinal, in ordinals]
+
+    def _one(self, kind, key):
+        matches = self.find(kind, key)
+        return matches[0] if matches else None
+
+    def company(self, company_id):
+        return self._one("company", company_id)
+
+    def customer(self, customer_id):
+        return self._one("customer", customer_id)
+
+    def tenant(self, tenant_id):
+        return self._one("tenant", tenant_id)
+
+    def domain(self, domain):
+        return self._one("domain", domain)
+
+    def license(self, license_id):
+        """Return ``(record, license)`` for a LicenseId, or None."""
+        record = self._one("license", license_id)
+        if record is None:
+            return None
+        lic = next(lic for lic in record["licenses"]["Licenses"] if str(lic.get("LicenseId")) == str(license_id))
+        return record, lic
+
+    def close(self):
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query a lookup index over a csp_data export.")
+    parser.add_argument('export', help='csp_data export (.json or .jsonl)')
+    parser.add_argument('--index', help='Index file (default: <export>.idx)')
+    parser.add_argument('--build', action='store_true', help='(Re)build the index before any lookup')
+    for kind in KINDS:
+        parser.add_argument(f'--{kind}', help=f'Look up records by {kind}')
+    args = parser.parse_args()
+
+    if args.build:
+        try:
+            count = build_index(args.export, args.index)
+        except ValueError as e:
+            raise SystemExit(f"❌ {e}")
+        print(f"✅ Indexed {count} records -> {args.index or index_path_for(args.export)}")
+
+    lookups = [(kind, getattr(args, kind)) for kind in KINDS if getattr(args, kind)]
+    if not lookups:
+        return
+    try:
+        index = ExportIndex(args.export, args.index)
+    except (FileNotFoundError, ValueError) as e:
+        raise SystemExit(f"❌ {e}")
+    with index:
+        for kind, key in lookups:
+            matches = index.find(kind, key)
+            if not matches:
+                print(f"❌ No record with {kind} {key}")
+            for record in matches:
+                print(json.dumps(record, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Local offer catalog index with faceted search.
+
+getCspOffersBySubscriptionIdFromDb is filtered server side, so every new
+filter combination used to cost another round of paged calls. An
+``OfferIndex`` is built per tenant and product type, the first time that
+product type is queried, from every page of its offer items, and answers the
+same filters locally: inverted indexes on the productTypes,
+reservationProductTypes, cspOfferCategories, offerType and segments facets,
+plus a token index for ``search``::
+
+    from hybr_client import HybrClient
+    from csp_offers import OfferCatalog
+
+    with HybrClient(base_url, app_id, username, password) as client:
+        catalog = OfferCatalog(client)
+        res = catalog.query(tenant_subscription_id, customer_id,
+                            productTypes="OnlineServicesNCE", segments="Commercial", search="e3")
+
+Results have the endpoint's shape (``items``, ``filteredTotalCount``,
+``totalCount``) and honour ``skip``/``take``; ``totalCount`` counts the offers
+of the product types queried. Building costs one paged fetch of a product
+type's full catalog, so a query without ``productTypes`` fetches all seven.
+Indexes are rebuilt once they are older than ``refresh_interval`` seconds.
+
+The offer item field names below are the ones the portal returns today. If a
+filter or ``search`` names a facet for which an index holds no values at all
+(e.g. the portal renamed the field), the query is sent to the endpoint
+instead of answering "no matches" locally.
+"""
+import bisect
+import re
+import threading
+import time
+
+from hybr_client import AZURE_RESERVATION_PRODUCT_TYPES, NCE_PRODUCT_TYPES, SOFTWARE_PRODUCT_TYPES, ordered_map
+
+OFFERS_ENDPOINT = "getCspOffersBySubscriptionIdFromDb"
+PRODUCT_TYPES = SOFTWARE_PRODUCT_TYPES + NCE_PRODUCT_TYPES + AZURE_RESERVATION_PRODUCT_TYPES
+
+# Filter parameter -> offer item fields it is matched against (first one present wins)
+FACET_FIELDS = {
+    "productTypes": ["ProductType", "productType"],
+    "reservationProductTypes": ["ReservationProductType", "reservationProductType"],
+    "cspOfferCategories": ["Category", "OfferCategory", "cspOfferCategory", "category"],
+    "offerType": ["OfferType", "offerType"],
+    "segments": ["Segment", "Segments", "segment", "segments"],
+}
+SEARCH_FIELDS = ["Name", "OfferName", "Description", "SkuName", "ProductName", "name", "description"]
+
+def tokenize(text):
+    return re.findall(r"[a-z0-9]+", str(text).casefold())
+
+def _values(value):
+    """Filter values from a comma-separated string or a list, casefolded."""
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        value = value.split(",")
+    return [str(v).strip().casefold() for v in value if str(v).strip()]
+
+class OfferIndex:
+    """In-memory offer items with inverted facet indexes and a prefix-searchable token index.
+
+    Within a facet, values are OR-ed; facets and search terms are AND-ed, as
+    the endpoint does. Matching is case-insensitive.
+    """
+
+    def __init__(self, items=(), product_type=None):
+        self.items = []
+        self.facets = {facet: {} for facet in FACET_FIELDS}  # facet -> value -> set of item ids
+        self.tokens = {}                                     # token -> set of item ids
+        self._sorted_tokens = None
+        self.built_at = time.time()
+        self.add(items, product_type)
+
+    def add(self, items, product_type=None):
+        """Index offer items; ``product_type`` is the productTypes filter they were fetched with."""
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            item_id = len(self.items)
+            self.items.append(item)
+            for facet, fields in FACET_FIELDS.items():
+                value = next((item[field] for field in fields if item.get(field) not in (None, "")), None)
+                if value is None and facet == "productTypes":
+                    value = product_type
+                for v in _values(value):
+                    self.facets[facet].setdefault(v, set()).add(item_id)
+            for field in SEARCH_FIELDS:
+                for token in tokenize(item.get(field) or ""):
+                    self.tokens.setdefault(token, set()).add(item_id)
+        self._sorted_tokens = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def _search(self, text):
+        """Ids of items containing every query token as a word prefix."""
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self.tokens)
+        result = None
+        for term in tokenize(text):
+            start = bisect.bisect_left(self._sorted_tokens, term)
+            matches = set()
+            for token in self._sorted_tokens[start:]:
+                if not token.startswith(term):
+                    break
+                matches |= self.tokens[token]
+            result = matches if result is None else result & matches
+            if not result:
+                return set()
+        return result
+
+    def match(self, search=None, **filters):
+        """Sorted ids of the items matching the facet filters and search text."""
+        candidates = None
+        for facet, value in filters.items():
+            if facet not in FACET_FIELDS:
+                raise ValueError(f"Unknown offer filter {facet!r}; expected one of {', '.join(FACET_FIELDS)}")
+            wanted = _values(value)
+            if not wanted:
+                continue
+            ids = set().union(*(self.facets[facet].get(v, ()) for v in wanted))
+            candidates = ids if candidates is None else candidates & ids
+        if search:
+            ids = self._search(search)
+            candidates = ids if candidates is None else candidates & ids
+        return sorted(candidates) if candidates is not None else list(range(len(self.items)))
+
+    def query(self, search=None, skip=0, take=None, **filters):
+        """Filter like the offers endpoint; returns ``{"items", "filteredTotalCount", "totalCount"}``."""
+        ids = self.match(search, **filters)
+        skip = int(skip or 0)
+        window = ids[skip:skip + int(take)] if take else ids[skip:]
+        return {"items": [self.items[i] for i in window], "filteredTotalCount": len(ids), "totalCount": len(self.items)}
+
+    def facet_counts(self, facet):
+        """Items per value of one facet, most common first."""
+        counts = {value: len(ids) for value, ids in self.facets[facet].items()}
+        return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+    def indexed(self, facet):
+        """True if at least one item has a value for ``facet`` (``"search"`` for searchable text)."""
+        return bool(self.tokens if facet == "search" else self.facets[facet])
+
+class OfferCatalog:
+    """Per-tenant, per-product-type OfferIndexes built from a HybrClient on first use and
+    refreshed every ``refresh_interval`` seconds."""
+
+    def __init__(self, client, refresh_interval=3600, product_types=None, page_size=100):
+        self.client = client
+        self.refresh_interval = refresh_interval
+        self.product_types = list(product_types or PRODUCT_TYPES)
+        self.page_size = page_size
+        self._indexes = {}  # (tenant_subscription_id, customer_id, product_type) -> OfferIndex
+        self._lock = threading.Lock()
+
+    def build(self, tenant_subscription_id, customer_id, product_type):
+        """Fetch every page of one product type's offers and index them; returns None if a fetch failed."""
+        res = self.client.call(OFFERS_ENDPOINT, all_pages=True, page_size=self.page_size,
+                               tenant_subscription_id=tenant_subscription_id, customer_id=customer_id,
+                               productTypes=product_type)
+        if not isinstance(res, dict):
+            print(f"❌ Failed to fetch {product_type} offers for {tenant_subscription_id}")
+            return None
+        return OfferIndex(res.get("items") or [], product_type)
+
+    def index_for(self, tenant_subscription_id, customer_id, product_type, refresh=False):
+        """A product type's index, (re)built if missing, older than ``refresh_interval`` or ``refresh`` is set."""
+        key = (tenant_subscription_id, customer_id, product_type)
+        with self._lock:
+            index = self._indexes.get(key)
+        if refresh or index is None or time.time() - index.built_at >= self.refresh_interval:
+            index = self.build(tenant_subscription_id, customer_id, product_type)
+            if index is None:
+                return None
+            with self._lock:
+                self._indexes[key] = index
+        return index
+
+    def _product_types(self, value):
+        """Catalog product types named by a productTypes filter (all of them if empty), or None if one is unknown."""
+        wanted = _values(value)
+        if not wanted:
+            return self.product_types
+        known = {product_type.casefold(): product_type for product_type in self.product_types}
+        if not all(v in known for v in wanted):
+            return None
+        return list(dict.fromkeys(known[v] for v in wanted))
+
+    def query(self, tenant_subscription_id, customer_id, search=None, skip=0, take=None, **filters):
+        """Query a tenant's offers, locally where the indexes can answer; None if a fetch failed."""
+        for facet in filters:
+            if facet not in FACET_FIELDS:
+                raise ValueError(f"Unknown offer filter {facet!r}; expected one of {', '.join(FACET_FIELDS)}")
+        product_types = self._product_types(filters.get("productTypes"))
+        if product_types is None:
+            return self._server_query(tenant_subscription_id, customer_id, search, skip, take, filters)
+
+        indexes = list(ordered_map(lambda product_type: self.index_for(tenant_subscription_id, customer_id, product_type),
+                                   product_types, self.client.workers))
+        if any(index is None for index in indexes):
+            return None
+        # productTypes is always indexed (from the fetch itself); an empty catalog has nothing to index
+        requested = [facet for facet, value in filters.items() if facet != "productTypes" and _values(value)]
+        requested += ["search"] if search else []
+        populated = [index for index in indexes if len(index)]
+        if populated and any(not any(index.indexed(facet) for index in populated) for facet in requested):
+            return self._server_query(tenant_subscription_id, customer_id, search, skip, take, filters)
+
+        items = [index.items[i] for index in indexes for i in index.match(search, **filters)]
+        skip = int(skip or 0)
+        window = items[skip:skip + int(take)] if take else items[skip:]
+        return {"items": window, "filteredTotalCount": len(items), "totalCount": sum(map(len, indexes))}
+
+    def _server_query(self, tenant_subscription_id, customer_id, search, skip, take, filters):
+        params = {key: value for key, value in {**filters, "search": search, "skip": skip, "take": take}.items()
+                  if value not in (None, "", 0)}
+        params.setdefault("productTypes", ",".join(self.product_types))
+        return self.client.call(OFFERS_ENDPOINT, tenant_subscription_id=tenant_subscription_id,
+                                customer_id=customer_id, **params)
+
+    def invalidate(self):
+        with self._lock:
+            self._indexes.clear()
@@ -0,0 +1,595 @@
+"""Native asyncio client for the Hybr integration API.
+
+``HybrClient`` blocks a thread per request (its ``_async`` methods only move
+that thread off the event loop), so it does not scale to hundreds of
+concurrent calls inside an async service. ``AsyncHybrClient`` speaks HTTP/1.1
+over ``asyncio`` streams with a keep-alive connection pool and covers the same
+catalog (MS_CSP_APIS + REPORT_APIS) with the same snake-case methods::
+
+    import asyncio
+    from hybr_async import AsyncHybrClient, collect_csp_data
+
+    async def main():
+        async with AsyncHybrClient(base_url, app_id, username, password, max_in_flight=200) as client:
+            companies = await client.get_csp_mapped_companies()
+            await collect_csp_data(client, print, companies=companies, companies_in_flight=100)
+
+    asyncio.run(main())
+
+At most ``max_in_flight`` requests are on the wire at once; every attempt has
+its own ``timeout`` and is retried like ``HybrClient``. Cancelling a call
+(e.g. through ``asyncio.wait_for``) closes its connection and stops its
+retries. From the command line it collects every mapped company::
+
+    python hybr_async.py --base-url https://portal.hybr.cloudassert.com --app-id ... --username ... --output csp_data.jsonl
+"""
+import argparse
+import asyncio
+import getpass
+import http.client
+import inspect
+import io
+import json
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from csp_export import CspDataWriter
+from hybr_client import (
+    DEFAULT_PAGE_SIZE, MS_CSP_APIS, PAGED_ENDPOINTS, REPORT_APIS, RETRY_STATUSES, HybrClient, HybrSession,
+    RequestMetrics, ResponseCache, RetryPolicy, _snake_case, cache_identity, decode_body, endpoint_name, is_transient_error,
+    json_loads, parse_retry_after,
+)
+
+# ======== TRANSPORT =========
+class AsyncResponse:
+    """Status line and headers of a response read by ``AsyncHybrSession``."""
+
+    def __init__(self, status, reason, headers, wire_bytes):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.wire_bytes = wire_bytes
+
+    def getheader(self, name, default=None):
+        return self.headers.get(name, default)
+
+class AsyncHybrSession:
+    """Keep-alive HTTP/1.1 connections over asyncio streams.
+
+    Sends the same headers as ``HybrSession``, keeps up to ``pool_size`` idle
+    connections per host and raises ``urllib.error.HTTPError``/``URLError``
+    like it. A request that is cancelled mid-flight closes its connection
+    rather than returning a half-read stream to the pool.
+
+    Proxies are not supported: a host that ``getproxies()`` (or ``proxies``)
+    routes through a proxy is rejected with ``URLError`` instead of silently
+    connecting directly. Add it to ``no_proxy`` or use ``HybrClient``.
+    """
+
+    def __init__(self, username, password, pool_size=100, proxies=None):
+        self.headers = HybrSession(username, password, proxies={}).headers
+        self.pool_size = max(1, pool_size)
+        self.proxies = urllib.request.getproxies() if proxies is None else proxies
+        self._pools = {}
+
+    async def _connect(self, scheme, host):
+        if scheme not in ("http", "https"):
+            raise urllib.error.URLError(f"unknown url type: {scheme}")
+        if self.proxies.get(scheme) and not urllib.request.proxy_bypass_environment(host, self.proxies):
+            raise urllib.error.URLError(f"{scheme}_proxy is set but AsyncHybrSession does not support proxies; "
+                                        f"add {host} to no_proxy or use HybrClient")
+        parts = urllib.parse.urlsplit(f"//{host}")
+        port = parts.port or (443 if scheme == "https" else 80)
+        return await asyncio.open_connection(parts.hostname, port, ssl=True if scheme == "https" else None)
+
+    async def _read_body(self, reader, headers):
+        if headers.get("Transfer-Encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    # Skip any trailers up to the blank line
+                    while (await reader.readline()).strip():
+                        pass
+                    return b"".join(chunks), True
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+        if headers.get("Content-Length") is not None:
+            return await reader.readexactly(int(headers["Content-Length"])), True
+        # No framing: the body runs until the server closes the connection
+        return await reader.read(), False
+
+    async def _send(self, conn, method, target, host, body):
+        reader, writer = conn
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {host}"]
+        lines += [f"{name}: {value}" for name, value in self.headers.items()]
+        if body is not None:
+            lines.append(f"Content-Length: {len(body)}")
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + (body or b""))
+        await writer.drain()
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Remote end closed connection without response")
+        version, status, reason = (status_line.decode("latin-1").rstrip("\r\n").split(" ", 2) + [""])[:3]
+        headers = http.client.HTTPMessage()
+        while True:
+            line = await reader.readline()
+            if not line.strip():
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip()] = value.strip()
+
+        status = int(status)
+        if method == "HEAD" or status in (204, 304) or status < 200:
+            data, framed = b"", True
+        else:
+            data, framed = await self._read_body(reader, headers)
+        keep_alive = framed and version == "HTTP/1.1" and headers.get("Connection", "").lower() != "close"
+        return AsyncResponse(status, reason, headers, len(data)), data, keep_alive
+
+    async def request(self, method, url, body=None):
+        """Send a request and return ``(response, body_bytes)``."""
+        parts = urllib.parse.urlsplit(url)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        pool = self._pools.setdefault((parts.scheme, parts.netloc), [])
+
+        conn, reused = (pool.pop(), True) if pool else (None, False)
+        try:
+            if conn is None:
+                conn = await self._connect(parts.scheme, parts.netloc)
+            try:
+                res, data, keep_alive = await self._send(conn, method, target, parts.netloc, body)
+            except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError):
+                # An idle keep-alive connection may have been dropped by the server; retry once on a fresh one
+                conn[1].close()
+                if not reused:
+                    raise
+                conn = await self._connect(parts.scheme, parts.netloc)
+                res, data, keep_alive = await self._send(conn, method, target, parts.netloc, body)
+        except asyncio.CancelledError:
+            if conn is not None:
+                conn[1].close()
+            raise
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+            if conn is not None:
+                conn[1].close()
+            raise urllib.error.URLError(e)
+
+        if keep_alive and len(pool) < self.pool_size:
+            pool.append(conn)
+        else:
+            conn[1].close()
+
+        data = decode_body(res.getheader("Content-Encoding"), data)
+        if res.status >= 400:
+            raise urllib.error.HTTPError(url, res.status, res.reason, res.headers, io.BytesIO(data))
+        return res, data
+
+    async def close(self):
+        pools, self._pools = self._pools, {}
+        writers = [writer for pool in pools.values() for _, writer in pool]
+        for writer in writers:
+            writer.close()
+        await asyncio.gather(*(writer.wait_closed() for writer in writers), return_exceptions=True)
+
+# ======== CLIENT =========
+class AsyncHybrClient:
+    """asyncio client for the endpoints in MS_CSP_APIS and REPORT_APIS.
+
+    Construction does no I/O. Every catalog entry is exposed as a coroutine
+    method named after its endpoint in snake case, as on ``HybrClient``.
+    ``max_in_flight`` caps concurrent requests (a semaphore held only while a
+    request is on the wire, not while backing off); ``timeout`` bounds each
+    attempt. Identical concurrent GETs share one request.
+    """
+
+    # URL building is shared with the blocking client; it only needs base_url, app_id and metrics
+    build_url = HybrClient.build_url
+    prepare_request = HybrClient.prepare_request
+
+    def __init__(self, base_url, app_id, username, password, max_in_flight=100, timeout=60, max_retries=4,
+                 rate_limit=None, cache_size=256, cache_file=None):
+        self.base_url = base_url
+        self.app_id = app_id
+        self.max_in_flight = max(1, max_in_flight)
+        self.timeout = timeout
+        self.session = AsyncHybrSession(username, password, pool_size=self.max_in_flight)
+        self.retry_policy = RetryPolicy(max_retries=max_retries)
+        self.rate_limit = rate_limit
+        identity = cache_identity(base_url, self.session.headers["Authorization"])
+        self.cache = ResponseCache(cache_size, path=cache_file, identity=identity) if cache_size > 0 else None
+        self._semaphore = None  # created on first use, inside the running loop
+        self._next_slot = 0.0   # monotonic time before which no request may start (rate limit / throttling)
+        self._inflight = {}     # url -> [Task of the response, number of waiting callers]
+        self.coalesced_requests = 0
+        self.metrics = RequestMetrics()
+        for path in [api["path"] for api in MS_CSP_APIS + REPORT_APIS] + list(PAGED_ENDPOINTS):
+            self.metrics.add_template(path)
+
+    @property
+    def semaphore(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._semaphore
+
+    async def _wait_turn(self):
+        """Space requests ``1 / rate_limit`` apart and hold everyone back after a 429."""
+        now = time.monotonic()
+        start = max(now, self._next_slot)
+        if self.rate_limit:
+            self._next_slot = start + 1 / self.rate_limit
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def request_with_retries(self, method, url, template=None, timeout=None):
+        """Send a request, retrying throttling, 5xx, dropped connections and timeouts."""
+        template = template or self.metrics.template_for(url)
+        timeout = timeout or self.timeout
+        attempt = 0
+        while True:
+            await self._wait_turn()
+            async with self.semaphore:
+                started = time.perf_counter()
+                try:
+                    res, data = await asyncio.wait_for(self.session.request(method, url), timeout)
+                    self.metrics.record_request(template, res.status, res.wire_bytes, time.perf_counter() - started)
+                    return res, data
+                except urllib.error.HTTPError as e:
+                    self.metrics.record_request(template, e.code, 0, time.perf_counter() - started)
+                    if e.code not in RETRY_STATUSES or attempt >= self.retry_policy.max_retries:
+                        raise
+                    delay = self.retry_policy.delay(attempt, parse_retry_after(e.headers.get("Retry-After")))
+                    reason = f"HTTP {e.code}"
+                    if e.code == 429:
+                        # Hold back every request, not just this one
+                        self._next_slot = max(self._next_slot, time.monotonic() + delay)
+                except (urllib.error.URLError, asyncio.TimeoutError) as e:
+                    self.metrics.record_request(template, None, 0, time.perf_counter() - started)
+                    if isinstance(e, asyncio.TimeoutError):
+                        e = urllib.error.URLError(TimeoutError(f"timed out after {timeout}s"))
+                    if not is_transient_error(e) or attempt >= self.retry_policy.max_retries:
+                        raise e
+                    delay = self.retry_policy.delay(attempt)
+                    reason = str(e.reason)
+            attempt += 1
+            print(f"⏳ {reason} for {url}, retrying in {delay:.1f}s ({attempt}/{self.retry_policy.max_retries})")
+            await asyncio.sleep(delay)
+
+    async def make_request(self, url, method="GET", params=None, timeout=None):
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+
+        template = self.metrics.template_for(url)
+        cacheable = method == "GET" and self.cache is not None
+        try:
+            data = self.cache.get(url) if cacheable else None
+            if data is not None:
+                self.metrics.record_event(template, "cache_hits")
+            else:
+                if method == "GET":
+                    data = await self._fetch_coalesced(url, template, timeout)
+                else:
+                    data = (await self.request_with_retries(method, url, template, timeout))[1]
+                if cacheable:
+                    self.cache.put(url, data)
+            started = time.perf_counter()
+            try:
+                return json_loads(data)
+            except json.JSONDecodeError:
+                return data.decode("utf-8") if isinstance(data, bytes) else data
+            finally:
+                self.metrics.record_decode(template, time.perf_counter() - started)
+        except urllib.error.HTTPError as e:
+            print(f"❌ HTTP Error {e.code}: {e.reason}")
+            print(e.read().decode())
+        except urllib.error.URLError as e:
+            print(f"❌ URL Error: {e.reason}")
+        return None
+
+    async def _fetch_coalesced(self, url, template=None, timeout=None):
+        """GET ``url`` once no matter how many callers ask for it at the same time.
+
+        The request runs in its own task that every caller awaits through
+        ``asyncio.shield``, so cancelling one caller does not fail the others;
+        the request itself is cancelled once every caller has gone.
+        """
+        entry = self._inflight.get(url)
+        if entry is None:
+            task = asyncio.ensure_future(self.request_with_retries("GET", url, template, timeout))
+            entry = self._inflight[url] = [task, 0]
+            task.add_done_callback(lambda _: self._inflight.pop(url) if self._inflight.get(url) is entry else None)
+        else:
+            self.coalesced_requests += 1
+            self.metrics.record_event(template or self.metrics.template_for(url), "coalesced")
+
+        task = entry[0]
+        entry[1] += 1
+        try:
+            return (await asyncio.shield(task))[1]
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and not task.done():
+                task.cancel()
+
+    # --- Pagination ---
+    async def _fetch_page(self, url, spec, params, page_arg, page_size):
+        page_params = {**(params or {}), spec["page_param"]: page_arg, spec["size_param"]: page_size}
+        page = await self.make_request(url, params=page_params)
+        if not isinstance(page, dict) or not isinstance(page.get(spec["items_key"]), list):
+            print(f"❌ Failed to fetch page {spec['page_param']}={page_arg} of {url}")
+            return None
+        return page
+
+    async def iter_pages(self, url, spec, params=None, page_size=DEFAULT_PAGE_SIZE, window=1):
+        """Yield every page response of a paged endpoint, in order.
+
+        For ``skip`` endpoints every later page is requested as soon as the
+        total is known (``max_in_flight`` still applies). ``page`` endpoints
+        have no total, so ``window`` pages are requested at a time; the default
+        of 1 never fetches past the last page. Yields None and stops if a page
+        fails.
+        """
+        items_key = spec["items_key"]
+
+        def fetch(page_arg):
+            return asyncio.ensure_future(self._fetch_page(url, spec, params, page_arg, page_size))
+
+        if spec["style"] == "skip":
+            first = await self._fetch_page(url, spec, params, 0, page_size)
+            yield first
+            if first is None:
+                return
+            total = next((first[k] for k in spec.get("total_keys", []) if isinstance(first.get(k), int)), None)
+            if total is None:
+                return
+            tasks = [fetch(skip) for skip in range(page_size, total, page_size)]
+            try:
+                for task in tasks:
+                    page = await task
+                    yield page
+                    if page is None:
+                        return
+            finally:
+                for task in tasks:
+                    task.cancel()
+            return
+
+        next_page, previous = 1, None
+        while True:
+            tasks = [fetch(page) for page in range(next_page, next_page + window)]
+            next_page += window
+            try:
+                for task in tasks:
+                    page = await task
+                    if page is None:
+                        yield None
+                        return
+                    items = page[items_key]
+                    # Guard against endpoints that ignore the paging parameters and repeat the same page
+                    if previous is not None and items == previous:
+                        return
+                    yield page
+                    if len(items) < page_size:
+                        return
+                    previous = items
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    async def fetch_all_pages(self, url, spec, params=None, page_size=DEFAULT_PAGE_SIZE, window=1):
+        """Fetch a full result set page by page, in the shape of a single unpaged call; None if any page failed."""
+        result = None
+        pages = self.iter_pages(url, spec, params, page_size, window)
+        try:
+            async for page in pages:
+                if page is None:
+                    return None
+                if result is None:
+                    result = page
+                else:
+                    result[spec["items_key"]].extend(page[spec["items_key"]])
+        finally:
+            # Cancel any pages still in flight when stopping early
+            await pages.aclose()
+        return result
+
+    # --- Catalog calls ---
+    async def call(self, api, all_pages=False, page_size=DEFAULT_PAGE_SIZE, **inputs):
+        """Call a catalog entry (an entry dict, display name or endpoint) with keyword inputs.
+
+        ``all_pages`` pages through paged endpoints and returns the full result set.
+        Returns the decoded response, or None if the request failed. Raises
+        ValueError for an unknown API or invalid inputs.
+        """
+        path, url, params = self.prepare_request(api, inputs)
+        spec = PAGED_ENDPOINTS.get(path)
+        if all_pages and spec:
+            return await self.fetch_all_pages(url, spec, params, page_size)
+        return await self.make_request(url, params=params)
+
+    async def close(self):
+        await self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+def _add_endpoint_methods(api):
+    method_name = _snake_case(endpoint_name(api) or api["name"])
+    inputs = ", ".join(key for _, key in api.get("required_inputs", [])) or "none"
+
+    async def call(self, all_pages=False, page_size=DEFAULT_PAGE_SIZE, **kwargs):
+        return await self.call(api, all_pages=all_pages, page_size=page_size, **kwargs)
+
+    call.__name__ = method_name
+    call.__qualname__ = f"AsyncHybrClient.{method_name}"
+    call.__doc__ = f"{api['name']} (required inputs: {inputs})."
+    setattr(AsyncHybrClient, method_name, call)
+
+for _api in MS_CSP_APIS + REPORT_APIS:
+    _add_endpoint_methods(_api)
+
+# ======== COLLECTION =========
+OFFERS_PATH = "/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspOffersBySubscriptionIdFromDb/{{tenant_subscription_id}}/{{customer_id}}"
+
+async def collect_company_data(client, company, page_size=None):
+    """Fetch the profile, then licenses and offers concurrently, for one mapped company.
+
+    Returns the same record as Csp-Flow-Sample.py, or None if the company has to be skipped.
+    """
+    tenant_subscription_id = company.get("id")
+    if not tenant_subscription_id:
+        print(f"❌ Skipping company {company.get('Name', 'Unnamed')} due to missing TenantSubscriptionId.")
+        return None
+
+    customer_profile = await client.get_csp_customer_profile_by_subscription_id(tenant_subscription_id=tenant_subscription_id)
+    customer_id = customer_profile[0].get("Id") if customer_profile else None
+    if not customer_id:
+        print(f"❌ Skipping company {company.get('Name', 'Unnamed')} due to missing CustomerId.")
+        return None
+
+    paging = {"all_pages": bool(page_size), "page_size": page_size or DEFAULT_PAGE_SIZE}
+    # Like Csp-Flow-Sample.py, offers are fetched without a productTypes filter (which the catalog
+    # entry requires), so the URL is built directly
+    offers_url = client.build_url(OFFERS_PATH, {"tenant_subscription_id": tenant_subscription_id, "customer_id": customer_id})
+    licenses, offers = await asyncio.gather(
+        client.get_customer_licenses(customer_id=customer_id, **paging),
+        client.fetch_all_pages(offers_url, PAGED_ENDPOINTS[OFFERS_PATH], page_size=page_size) if page_size
+        else client.make_request(offers_url),
+    )
+    return {
+        "company": company,
+        "customer_profile": customer_profile,
+        "licenses": licenses,
+        "offers": [{"product_type": "OnlineServicesNCE", "offers": offers}],
+    }
+
+async def collect_csp_data(client, write, companies=None, companies_in_flight=50, queue_size=100, page_size=None):
+    """Collect every mapped company and pass each record to ``write``, in mapped-company order.
+
+    A producer feeds companies through a bounded queue to ``companies_in_flight``
+    fetch workers, and their records flow through a second bounded queue to
+    the writer. A slow writer therefore stalls fetching instead of piling up
+    records: at most ``queue_size + companies_in_flight`` companies are
+    collected but not yet written. ``write`` may be a function or a coroutine
+    function. Returns ``(written, skipped)``, or None if the mapped companies
+    could not be fetched. Cancelling the call cancels every worker.
+    """
+    if companies is None:
+        companies = await client.get_csp_mapped_companies()
+        if not isinstance(companies, list):
+            print("❌ No mapped companies found or API error.")
+            return None
+
+    jobs = asyncio.Queue(maxsize=queue_size)
+    results = asyncio.Queue(maxsize=queue_size)
+    # Released when a record is written, so out-of-order results waiting for a slow company stay bounded
+    window = asyncio.Semaphore(queue_size + companies_in_flight)
+
+    async def produce():
+        for position, company in enumerate(companies):
+            await window.acquire()
+            await jobs.put((position, company))
+        for _ in range(companies_in_flight):
+            await jobs.put(None)
+
+    async def fetch():
+        while True:
+            job = await jobs.get()
+            if job is None:
+                return
+            position, company = job
+            await results.put((position, await collect_company_data(client, company, page_size)))
+
+    async def drain():
+        pending, written, skipped = {}, 0, 0
+        for position in range(len(companies)):
+            while position not in pending:
+                done, record = await results.get()
+                pending[done] = record
+            record = pending.pop(position)
+            window.release()
+            if record is None:
+                skipped += 1
+                continue
+            result = write(record)
+            if inspect.isawaitable(result):
+                await result
+            written += 1
+        return written, skipped
+
+    tasks = [asyncio.ensure_future(produce())] + [asyncio.ensure_future(fetch()) for _ in range(companies_in_flight)]
+    writer = asyncio.ensure_future(drain())
+    try:
+        # gather fails fast if any stage raises; the finally block then cancels the rest
+        await asyncio.gather(writer, *tasks)
+        return writer.result()
+    finally:
+        for task in tasks + [writer]:
+            task.cancel()
+
+# ======== CLI =========
+async def collect_main(args):
+    """Collect into ``args.output``; returns False if nothing could be collected."""
+    client = AsyncHybrClient(args.base_url, args.app_id, args.username, args.password, max_in_flight=args.max_in_flight,
+                             timeout=args.timeout, max_retries=args.max_retries, rate_limit=args.rate_limit)
+    print(f"\n🔹 Collecting CSP Data for All Mapped Companies ({args.companies_in_flight} companies, "
+          f"up to {args.max_in_flight} requests in flight)...")
+    started = time.perf_counter()
+    async with client:
+        # Check the mapped companies before opening the writer, which would replace the previous output
+        companies = await client.get_csp_mapped_companies()
+        if not isinstance(companies, list):
+            print("❌ No mapped companies found or API error.")
+            return False
+        with CspDataWriter(args.output) as writer:
+            written, skipped = await collect_csp_data(client, writer.write, companies=companies,
+                                                      companies_in_flight=args.companies_in_flight,
+                                                      queue_size=args.queue_size, page_size=args.page_size)
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ {written} companies written to {args.output} in {elapsed:.1f}s ({skipped} skipped, "
+          f"{client.coalesced_requests} duplicate requests coalesced)")
+    if args.metrics_output:
+        client.metrics.write(args.metrics_output)
+        print(f"📈 Request metrics written to {args.metrics_output}")
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect CSP data for all mapped companies with the asyncio client.")
+    parser.add_argument('--base-url', required=True, help='Base URL for the API')
+    parser.add_argument('--app-id', required=True, help='Application ID')
+    parser.add_argument('--username', required=True, help='Username')
+    parser.add_argument('--password', help='Password (default: $HYBR_PASSWORD, else prompt)')
+    parser.add_argument('--output', default='csp_data.json', help='Output file; .jsonl for JSON Lines, .gz/.zst compresses it (default: csp_data.json)')
+    parser.add_argument('--max-in-flight', type=int, default=200, help='Maximum concurrent requests (default: 200)')
+    parser.add_argument('--companies-in-flight', type=int, default=100, help='Companies collected concurrently (default: 100)')
+    parser.add_argument('--queue-size', type=int, default=100, help='Bound of the queues between the fetch and write stages (default: 100)')
+    parser.add_argument('--timeout', type=float, default=60, help='Per-request timeout in seconds (default: 60)')
+    parser.add_argument('--max-retries', type=int, default=4, help='Retries for throttled (429), 5xx, failed and timed-out requests (default: 4)')
+    parser.add_argument('--rate-limit', type=float, help='Maximum requests per second')
+    parser.add_argument('--page-size', type=int, help='Page through paged endpoints (licenses, offers) with this page size')
+    parser.add_argument('--metrics-output', help='Write per-endpoint request metrics (.prom for Prometheus text, otherwise JSON)')
+    args = parser.parse_args()
+    args.password = args.password or os.environ.get("HYBR_PASSWORD") or getpass.getpass("Enter password: ").strip()
+
+    try:
+        collected = asyncio.run(collect_main(args))
+    except ImportError as e:
+        raise SystemExit(f"❌ {e}")
+    except KeyboardInterrupt:
+        raise SystemExit("\n❌ Collection cancelled.")
+    if not collected:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1319 @@
+"""Importable client for the Hybr integration API.
+
+Importing this module does no I/O: no argument parsing, prompts or network
+calls. A ``HybrClient`` opens connections on first use and keeps them warm,
+so long-running workers can reuse one client for many calls::
+
+    from hybr_client import HybrClient
+
+    with HybrClient("https://portal.hybr.cloudassert.com", app_id, username, password) as client:
+        companies = client.get_csp_mapped_companies()
+        top = client.top_customers_by_revenue(month=1, year=2025, numberOfItems=10, currency="USD")
+
+Every endpoint method has an ``_async`` twin for use from a running event loop;
+it runs the blocking call on a worker thread. For hundreds of concurrent calls
+from one event loop use ``hybr_async.AsyncHybrClient``.
+"""
+import asyncio
+import base64
+import email.utils
+import gzip
+import hashlib
+import http.client
+import io
+import json
+import queue
+import random
+import re
+import socket
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import zlib
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from types import MappingProxyType
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ======== JSON =========
+# orjson is used when installed; it parses bytes directly and is several times
+# faster on large offer catalogs. Its JSONDecodeError subclasses json's.
+def json_loads(data):
+    """Decode JSON from ``bytes`` or ``str``."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def json_dumps(obj):
+    """Compact JSON text (UTF-8, no indentation)."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+# -------------------------
+# Reference product types
+# -------------------------
+SOFTWARE_PRODUCT_TYPES = ["Software Subscription", "SUSE Linux", "Perpetual Software", "Red Hat Plans"]
+NCE_PRODUCT_TYPES = ["License", "OnlineServicesNCE"]
+AZURE_RESERVATION_PRODUCT_TYPES = ["Azure Reservation"]
+
+NCE_CATEGORIES = [
+    "Microsoft Entra","Dynamics 365","Enterprise","Exchange","Microsoft 365","Microsoft Defender",
+    "Microsoft Intune","Microsoft Teams","Office 365","OneDrive","Power Apps","Power Automate",
+    "Power BI","Project","Share Point","Visio","Windows","Others"
+]
+
+OFFER_CATEGORIES = ["Small business","Enterprise","Trial","Government","None"]
+OFFER_TYPE = ["Baseoffer","Addon"]
+OFFER_SEGMENTS = ["Commercial","GovernmentCommunityCloud","Education","Nonprofit"]
+AZURE_RESERVATION_TYPES = [
+    "App Services","Specialized Compute Azure VMware Solution","Azure Data Explorer","Azure Files Reserved Capacity",
+    "Backup","Azure storage reserved capacity","Azure Cosmos DB","Databricks","Data Factory","Dedicated Host",
+    "FabricCapacity","Azure Managed Disks","MDC","Azure Database for MySql","Nutanix","OpenAIPTU",
+    "Azure Database for PostgreSql","Azure Redis Cache - Premium","SapHana","Sql Databases",
+    "Azure Sql Data Warehouse","Synapse","Virtual Machines"
+]
+
+# ========== API GROUPS ==========
+
+MS_CSP_APIS = [
+    {"name": "Get CSP Mapped Companies HYBR Tenant Subscriptions",
+     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspMappedCompanies",
+     "required_inputs": [], "optional_params": ["connectionId"]},
+
+    {"name": "Get CSP Customer Profile By HYBR Subscription ID",
+     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspCustomerProfileBySubscriptionId/{{tenant_subscription_id}}",
+     "required_inputs": [("Tenant Subscription ID", "tenant_subscription_id")],
+     "optional_params": ["connectionId"]},
+
+    {"name": "getCspCustomerSubscriptionsByType",
+     "path": "{{sub_path}}",
+     "required_inputs": [("Tenant Subscription ID", "tenant_subscription_id"), ("Customer ID", "customer_id")],
+     "optional_params": ["subscriptionType", "status"],
+     "reference_values": {
+         "subscriptionType": ["ServiceProvider", "Reseller", "Customer"],
+         "status": ["1 - Active", "2 - Suspended", "3 - Deleted", "6 - Disabled"]
+     }},
+
+    {"name": "Get CSP Customer Licenses By CSP Customer ID",
+     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/licenses/getCustomerLicenses/{{customer_id}}",
+     "required_inputs": [("Customer ID", "customer_id")],
+     "optional_params": ["page", "page_Size"]},
+
+    {"name": "Get CSP Product Types By HYBR Tenant Subscription ID",
+     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/companies/cspProductTypes/{{tenant_subscription_id}}",
+     "required_inputs": [("Tenant Subscription ID", "tenant_subscription_id")],
+     "optional_params": ["connectionId"]},
+
+    {"name": "Get CSP Categories By HYBR Tenant Subscription ID",
+     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspCategories/{{tenant_subscription_id}}",
+     "required_inputs": [("Tenant Subscription ID", "tenant_subscription_id")],
+     "optional_params": ["connectionId"]},
+
+    {"name": "Get CSP Offers By HYBR Tenant Subscription ID",
+     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspOffersBySubscriptionIdFromDb/{{tenant_subscription_id}}/{{customer_id}}",
+     "required_inputs": [("Tenant Subscription ID", "tenant_subscription_id"), ("Customer ID", "customer_id"), ("productTypes", "productTypes")],
+     "optional_params": ["connectionId", "reservationProductTypes", "cspOfferCategories", "offerType", "segments", "search", "skip", "take"],
+     "reference_values": {
+         "productTypes": SOFTWARE_PRODUCT_TYPES + NCE_PRODUCT_TYPES + AZURE_RESERVATION_PRODUCT_TYPES,
+         "reservationProductTypes": AZURE_RESERVATION_TYPES,
+         "cspOfferCategories": OFFER_CATEGORIES,
+         "offerType": OFFER_TYPE,
+         "segments": OFFER_SEGMENTS
+     }}
+]
+
+REPORT_APIS = [
+    #{"name": "List Subscriptions", "path": "/api/integrations/{{appId}}/admin/service/core/subscriptions", "inputs": {}},
+    {"name": "Get Subscriptions and their Relationships",
+     "path": "/api/integrations/{{appId}}/admin/service/core/subscriptions/subscriptionRelationships"},
+
+    {"name": "List Available Currency Codes", "path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/availableCurrencySymbols",
+     "required_inputs": [("Month", "month"), ("Year", "year")],
+     "optional_params": ["parentSubscriptionId"]},
+
+    {"name": "Top Products By Revenue",
+     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/topProductsByRevenue",
+     "required_inputs": [("Month", "month"), ("Year", "year"), ("Number Of Items", "numberOfItems"), ("Currency", "currency")],
+     "optional_params": ["parentSubscriptionId"]},
+
+    {"name": "Top Customers By Revenue",
+     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/topCustomersByRevenue",
+     "required_inputs": [("Month", "month"), ("Year", "year"), ("Number Of Items", "numberOfItems"), ("Currency", "currency")],
+     "optional_params": ["parentSubscriptionId"]},
+
+    {"name": "Monthly Reseller Margin",
+     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/monthlyResellerMargin",
+     "required_inputs": [("Month", "month"), ("Year", "year"), ("Currency", "currency")],
+     "optional_params": ["parentSubscriptionId"]},
+
+    {"name": "Monthly Reseller Margin Per Resource",
+     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/monthlyResellerMarginPerResource",
+     "required_inputs": [("Month", "month"), ("Year", "year"), ("Currency", "currency")],
+     "optional_params": ["parentSubscriptionId"]},
+
+    {"name": "Monthly Reseller Margin Per Subscription",
+     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/monthlyResellerMarginPerSubscription",
+     "required_inputs": [("Month", "month"), ("Year", "year"), ("Currency", "currency")],
+     "optional_params": ["parentSubscriptionId"]},
+
+    {"name": "Monthly Products Reseller Margin By Subscription",
+     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/monthlyProductsResellerMarginBySubscription",
+     "required_inputs": [("Month", "month"), ("Year", "year"), ("Tenant Subscription ID", "customerSubscriptionId"), ("Currency", "currency")]},
+
+     #{"name": "Monthly Subscription Reseller Margin By Product",
+     #"path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/monthlySubscriptionResellerMarginByProduct",
+     #"required_inputs": [("Month", "month"), ("Year", "year"), ("Metered Resource Name", "meteredResourceName"), ("Currency", "currency")],
+     #"optional_params": ["parentSubscriptionId"], "inputs": {}},
+
+    {"name": "Current Month Estimate",
+     "path": "/api/integrations/{{appId}}/admin/service/billing/csp/reports/estimatedCostByServiceTypePerCustomer",
+     "required_inputs": [("Tenant Subscription ID", "customerSubscriptionId"), ("Month", "month"), ("Year", "year")]}
+]
+
+def _freeze(value):
+    """Read-only copy of a catalog value: dicts become mapping proxies, lists tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(val) for key, val in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(val) for val in value)
+    return value
+
+# The catalog is shared by every client and importer, so it is read-only; callers keep their own inputs
+MS_CSP_APIS = _freeze(MS_CSP_APIS)
+REPORT_APIS = _freeze(REPORT_APIS)
+
+def endpoint_name(api):
+    """The endpoint of a catalog entry (last fixed path segment), or None for dynamic paths."""
+    segments = [seg for seg in api["path"].split("/") if seg and "{{" not in seg]
+    return segments[-1] if segments else None
+
+def find_api(name):
+    """Look up a catalog entry by its display name or by its endpoint."""
+    endpoint = ENDPOINTS.get(name)
+    return endpoint.api if endpoint is not None else None
+
+# ======== TRANSPORT =========
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+MAX_REDIRECTS = 5
+
+class HybrSession:
+    """Reusable HTTP session for the Hybr portal.
+
+    Keeps up to ``pool_size`` idle keep-alive connections per host and builds
+    the Basic auth headers once, so repeated calls skip the TCP/TLS handshake.
+    Errors are raised as ``urllib.error.HTTPError``/``URLError`` to match
+    ``urlopen``.
+
+    Like ``urlopen`` it honours the proxy settings from
+    ``urllib.request.getproxies()`` (``http_proxy``, ``https_proxy``,
+    ``no_proxy``) unless ``proxies`` is given, and follows redirects, but
+    only to the same scheme and host so the credentials never leave it.
+    """
+
+    def __init__(self, username, password, pool_size=4, timeout=None, proxies=None):
+        auth_b64 = base64.b64encode(f"{username}:{password}".encode()).decode()
+        self.headers = {
+            "Authorization": f"Basic {auth_b64}",
+            "Content-Type": "application/json",
+            "User-Agent": f"Python-urllib/{urllib.request.__version__}",
+            "Accept-Encoding": "gzip, deflate",
+        }
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.proxies = urllib.request.getproxies() if proxies is None else proxies
+        self._pools = {}
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def _pool(self, scheme, host):
+        with self._lock:
+            pool = self._pools.get((scheme, host))
+            if pool is None:
+                pool = self._pools[(scheme, host)] = queue.LifoQueue(maxsize=self.pool_size)
+            return pool
+
+    def _route(self, scheme, host):
+        """``(proxy host, proxy headers)`` for requests to ``host``, or None to connect directly."""
+        key = (scheme, host)
+        if key not in self._routes:
+            proxy = self.proxies.get(scheme)
+            if not proxy or urllib.request.proxy_bypass_environment(host, self.proxies):
+                self._routes[key] = None
+            else:
+                parts = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+                if parts.scheme != "http":
+                    raise urllib.error.URLError(f"unsupported proxy type: {parts.scheme}")
+                headers = {}
+                if parts.username is not None:
+                    credentials = urllib.parse.unquote(parts.username) + ":" + urllib.parse.unquote(parts.password or "")
+                    headers["Proxy-Authorization"] = "Basic " + base64.b64encode(credentials.encode()).decode()
+                self._routes[key] = (parts.netloc.rpartition("@")[2], headers)
+        return self._routes[key]
+
+    def _new_connection(self, scheme, host):
+        if scheme not in ("http", "https"):
+            raise urllib.error.URLError(f"unknown url type: {scheme}")
+        route = self._route(scheme, host)
+        if route is None:
+            connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+            return connection_class(host, timeout=self.timeout)
+        proxy_host, proxy_headers = route
+        if scheme == "https":
+            # CONNECT through the proxy; TLS is still end to end
+            conn = http.client.HTTPSConnection(proxy_host, timeout=self.timeout)
+            conn.set_tunnel(host, headers=proxy_headers)
+            return conn
+        return http.client.HTTPConnection(proxy_host, timeout=self.timeout)
+
+    def _send(self, conn, method, target, body, headers):
+        conn.request(method, target, body=body, headers=headers)
+        res = conn.getresponse()
+        return res, res.read()
+
+    def request(self, method, url, body=None):
+        """Send a request and return ``(response, body_bytes)``, following same-host redirects."""
+        for _ in range(MAX_REDIRECTS + 1):
+            res, data = self._request_once(method, url, body)
+            location = res.getheader("Location") if res.status in REDIRECT_STATUSES else None
+            if not location:
+                break
+            target = urllib.parse.urljoin(url, location)
+            old, new = urllib.parse.urlsplit(url), urllib.parse.urlsplit(target)
+            if (new.scheme, new.netloc) != (old.scheme, old.netloc):
+                raise urllib.error.HTTPError(url, res.status, f"{res.reason} (redirect to {target} not followed)",
+                                             res.headers, io.BytesIO(data))
+            if res.status not in (307, 308) and method != "HEAD":
+                method, body = "GET", None
+            url = target
+        else:
+            raise urllib.error.HTTPError(url, res.status, f"{res.reason} (more than {MAX_REDIRECTS} redirects)",
+                                         res.headers, io.BytesIO(data))
+        if res.status >= 400:
+            raise urllib.error.HTTPError(url, res.status, res.reason, res.headers, io.BytesIO(data))
+        return res, data
+
+    def _request_once(self, method, url, body):
+        parts = urllib.parse.urlsplit(url)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        pool = self._pool(parts.scheme, parts.netloc)
+        headers = self.headers
+        route = self._route(parts.scheme, parts.netloc) if parts.scheme == "http" else None
+        if route is not None:
+            # Plain HTTP through a proxy: absolute-form target, proxy credentials on every request
+            target = f"{parts.scheme}://{parts.netloc}{target}"
+            headers = {**headers, **route[1]}
+
+        try:
+            conn, reused = pool.get_nowait(), True
+        except queue.Empty:
+            conn, reused = self._new_connection(parts.scheme, parts.netloc), False
+
+        try:
+            try:
+                res, data = self._send(conn, method, target, body, headers)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # An idle keep-alive connection may have been dropped by the server; retry once on a fresh one
+                conn.close()
+                if not reused:
+                    raise
+                conn = self._new_connection(parts.scheme, parts.netloc)
+                res, data = self._send(conn, method, target, body, headers)
+        except (OSError, http.client.HTTPException) as e:
+            conn.close()
+            raise urllib.error.URLError(e)
+
+        if res.will_close:
+            conn.close()
+        else:
+            try:
+                pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+        res.wire_bytes = len(data)
+        return res, decode_body(res.getheader("Content-Encoding"), data)
+
+    def close(self):
+        with self._lock:
+            pools, self._pools = self._pools, {}
+        for pool in pools.values():
+            while not pool.empty():
+                pool.get_nowait().close()
+
+def decode_body(content_encoding, data):
+    """Undo a gzip or deflate Content-Encoding.
+
+    A truncated or corrupt body raises ``URLError``, so it fails the request
+    like any other transport error.
+    """
+    encoding = (content_encoding or "").strip().lower()
+    if not data or encoding in ("", "identity"):
+        return data
+    try:
+        if encoding in ("gzip", "x-gzip"):
+            return gzip.decompress(data)
+        if encoding == "deflate":
+            try:
+                return zlib.decompress(data)
+            except zlib.error:
+                # Some servers send raw deflate without the zlib header
+                return zlib.decompress(data, -zlib.MAX_WBITS)
+    except (zlib.error, EOFError, OSError) as e:
+        raise urllib.error.URLError(f"could not decode {encoding} response body: {e}")
+    raise urllib.error.URLError(f"unsupported Content-Encoding: {content_encoding}")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, honouring Retry-After when the portal sends one.
+
+    No delay exceeds ``max_backoff``, not even a longer Retry-After.
+    """
+
+    def __init__(self, max_retries=4, backoff=0.5, max_backoff=30):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def delay(self, attempt, retry_after=None):
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+def is_transient_error(error):
+    """True if a URLError is worth retrying: a refused, reset or dropped connection or a timeout.
+
+    An unknown URL type, a host that does not resolve or a TLS certificate
+    failure will fail the same way again, so those are not retried.
+    """
+    reason = error.reason if isinstance(error, urllib.error.URLError) else error
+    if isinstance(reason, socket.gaierror):
+        # Only a temporary resolver failure, not NXDOMAIN
+        return reason.errno == socket.EAI_AGAIN
+    return isinstance(reason, (ConnectionError, TimeoutError, http.client.HTTPException, asyncio.IncompleteReadError))
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class RateLimiter:
+    """Token bucket shared by every worker thread.
+
+    Callers reserve a token and sleep until it is due, so concurrent
+    collection is spread evenly at ``rate`` requests per second.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        with self._lock:
+            self._refill()
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Hold back every caller for ``seconds``, e.g. after the portal throttled us."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+# Seconds to cache GET responses per endpoint (last path segment before the inputs).
+# Only slow-changing reference data is listed; everything else always hits the portal.
+CACHE_TTLS = {
+    "cspProductTypes": 3600,
+    "getCspCategories": 3600,
+    "availableCurrencySymbols": 3600,
+    "subscriptionRelationships": 600,
+}
+
+def cache_identity(base_url, authorization):
+    """Short hash of a portal and the credentials used on it; see ResponseCache."""
+    return hashlib.sha256(f"{base_url}\n{authorization}".encode()).hexdigest()[:16]
+
+class ResponseCache:
+    """TTL + LRU cache of raw GET response bodies, keyed on the final URL.
+
+    Entries live in memory (at most ``max_entries``, least recently used
+    evicted first) and, if ``path`` is given, in a SQLite file so cached
+    reference data is shared between runs. Keys are prefixed with
+    ``identity`` (a ``cache_identity`` hash), so one file shared by several
+    portals or users never answers one with another's responses. Expired
+    rows are deleted when the file is opened and when they are looked up.
+    """
+
+    def __init__(self, max_entries=256, ttls=None, path=None, identity=""):
+        self.max_entries = max_entries
+        self.ttls = CACHE_TTLS if ttls is None else ttls
+        self._prefix = f"{identity} "
+        self._entries = OrderedDict()  # identity + url -> (expires_at, body)
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, expires_at REAL NOT NULL, body TEXT NOT NULL)")
+            self._db.execute("DELETE FROM responses WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    def ttl_for(self, url):
+        segments = urllib.parse.urlsplit(url).path.split("/")
+        return max((self.ttls.get(segment, 0) for segment in segments), default=0)
+
+    def get(self, url):
+        key = self._prefix + url
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute("SELECT expires_at, body FROM responses WHERE url = ?", (key,)).fetchone()
+                entry = tuple(row) if row else None
+            if entry is None:
+                return None
+            if entry[0] <= now:
+                self._entries.pop(key, None)
+                if self._db is not None:
+                    self._db.execute("DELETE FROM responses WHERE url = ?", (key,))
+                    self._db.commit()
+                return None
+            self._store(key, entry)
+            return entry[1]
+
+    def put(self, url, body):
+        ttl = self.ttl_for(url)
+        if ttl <= 0 or self.max_entries <= 0:
+            return
+        key = self._prefix + url
+        entry = (time.time() + ttl, body)
+        with self._lock:
+            self._store(key, entry)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, *entry))
+                self._db.commit()
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, pattern=None):
+        """Drop every entry of this identity, or only those whose URL contains ``pattern``."""
+        prefix = self._prefix
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix) and (pattern is None or pattern in k[len(prefix):])]:
+                del self._entries[key]
+            if self._db is not None:
+                self._db.execute(
+                    "DELETE FROM responses WHERE substr(url, 1, ?) = ? AND instr(substr(url, ?), ?) > 0",
+                    (len(prefix), prefix, len(prefix) + 1, pattern or ""),
+                )
+                self._db.commit()
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+
+# Thread budget of the current thread. A pool started inside a pool worker (a Flow per
+# company, page prefetch per result set) shares its parent's threads instead of multiplying them.
+_budget = threading.local()
+
+def available_workers(workers):
+    """``workers``, capped by the thread budget of the pool the caller runs in (if any)."""
+    limit = getattr(_budget, "workers", None)
+    return max(1, min(workers, limit) if limit is not None else workers)
+
+def _with_budget(func, budget):
+    """Wrap func so pools it starts get at most ``budget`` threads."""
+    def run(*args):
+        outer = getattr(_budget, "workers", None)
+        _budget.workers = budget
+        try:
+            return func(*args)
+        finally:
+            _budget.workers = outer
+    return run
+
+def ordered_map(func, items, workers):
+    """Run func over items on a thread pool, yielding results in input order.
+
+    At most ``workers * 2`` calls are in flight at once, so a long item list does
+    not queue every request up front. Nested calls share the threads: inside a
+    pool of N threads with a budget of B, each call of func may use B // N.
+    """
+    budget = available_workers(workers)
+    if hasattr(items, "__len__"):
+        workers = max(1, min(budget, len(items)))
+    else:
+        workers = budget
+    func = _with_budget(func, max(1, budget // workers))
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+# ======== METRICS =========
+def template_pattern(path):
+    """Regex matching the concrete URL paths built from a ``{{param}}`` path template."""
+    return re.compile("[^/]+".join(re.escape(part) for part in re.split(r"{{\w+}}", path)) + "$")
+
+def _percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list (None if empty)."""
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))]
+
+def _prom_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class RequestMetrics:
+    """Per-endpoint request statistics, keyed by path template rather than concrete URL.
+
+    Every attempt (including retries) counts as a request with its status
+    code, bytes received and latency; JSON decode time, cache hits and
+    coalesced requests are tracked separately. Latency samples are kept up to
+    ``max_samples`` per endpoint, then reservoir-sampled. ``merge`` folds in a
+    summary written with ``samples=True`` by another process (e.g. a shard).
+    """
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, max_samples=10000):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._templates = {}  # path template -> compiled pattern
+        self._template_order = []
+
+    def add_template(self, path):
+        """Register a path template so concrete URLs built from it are grouped under it."""
+        if path in self._templates:
+            return
+        with self._lock:
+            if path not in self._templates:
+                self._templates[path] = template_pattern(path)
+                # Try the most specific templates (most literal text) first
+                self._template_order = sorted(self._templates, key=lambda t: -len(re.sub(r"{{\w+}}", "", t)))
+
+    def template_for(self, url):
+        path = urllib.parse.urlsplit(url).path
+        for template in self._template_order:
+            if self._templates[template].match(path):
+                return template
+        return path
+
+    def _endpoint(self, template):
+        endpoint = self._endpoints.get(template)
+        if endpoint is None:
+            endpoint = self._endpoints[template] = {
+                "count": 0, "errors": 0, "statuses": {}, "bytes": 0, "cache_hits": 0, "coalesced": 0,
+                "latency": [], "latency_sum": 0.0, "decodes": 0, "decode": [], "decode_sum": 0.0,
+            }
+        return endpoint
+
+    def _sample(self, samples, seen, value):
+        if len(samples) < self.max_samples:
+            samples.append(value)
+        else:
+            i = random.randrange(seen)
+            if i < self.max_samples:
+                samples[i] = value
+
+    def record_request(self, template, status, nbytes, seconds):
+        """One attempt: ``status`` is the HTTP status, or None for a connection error."""
+        with self._lock:
+            endpoint = self._endpoint(template)
+            endpoint["count"] += 1
+            key = str(status) if status is not None else "error"
+            endpoint["statuses"][key] = endpoint["statuses"].get(key, 0) + 1
+            if status is None or status >= 400:
+                endpoint["errors"] += 1
+            endpoint["bytes"] += nbytes
+            endpoint["latency_sum"] += seconds
+            self._sample(endpoint["latency"], endpoint["count"], seconds)
+
+    def record_decode(self, template, seconds):
+        with self._lock:
+            endpoint = self._endpoint(template)
+            endpoint["decodes"] += 1
+            endpoint["decode_sum"] += seconds
+            self._sample(endpoint["decode"], endpoint["decodes"], seconds)
+
+    def record_event(self, template, event):
+        """Count a ``cache_hits`` or ``coalesced`` event for an endpoint."""
+        with self._lock:
+            self._endpoint(template)[event] += 1
+
+    def summary(self, samples=False):
+        """Plain-data snapshot: ``{template: {count, errors, statuses, bytes, ..., latency_ms, decode_ms}}``.
+
+        ``samples`` adds the raw latency and decode samples (in seconds), which ``merge`` needs.
+        """
+        result = {}
+        with self._lock:
+            for template, endpoint in self._endpoints.items():
+                entry = {k: endpoint[k] for k in ("count", "errors", "bytes", "cache_hits", "coalesced", "decodes")}
+                entry["statuses"] = dict(endpoint["statuses"])
+                entry["latency_sum_s"] = endpoint["latency_sum"]
+                entry["decode_sum_s"] = endpoint["decode_sum"]
+                for key, values in (("latency_ms", endpoint["latency"]), ("decode_ms", endpoint["decode"])):
+                    ordered = sorted(values)
+                    entry[key] = {
+                        f"p{int(q * 100)}": None if not ordered else round(_percentile(ordered, q) * 1000, 3)
+                        for q in self.QUANTILES
+                    }
+                if samples:
+                    entry["latency_samples_s"] = list(endpoint["latency"])
+                    entry["decode_samples_s"] = list(endpoint["decode"])
+                result[template] = entry
+        return result
+
+    def merge(self, summary):
+        """Add the counts and samples of a ``summary(samples=True)`` snapshot to these metrics."""
+        with self._lock:
+            for template, entry in summary.items():
+                endpoint = self._endpoint(template)
+                for key in ("count", "errors", "bytes", "cache_hits", "coalesced", "decodes"):
+                    endpoint[key] += entry[key]
+                for status, n in entry["statuses"].items():
+                    endpoint["statuses"][status] = endpoint["statuses"].get(status, 0) + n
+                endpoint["latency_sum"] += entry["latency_sum_s"]
+                endpoint["decode_sum"] += entry["decode_sum_s"]
+                for key, samples_key in (("latency", "latency_samples_s"), ("decode", "decode_samples_s")):
+                    merged = endpoint[key] + entry.get(samples_key, [])
+                    endpoint[key] = random.sample(merged, self.max_samples) if len(merged) > self.max_samples else merged
+
+    def to_prometheus(self):
+        """The summary in Prometheus text exposition format."""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_prom_label(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+
+        summary = self.summary()
+        metric("hybr_requests_total", "counter", "Requests sent, by endpoint and status (each retry counts).", [
+            ({"endpoint": t, "status": status}, n) for t, e in summary.items() for status, n in e["statuses"].items()])
+        metric("hybr_request_errors_total", "counter", "Requests that failed with an HTTP error or connection error.", [
+            ({"endpoint": t}, e["errors"]) for t, e in summary.items()])
+        metric("hybr_response_bytes_total", "counter", "Response body bytes received.", [
+            ({"endpoint": t}, e["bytes"]) for t, e in summary.items()])
+        metric("hybr_cache_hits_total", "counter", "Responses served from the response cache.", [
+            ({"endpoint": t}, e["cache_hits"]) for t, e in summary.items()])
+        metric("hybr_coalesced_requests_total", "counter", "Requests that shared an identical in-flight request.", [
+            ({"endpoint": t}, e["coalesced"]) for t, e in summary.items()])
+        for name, key, count_key, sum_key, help_text in (
+            ("hybr_request_latency_seconds", "latency_ms", "count", "latency_sum_s", "Request latency."),
+            ("hybr_json_decode_seconds", "decode_ms", "decodes", "decode_sum_s", "JSON decode time of response bodies."),
+        ):
+            metric(name, "summary", help_text, [
+                ({"endpoint": t, "quantile": q}, e[key][f"p{int(q * 100)}"] / 1000)
+                for t, e in summary.items() for q in self.QUANTILES if e[key][f"p{int(q * 100)}"] is not None])
+            for t, e in summary.items():
+                lines.append(f'{name}_sum{{endpoint="{_prom_label(t)}"}} {e[sum_key]}')
+                lines.append(f'{name}_count{{endpoint="{_prom_label(t)}"}} {e[count_key]}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, samples=False):
+        """Write the summary as Prometheus text (``.prom``/``.txt``) or JSON (anything else, with raw samples if ``samples``)."""
+        with open(path, "w") as f:
+            if path.endswith((".prom", ".txt")):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.summary(samples), f, indent=2)
+
+    def print_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        print("\n📈 Requests per endpoint:")
+        for template, e in sorted(summary.items(), key=lambda item: -item[1]["latency_sum_s"]):
+            latency, decode = e["latency_ms"], e["decode_ms"]
+            statuses = ", ".join(f"{status}: {n}" for status, n in sorted(e["statuses"].items()))
+            print(f" - {endpoint_name({'path': template}) or template}: {e['count']} requests ({statuses or 'none sent'}), "
+                  f"{e['errors']} errors, {e['bytes'] / 1024:.1f} KiB")
+            if e["count"]:
+                print(f"     latency p50/p95/p99 {latency['p50']}/{latency['p95']}/{latency['p99']} ms, "
+                      f"decode p50/p99 {decode['p50']}/{decode['p99']} ms, "
+                      f"{e['cache_hits']} cache hits, {e['coalesced']} coalesced")
+
+# ======== FLOWS =========
+class Step:
+    """One node of a Flow: ``func`` is called with the fields named in ``needs``
+    and its return value becomes the field ``name``."""
+
+    def __init__(self, name, func, needs=()):
+        self.name = name
+        self.func = func
+        self.needs = tuple(needs)
+
+class Flow:
+    """Runs a set of Steps as a dependency graph.
+
+    A step starts as soon as every field it needs is known, so independent
+    branches (e.g. licenses and offers of one customer) run concurrently on up
+    to ``workers`` threads (default: one per step, within the caller's thread
+    budget; see ``ordered_map``). A step whose input is None (a failed or missing
+    upstream result) is skipped and yields None itself. Fields that no step
+    produces are the flow's inputs and must be passed to ``run``.
+    """
+
+    def __init__(self, steps):
+        self.steps = list(steps)
+        produced = [step.name for step in self.steps]
+        if len(set(produced)) != len(produced):
+            raise ValueError("Flow step names must be unique")
+        self.inputs = {need for step in self.steps for need in step.needs} - set(produced)
+
+        # Topological order for sequential runs; also rejects cycles up front
+        self._order, known, remaining = [], set(self.inputs), list(self.steps)
+        while remaining:
+            ready = [step for step in remaining if known.issuperset(step.needs)]
+            if not ready:
+                raise ValueError(f"Flow has a dependency cycle between: {', '.join(step.name for step in remaining)}")
+            self._order.extend(ready)
+            known.update(step.name for step in ready)
+            remaining = [step for step in remaining if step not in ready]
+
+    @staticmethod
+    def _run_step(step, args):
+        if any(value is None for value in args.values()):
+            return None
+        return step.func(**args)
+
+    def run(self, workers=None, **inputs):
+        """Run every step and return all fields (inputs plus one per step)."""
+        missing = self.inputs - inputs.keys()
+        if missing:
+            raise KeyError(f"Missing flow inputs: {', '.join(sorted(missing))}")
+        fields = dict(inputs)
+        budget = available_workers(workers or len(self.steps))
+        workers = min(budget, len(self.steps))
+        run_step = _with_budget(self._run_step, max(1, budget // max(1, workers)))
+        if workers <= 1:
+            for step in self._order:
+                fields[step.name] = run_step(step, {need: fields[need] for need in step.needs})
+            return fields
+
+        pending, running = list(self._order), {}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while pending or running:
+                for step in [step for step in pending if all(need in fields for need in step.needs)]:
+                    pending.remove(step)
+                    running[executor.submit(run_step, step, {need: fields[need] for need in step.needs})] = step
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    fields[running.pop(future).name] = future.result()
+        return fields
+
+# ======== PAGINATION =========
+# Paging style per path template:
+#   "page" - 1-based page number + page size, no total in the response; read until a short page
+#   "skip" - item offset + page size, response carries the total so later pages are prefetched
+PAGED_ENDPOINTS = {
+    "/api/integrations/{{appId}}/admin/service/billing/csp/licenses/getCustomerLicenses/{{customer_id}}": {
+        "style": "page", "page_param": "page", "size_param": "page_Size", "items_key": "Licenses"},
+    "/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspOffersBySubscriptionIdFromDb/{{tenant_subscription_id}}/{{customer_id}}": {
+        "style": "skip", "page_param": "skip", "size_param": "take", "items_key": "items",
+        "total_keys": ["filteredTotalCount", "totalCount"]},
+}
+DEFAULT_PAGE_SIZE = 100
+
+# ======== ENDPOINT REGISTRY =========
+class PathTemplate:
+    """A ``{{param}}`` path template parsed once into its literal text and parameter names.
+
+    ``expand`` only joins the precomputed pieces, so building a URL costs no
+    regex or ``str.format`` per call.
+    """
+
+    def __init__(self, template):
+        pieces = re.split(r"{{(\w+)}}", template)
+        self.template = template
+        self.literals = pieces[0::2]
+        self.params = tuple(pieces[1::2])
+
+    def expand(self, values):
+        """Fill in the parameters from ``values``; raises KeyError for a missing one."""
+        parts = [self.literals[0]]
+        for name, literal in zip(self.params, self.literals[1:]):
+            parts.append(str(values[name]))
+            parts.append(literal)
+        return "".join(parts)
+
+_PATH_TEMPLATES = {}
+
+def compile_path(template):
+    """The PathTemplate for a path template string, parsed on first use."""
+    compiled = _PATH_TEMPLATES.get(template)
+    if compiled is None:
+        compiled = _PATH_TEMPLATES[template] = PathTemplate(template)
+    return compiled
+
+class Endpoint:
+    """A catalog entry compiled when the module loads.
+
+    Knows its path template and path parameters, the inputs it sends as
+    query parameters and its paging style (``paging`` is its PAGED_ENDPOINTS
+    spec or None), so inputs can be checked before any request is made.
+    """
+
+    def __init__(self, api):
+        self.api = api
+        self.name = api["name"]
+        self.endpoint = endpoint_name(api)
+        self.path = compile_path(api["path"])
+        self.required = [key for _, key in api.get("required_inputs", [])]
+        self.path_params = [key for key in self.path.params if key != "appId"]
+        self.query_params = [key for key in dict.fromkeys([*self.required, *api.get("optional_params", ())])
+                             if key not in self.path_params]
+        self.inputs = frozenset(self.required + self.path_params + self.query_params)
+        self.paging = PAGED_ENDPOINTS.get(api["path"])
+
+    def validate(self, inputs):
+        """Return the inputs as strings without empty values; raises ValueError naming every problem."""
+        cleaned, problems = {}, []
+        for key, val in inputs.items():
+            if val is None or val == "":
+                continue
+            if key not in self.inputs:
+                problems.append(f"unknown input {key!r}")
+            elif isinstance(val, (dict, list, tuple, set)):
+                problems.append(f"{key} must be a single value, not a {type(val).__name__}")
+            else:
+                cleaned[key] = str(val)
+        missing = [key for key in dict.fromkeys(self.required + self.path_params) if inputs.get(key) in (None, "")]
+        if missing:
+            problems.insert(0, f"missing required input {', '.join(missing)}")
+        if problems:
+            accepted = ", ".join(sorted(self.inputs)) or "none"
+            raise ValueError(f"{self.endpoint or self.name}: {'; '.join(problems)} (accepted inputs: {accepted})")
+        return cleaned
+
+    def split(self, inputs):
+        """Validate inputs and split them into ``(path template, path values, query params)``.
+
+        A ``sub_path`` input replaces the path template, as for
+        getCspCustomerSubscriptionsByType.
+        """
+        inputs = self.validate(inputs)
+        template = compile_path(inputs.pop("sub_path")) if "sub_path" in inputs else self.path
+        missing = [key for key in template.params if key != "appId" and key not in inputs]
+        if missing:
+            raise ValueError(f"{self.endpoint or self.name}: missing required input {', '.join(missing)}")
+        path_values = {key: inputs.pop(key) for key in template.params if key in inputs}
+        return template, path_values, inputs
+
+ENDPOINTS = {}             # display name and endpoint name -> Endpoint; the first catalog entry wins
+_ENDPOINTS_BY_ENTRY = {}   # id(catalog entry) -> Endpoint
+
+def get_endpoint(api):
+    """The Endpoint for a catalog entry mapping, display name or endpoint; raises ValueError if unknown."""
+    if isinstance(api, Mapping):
+        endpoint = _ENDPOINTS_BY_ENTRY.get(id(api))
+        return endpoint if endpoint is not None and endpoint.api is api else Endpoint(api)
+    endpoint = ENDPOINTS.get(api)
+    if endpoint is None:
+        raise ValueError(f"Unknown API: {api}")
+    return endpoint
+
+for _api in MS_CSP_APIS + REPORT_APIS:
+    _endpoint = _ENDPOINTS_BY_ENTRY[id(_api)] = Endpoint(_api)
+    for _key in (_api["name"], _endpoint.endpoint):
+        if _key:
+            ENDPOINTS.setdefault(_key, _endpoint)
+
+# ======== CLIENT =========
+class HybrClient:
+    """Client for the Hybr integration API endpoints in MS_CSP_APIS and REPORT_APIS.
+
+    Construction does no I/O. Every catalog entry is also exposed as a method
+    named after its endpoint in snake case (e.g. ``top_customers_by_revenue``)
+    plus an ``_async`` variant; see ``call``.
+    """
+
+    def __init__(self, base_url, app_id, username, password, pool_size=4, workers=1, timeout=60,
+                 max_retries=4, rate_limit=None, cache_size=256, cache_file=None):
+        self.base_url = base_url
+        self.app_id = app_id
+        self.workers = max(1, workers)
+        self.session = HybrSession(username, password, pool_size=pool_size, timeout=timeout)
+        self.retry_policy = RetryPolicy(max_retries=max_retries)
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+        identity = cache_identity(base_url, self.session.headers["Authorization"])
+        self.cache = ResponseCache(cache_size, path=cache_file, identity=identity) if cache_size > 0 else None
+        self._inflight = {}  # url -> Future of the response body, for coalescing duplicate GETs
+        self._inflight_lock = threading.Lock()
+        self.coalesced_requests = 0
+        self.metrics = RequestMetrics()
+        for path in [api["path"] for api in MS_CSP_APIS + REPORT_APIS] + list(PAGED_ENDPOINTS):
+            self.metrics.add_template(path)
+
+    def build_url(self, path, inputs=None):
+        self.metrics.add_template(path)
+        return self.base_url + compile_path(path).expand({"appId": self.app_id, **(inputs or {})})
+
+    def request_with_retries(self, method, url, template=None):
+        """Send a request through the session, retrying throttling, 5xx, dropped connections and timeouts."""
+        template = template or self.metrics.template_for(url)
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            started = time.perf_counter()
+            try:
+                res, data = self.session.request(method, url)
+                self.metrics.record_request(template, res.status, res.wire_bytes, time.perf_counter() - started)
+                return res, data
+            except urllib.error.HTTPError as e:
+                self.metrics.record_request(template, e.code, 0, time.perf_counter() - started)
+                if e.code not in RETRY_STATUSES or attempt >= self.retry_policy.max_retries:
+                    raise
+                delay = self.retry_policy.delay(attempt, parse_retry_after(e.headers.get("Retry-After")))
+                reason = f"HTTP {e.code}"
+                throttled = e.code == 429
+            except urllib.error.URLError as e:
+                self.metrics.record_request(template, None, 0, time.perf_counter() - started)
+                if not is_transient_error(e) or attempt >= self.retry_policy.max_retries:
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                reason = str(e.reason)
+                throttled = False
+            attempt += 1
+            print(f"⏳ {reason} for {url}, retrying in {delay:.1f}s ({attempt}/{self.retry_policy.max_retries})")
+            if throttled and self.rate_limiter is not None:
+                # Hold back every worker, not just this one; acquire() does the waiting
+                self.rate_limiter.pause(delay)
+            else:
+                time.sleep(delay)
+
+    def make_request(self, url, method="GET", params=None):
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+
+        template = self.metrics.template_for(url)
+        cacheable = method == "GET" and self.cache is not None
+        try:
+            data = self.cache.get(url) if cacheable else None
+            if data is not None:
+                self.metrics.record_event(template, "cache_hits")
+            else:
+                if method == "GET":
+                    data = self._fetch_coalesced(url, template)
+                else:
+                    data = self.request_with_retries(method, url, template)[1]
+                if cacheable:
+                    self.cache.put(url, data)
+            started = time.perf_counter()
+            try:
+                return json_loads(data)
+            except json.JSONDecodeError:
+                return data.decode("utf-8") if isinstance(data, bytes) else data
+            finally:
+                self.metrics.record_decode(template, time.perf_counter() - started)
+        except urllib.error.HTTPError as e:
+            print(f"❌ HTTP Error {e.code}: {e.reason}")
+            print(e.read().decode())
+        except urllib.error.URLError as e:
+            print(f"❌ URL Error: {e.reason}")
+        return None
+
+    def _fetch_coalesced(self, url, template=None):
+        """GET ``url`` once no matter how many threads ask for it at the same time.
+
+        The first caller sends the request; callers arriving while it is in
+        flight wait for and share its body (or its error). Each caller decodes
+        the body itself, so nobody shares mutable results.
+        """
+        with self._inflight_lock:
+            future = self._inflight.get(url)
+            leader = future is None
+            if leader:
+                future = self._inflight[url] = Future()
+            else:
+                self.coalesced_requests += 1
+                self.metrics.record_event(template or self.metrics.template_for(url), "coalesced")
+        if not leader:
+            return future.result()
+
+        try:
+            res, data = self.request_with_retries("GET", url, template)
+            future.set_result(data)
+            return data
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[url]
+
+    # --- Pagination ---
+    def _fetch_page(self, url, spec, params, page_arg, page_size):
+        page_params = {**(params or {}), spec["page_param"]: page_arg, spec["size_param"]: page_size}
+        page = self.make_request(url, params=page_params)
+        if not isinstance(page, dict) or not isinstance(page.get(spec["items_key"]), list):
+            print(f"❌ Failed to fetch page {spec['page_param']}={page_arg} of {url}")
+            return None
+        return page
+
+    def iter_pages(self, url, spec, params=None, page_size=DEFAULT_PAGE_SIZE, workers=None):
+        """Yield every page response of a paged endpoint, in order.
+
+        Later pages are fetched ``workers`` at a time. Yields None and stops if a
+        page fails.
+        """
+        items_key = spec["items_key"]
+        workers = available_workers(workers or self.workers)
+
+        def fetch(page_arg):
+            return self._fetch_page(url, spec, params, page_arg, page_size)
+
+        if spec["style"] == "skip":
+            first = fetch(0)
+            yield first
+            if first is None:
+                return
+            total = next((first[k] for k in spec.get("total_keys", []) if isinstance(first.get(k), int)), None)
+            if total is None:
+                return
+            for page in ordered_map(fetch, range(page_size, total, page_size), workers):
+                yield page
+                if page is None:
+                    return
+            return
+
+        # No total available: fetch a window of pages at a time and stop at the first short page
+        next_page, previous = 1, None
+        while True:
+            window = range(next_page, next_page + workers)
+            for page in ordered_map(fetch, window, workers):
+                if page is None:
+                    yield None
+                    return
+                items = page[items_key]
+                # Guard against endpoints that ignore the paging parameters and repeat the same page
+                if previous is not None and items == previous:
+                    return
+                yield page
+                if len(items) < page_size:
+                    return
+                previous = items
+            next_page = window.stop
+
+    def iter_paged_items(self, url, spec, params=None, page_size=DEFAULT_PAGE_SIZE, workers=None):
+        """Yield the individual items of a paged endpoint across all pages."""
+        for page in self.iter_pages(url, spec, params, page_size, workers):
+            if page is None:
+                return
+            yield from page[spec["items_key"]]
+
+    def fetch_all_pages(self, url, spec, params=None, page_size=DEFAULT_PAGE_SIZE, workers=None):
+        """Fetch a full result set page by page.
+
+        Returns the first page's response with its items list replaced by the
+        items of every page, i.e. the same shape as a single unpaged call, or
+        None if any page failed.
+        """
+        result = None
+        for page in self.iter_pages(url, spec, params, page_size, workers):
+            if page is None:
+                return None
+            if result is None:
+                result = page
+            else:
+                result[spec["items_key"]].extend(page[spec["items_key"]])
+        return result
+
+    # --- Catalog calls ---
+    def prepare_request(self, api, inputs):
+        """Resolve the path template, URL and query parameters for a catalog entry.
+
+        Inputs are checked against the entry's ``Endpoint`` first, so a missing,
+        unknown or non-scalar input raises ValueError before anything is sent.
+        Path inputs are quoted into the path; the rest become query parameters.
+        """
+        template, path_values, params = get_endpoint(api).split(inputs)
+        self.metrics.add_template(template.template)
+        path_values = {key: urllib.parse.quote(val, safe="") for key, val in path_values.items()}
+        url = self.base_url + template.expand({"appId": self.app_id, **path_values})
+        return template.template, url, params
+
+    def call(self, api, all_pages=False, page_size=DEFAULT_PAGE_SIZE, **inputs):
+        """Call a catalog entry (an entry dict, display name or endpoint) with keyword inputs.
+
+        ``all_pages`` pages through paged endpoints and returns the full result set.
+        Returns the decoded response, or None if the request failed. Raises
+        ValueError for an unknown API or invalid inputs.
+        """
+        path, url, params = self.prepare_request(api, inputs)
+        spec = PAGED_ENDPOINTS.get(path)
+        if all_pages and spec:
+            return self.fetch_all_pages(url, spec, params, page_size)
+        return self.make_request(url, params=params)
+
+    async def call_async(self, api, all_pages=False, page_size=DEFAULT_PAGE_SIZE, **inputs):
+        """Awaitable ``call``; runs on a worker thread so it shares the warm connection pool."""
+        return await asyncio.to_thread(self.call, api, all_pages=all_pages, page_size=page_size, **inputs)
+
+    # --- Reports ---
+    def available_currencies(self, month, year, parent_subscription_id=None):
+        """Currency codes that have report data for a month, via availableCurrencySymbols; None if the call failed."""
+        res = self.available_currency_symbols(month=month, year=year, parentSubscriptionId=parent_subscription_id)
+        return None if res is None else currency_codes(res)
+
+    def report_matrix(self, report, periods, currencies=None, parent_subscription_ids=None, workers=None, **inputs):
+        """Fetch a report for every (year, month) in ``periods`` x currency x parent subscription.
+
+        Currencies default to those listed by availableCurrencySymbols for each
+        month; if that call fails, the month is reported as a failed cell with
+        ``currency`` None. Reports without a currency or parentSubscriptionId
+        input are fetched once per cell of the remaining dimensions. A cell whose
+        inputs the report rejects is a failed cell with the ``error``.
+        ``inputs`` are passed to every call (e.g. ``numberOfItems``). Returns
+        ``{"report", "rows", "columns", "failed_cells"}`` where ``columns`` maps
+        each field, plus the month/year/currency/parentSubscriptionId keys, to a
+        list with one value per row.
+        """
+        endpoint = get_endpoint(report)
+        api = endpoint.api
+        workers = workers or self.workers
+        takes_currency = "currency" in endpoint.required
+        parents = (parent_subscription_ids or [None]) if "parentSubscriptionId" in endpoint.inputs else [None]
+        groups = [(year, month, parent) for year, month in periods for parent in parents]
+
+        def currencies_for(group):
+            if not takes_currency:
+                return [None]
+            if currencies:
+                return list(currencies)
+            year, month, parent = group
+            return self.available_currencies(month, year, parent)
+
+        cells, failed = [], []
+        for (year, month, parent), codes in zip(groups, ordered_map(currencies_for, groups, workers)):
+            if codes is None:
+                failed.append({"year": year, "month": month, "currency": None, "parentSubscriptionId": parent})
+            for currency in codes or []:
+                cells.append({"year": year, "month": month, "currency": currency, "parentSubscriptionId": parent})
+
+        def fetch(cell):
+            try:
+                return cell, self.call(api, **{**inputs, **cell}), None
+            except ValueError as e:
+                return cell, None, str(e)
+
+        columns = {key: [] for key in ("year", "month", "currency", "parentSubscriptionId")}
+        rows, errors = 0, set()
+        for cell, res, error in ordered_map(fetch, cells, workers):
+            if error is not None:
+                if error not in errors:
+                    print(f"❌ {error}")
+                    errors.add(error)
+                failed.append({**cell, "error": error})
+                continue
+            if res is None:
+                failed.append(cell)
+                continue
+            for row in report_rows(res):
+                row = {**cell, **row}
+                for key in row:
+                    if key not in columns:
+                        columns[key] = [None] * rows
+                for key, values in columns.items():
+                    values.append(row.get(key))
+                rows += 1
+        return {"report": endpoint_name(api), "rows": rows, "columns": columns, "failed_cells": failed}
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def currency_codes(res):
+    """Currency codes from an availableCurrencySymbols response (plain codes or objects)."""
+    codes = []
+    for item in res if isinstance(res, list) else []:
+        if isinstance(item, str):
+            codes.append(item)
+        elif isinstance(item, dict):
+            code = next((item[k] for k in ("CurrencyCode", "currencyCode", "Currency", "currency", "Code", "code", "Symbol", "symbol") if item.get(k)), None)
+            if code:
+                codes.append(code)
+    return codes
+
+def report_rows(res):
+    """Normalise a report response into a list of row dicts."""
+    if isinstance(res, dict):
+        items = next((v for k, v in res.items() if k in ("items", "Items", "rows", "Rows", "data", "Data") and isinstance(v, list)), None)
+        res = items if items is not None else [res]
+    if not isinstance(res, list):
+        res = [res]
+    return [row if isinstance(row, dict) else {"value": row} for row in res]
+
+def _snake_case(name):
+    return re.sub(r"(?<=[a-z0-9])([A-Z])", r"_\1", name).replace(" ", "_").lower()
+
+def _add_endpoint_methods(api):
+    method_name = _snake_case(endpoint_name(api) or api["name"])
+    inputs = ", ".join(key for _, key in api.get("required_inputs", [])) or "none"
+
+    def call(self, all_pages=False, page_size=DEFAULT_PAGE_SIZE, **kwargs):
+        return self.call(api, all_pages=all_pages, page_size=page_size, **kwargs)
+
+    async def call_async(self, all_pages=False, page_size=DEFAULT_PAGE_SIZE, **kwargs):
+        return await self.call_async(api, all_pages=all_pages, page_size=page_size, **kwargs)
+
+    for func, name in ((call, method_name), (call_async, f"{method_name}_async")):
+        func.__name__ = name
+        func.__qualname__ = f"HybrClient.{name}"
+        func.__doc__ = f"{api['name']} (required inputs: {inputs})."
+        setattr(HybrClient, name, func)
+
+for _api in MS_CSP_APIS + REPORT_APIS:
+    _add_endpoint_methods(_api)
@@ -0,0 +1,52 @@
+import json
+import os
+import subprocess
+import sys
+import urllib.request
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "Csp-Flow-Sample.py")
+for path in (ROOT, os.path.join(ROOT, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from mock_portal import MockPortal, SyntheticData  # noqa: E402
+
+@pytest.fixture
+def make_portal():
+    """Start mock portals on free ports; every portal is stopped after the test."""
+    portals = []
+
+    def start(companies=12, connections=1, licenses=4, offers=30, **options):
+        portal = MockPortal(SyntheticData(companies, connections, licenses, offers), port=0, **options)
+        portal.start()
+        portals.append(portal)
+        return portal
+
+    yield start
+    for portal in portals:
+        portal.stop()
+
+@pytest.fixture
+def portal(make_portal):
+    return make_portal()
+
+def portal_stats(portal):
+    with urllib.request.urlopen(portal.base_url + "/__stats") as res:
+        return json.loads(res.read())
+
+def run_script(portal, *args, cwd, check=True, input=None):
+    """Run Csp-Flow-Sample.py against ``portal`` and return the CompletedProcess; ``input`` is fed to its prompts."""
+    cmd = [sys.executable, SCRIPT, "--base-url", portal.base_url, "--app-id", "test",
+           "--username", "u", "--password", "p", *map(str, args)]
+    proc = subprocess.run(cmd, cwd=cwd, input=input, capture_output=True, text=True, encoding="utf-8", timeout=120,
+                          env={**os.environ, "PYTHONIOENCODING": "utf-8"})
+    if check and proc.returncode != 0:
+        raise AssertionError(f"{' '.join(cmd)} exited {proc.returncode}\n{proc.stdout}\n{proc.stderr}")
+    return proc
+
+def load_json(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
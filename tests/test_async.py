@@ -0,0 +1,92 @@
+import asyncio
+import os
+import subprocess
+import sys
+import urllib.error
+
+import pytest
+
+from conftest import ROOT, load_json, run_script
+from hybr_async import AsyncHybrClient, AsyncHybrSession
+from hybr_client import json_loads
+
+MAPPED_COMPANIES = "/api/integrations/test/admin/service/billing/csp/companies/getCspMappedCompanies"
+
+def run_async_collector(portal, *args, cwd, check=True):
+    cmd = [sys.executable, os.path.join(ROOT, "hybr_async.py"), "--base-url", portal.base_url, "--app-id", "test",
+           "--username", "u", "--password", "p", *map(str, args)]
+    proc = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True, encoding="utf-8", timeout=120,
+                          env={**os.environ, "PYTHONIOENCODING": "utf-8"})
+    if check:
+        assert proc.returncode == 0, proc.stdout + proc.stderr
+    return proc
+
+@pytest.mark.parametrize("paging", [[], ["--page-size", "7"]])
+def test_same_output_as_the_sync_collector(make_portal, tmp_path, paging):
+    portal = make_portal(offers=40, max_page_size=10)
+    run_script(portal, "--collect", "--output", "sync.json", *paging, cwd=tmp_path)
+    run_async_collector(portal, "--output", "async.json", "--companies-in-flight", "4", *paging, cwd=tmp_path)
+    records = load_json(tmp_path / "sync.json")
+    assert load_json(tmp_path / "async.json") == records
+    # Both collect the offers of every product type, as the sync collector always has
+    items = [item for record in records for item in record["offers"][0]["offers"]["items"]]
+    assert len({item["ProductType"] for item in items}) > 1
+
+def test_decodes_gzip(make_portal):
+    portal = make_portal(companies=40)
+
+    async def fetch():
+        session = AsyncHybrSession("u", "p", proxies={})
+        try:
+            return await session.request("GET", portal.base_url + MAPPED_COMPANIES)
+        finally:
+            await session.close()
+
+    res, data = asyncio.run(fetch())
+    assert res.getheader("Content-Encoding") == "gzip"
+    assert res.wire_bytes == portal.stats["bytes"] < len(data)
+    assert json_loads(data) == [tenant["company"] for tenant in portal.data.companies]
+
+def test_retries_429_after_retry_after(make_portal):
+    portal = make_portal(throttle_rate=0.5, retry_after=0.05)
+    client = AsyncHybrClient(portal.base_url, "test", "u", "p", max_retries=20, cache_size=0)
+    delays = []
+    delay = client.retry_policy.delay
+    client.retry_policy.delay = lambda attempt, retry_after=None: delays.append(retry_after) or delay(attempt, retry_after)
+
+    async def fetch():
+        async with client:
+            return [await client.get_csp_mapped_companies() for _ in range(6)]
+
+    results = asyncio.run(fetch())
+    assert results == [[tenant["company"] for tenant in portal.data.companies]] * 6
+    throttled = portal.stats["statuses"]["429"]
+    assert throttled and delays == [0.05] * throttled
+    assert client.metrics.summary()["/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspMappedCompanies"]["statuses"]["429"] == throttled
+
+@pytest.mark.parametrize("keep_alive, connections", [(True, 1), (False, 5)])
+def test_reuses_connections_and_survives_server_closes(make_portal, keep_alive, connections):
+    portal = make_portal(keep_alive=keep_alive)
+
+    async def fetch():
+        session = AsyncHybrSession("u", "p", proxies={})
+        try:
+            return [(await session.request("GET", portal.base_url + MAPPED_COMPANIES))[0].status for _ in range(5)]
+        finally:
+            await session.close()
+
+    assert asyncio.run(fetch()) == [200] * 5
+    assert portal.stats["connections"] == connections
+
+def test_rejects_proxied_hosts():
+    session = AsyncHybrSession("u", "p", proxies={"http": "http://proxy.example:3128"})
+    with pytest.raises(urllib.error.URLError, match="proxy"):
+        asyncio.run(session.request("GET", "http://portal.example/api"))
+
+def test_failed_company_list_keeps_the_previous_output(make_portal, tmp_path):
+    portal = make_portal(error_rate=1.0)
+    (tmp_path / "csp_data.json").write_text('[{"company": {"id": "sub-1"}}]')
+    proc = run_async_collector(portal, "--max-retries", "0", cwd=tmp_path, check=False)
+    assert proc.returncode != 0
+    assert "No mapped companies found" in proc.stdout
+    assert (tmp_path / "csp_data.json").read_text() == '[{"company": {"id": "sub-1"}}]'
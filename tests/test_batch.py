@@ -0,0 +1,42 @@
+import json
+
+from conftest import portal_stats, run_script
+
+def write_jobs(tmp_path, jobs):
+    path = tmp_path / "jobs.json"
+    path.write_text(json.dumps({"output": "results.jsonl", "workers": 3, "jobs": jobs}))
+    return str(path)
+
+def test_batch_runs_matrix_jobs_in_order(portal, tmp_path):
+    customer_id = portal.data.companies[0]["profile"]["Id"]
+    job_file = write_jobs(tmp_path, [
+        {"api": "getCspMappedCompanies"},
+        {"api": "topCustomersByRevenue", "inputs": {"month": 1, "year": 2025, "numberOfItems": 3},
+         "matrix": {"currency": ["USD", "EUR"]}},
+        {"api": "Get CSP Customer Licenses By CSP Customer ID", "inputs": {"customer_id": customer_id},
+         "all_pages": True},
+    ])
+    run_script(portal, "--batch", job_file, "--page-size", "2", cwd=tmp_path)
+    results = [json.loads(line) for line in (tmp_path / "results.jsonl").read_text().splitlines()]
+    assert [(r["api"], r["inputs"].get("currency"), r["ok"]) for r in results] == [
+        ("getCspMappedCompanies", None, True),
+        ("topCustomersByRevenue", "USD", True),
+        ("topCustomersByRevenue", "EUR", True),
+        ("Get CSP Customer Licenses By CSP Customer ID", None, True),
+    ]
+    assert [row["Currency"] for row in results[2]["result"]] == ["EUR"] * 3
+    assert len(results[3]["result"]["Licenses"]) == 4
+
+def test_invalid_jobs_send_nothing(portal, tmp_path):
+    job_file = write_jobs(tmp_path, [
+        {"api": "getCspMappedCompanies"},
+        {"api": "topCustomersByRevenue", "inputs": {"month": 1, "year": 2025}, "matrix": {"currency": ["USD"]}},
+        {"api": "noSuchEndpoint"},
+    ])
+    before = portal_stats(portal)["requests"]
+    proc = run_script(portal, "--batch", job_file, cwd=tmp_path, check=False)
+    assert proc.returncode == 1
+    assert "job 2: topCustomersByRevenue: missing required input numberOfItems" in proc.stdout
+    assert "job 3: Unknown API: noSuchEndpoint" in proc.stdout
+    assert portal_stats(portal)["requests"] - before == 1  # only /__stats
+    assert not (tmp_path / "results.jsonl").exists()
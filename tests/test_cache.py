@@ -0,0 +1,54 @@
+import sqlite3
+import time
+
+from conftest import portal_stats
+from hybr_client import HybrClient, ResponseCache
+
+def currencies(portal, username, cache_file):
+    with HybrClient(portal.base_url, "test", username, "p", cache_file=str(cache_file)) as client:
+        return client.available_currency_symbols(month=1, year=2025)
+
+def test_cache_file_is_per_identity(portal, tmp_path):
+    cache_file = tmp_path / "cache.db"
+    requests = lambda: portal_stats(portal)["requests"]
+
+    start = requests()
+    assert currencies(portal, "alice", cache_file)
+    assert requests() - start == 2                    # the call and /__stats
+    assert currencies(portal, "alice", cache_file)    # second run: served from the file
+    assert requests() - start == 3
+    assert currencies(portal, "bob", cache_file)      # other credentials: not shared
+    assert requests() - start == 5
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2, ttls={"ref": 60})
+    for name in ("a", "b", "c"):
+        cache.put(f"http://x/ref/{name}", name.encode())
+    assert cache.get("http://x/ref/a") is None
+    assert cache.get("http://x/ref/c") == b"c"
+    assert cache.get("http://x/other") is None
+
+def test_uncached_endpoints_are_not_stored():
+    cache = ResponseCache(ttls={"ref": 60})
+    cache.put("http://x/live/a", b"a")
+    assert cache.get("http://x/live/a") is None
+
+def test_expired_rows_are_purged(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResponseCache(ttls={"short": 0.05, "long": 60}, path=path, identity="me")
+    cache.put("http://x/short/a", b"a")
+    cache.put("http://x/short/b", b"b")
+    cache.put("http://x/long/c", b"c")
+    time.sleep(0.1)
+    assert cache.get("http://x/short/a") is None
+    with sqlite3.connect(path) as db:
+        assert db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 2
+    cache.close()
+
+    reopened = ResponseCache(ttls={"long": 60}, path=path, identity="me")
+    with sqlite3.connect(path) as db:
+        assert db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 1
+    assert reopened.get("http://x/long/c") == b"c"
+    assert ResponseCache(ttls={"long": 60}, path=path, identity="other").get("http://x/long/c") is None
+    reopened.invalidate("long")
+    assert reopened.get("http://x/long/c") is None
@@ -0,0 +1,44 @@
+import pytest
+
+import hybr_client
+from conftest import run_script
+from hybr_client import MS_CSP_APIS, REPORT_APIS, HybrClient, find_api, get_endpoint
+
+def test_catalog_is_read_only():
+    api = find_api("getCspMappedCompanies")
+    assert api is MS_CSP_APIS[0]
+    with pytest.raises(TypeError):
+        api["inputs"] = {}
+    with pytest.raises(TypeError):
+        api["reference_values"] = {}
+    with pytest.raises(AttributeError):
+        REPORT_APIS.append({})
+    assert all("inputs" not in api for api in MS_CSP_APIS + REPORT_APIS)
+
+def test_import_and_construction_do_no_io(monkeypatch):
+    def no_network(*args, **kwargs):
+        raise AssertionError("network access during construction")
+
+    monkeypatch.setattr(hybr_client.http.client.HTTPConnection, "connect", no_network)
+    client = HybrClient("http://portal.invalid", "app", "u", "p")
+    assert client.top_customers_by_revenue.__doc__.startswith("Top Customers By Revenue")
+    client.close()
+
+def test_calls_validate_inputs(portal):
+    with HybrClient(portal.base_url, "test", "u", "p") as client:
+        customer_id = portal.data.companies[0]["profile"]["Id"]
+        assert client.get_customer_licenses(customer_id=customer_id)["CustomerId"] == customer_id
+        with pytest.raises(ValueError, match="missing required input customer_id"):
+            client.get_customer_licenses()
+    assert get_endpoint("getCustomerLicenses").required == ["customer_id"]
+
+def test_interactive_prompts_start_fresh_each_run(portal, tmp_path):
+    customer_id = portal.data.companies[0]["profile"]["Id"]
+    answers = ["1", "2",                             # Microsoft CSP APIs, jump to any API
+               "4", customer_id, "", "", "n", "y",   # licenses; run again
+               customer_id, "", "", "n", "n",
+               "4", "skip", "exit"]                  # a later run prompts again instead of reusing inputs
+    proc = run_script(portal, cwd=tmp_path, input="\n".join(answers) + "\n")
+    assert proc.stdout.count("Enter Customer ID") == 3
+    assert proc.stdout.count('"CustomerId": "%s"' % customer_id) == 2
+    assert "Skipped this API" in proc.stdout
@@ -0,0 +1,102 @@
+import json
+import os
+import sqlite3
+
+from conftest import load_json, portal_stats, run_script
+
+def test_missing_customer_id_is_skipped_not_failed(portal, tmp_path):
+    portal.data.companies[3]["profile"]["Id"] = None
+    proc = run_script(portal, "--collect", "--output", "out.json", "--workers", "4", cwd=tmp_path)
+    assert len(load_json(tmp_path / "out.json")) == 11
+    assert "1 companies skipped" in proc.stdout
+    assert "--resume" not in proc.stdout
+    assert not os.path.exists(tmp_path / "out.json.checkpoint.db")
+
+def test_resume_fetches_only_failed_companies(portal, tmp_path):
+    missing = portal.data.companies[5]
+    subscription_id = missing["company"]["id"]
+    del portal.data.by_subscription[subscription_id]
+    proc = run_script(portal, "--collect", "--output", "out.json", "--workers", "2", cwd=tmp_path)
+    assert "1 companies were incomplete" in proc.stdout
+    assert os.path.exists(tmp_path / "out.json.checkpoint.db")
+    assert len(load_json(tmp_path / "out.json")) == 11
+
+    portal.data.by_subscription[subscription_id] = missing
+    before = portal_stats(portal)["requests"]
+    run_script(portal, "--collect", "--output", "out.json", "--workers", "2", "--resume", cwd=tmp_path)
+    records = load_json(tmp_path / "out.json")
+    assert [record["company"]["id"] for record in records] == [t["company"]["id"] for t in portal.data.companies]
+    # mapped companies, then profile, licenses and offers of the one failed company (+1 for /__stats)
+    assert portal_stats(portal)["requests"] - before == 1 + 3 + 1
+    assert not os.path.exists(tmp_path / "out.json.checkpoint.db")
+
+def test_resume_keeps_original_fetch_times(portal, tmp_path):
+    missing = portal.data.companies[0]
+    del portal.data.by_subscription[missing["company"]["id"]]
+    run_script(portal, "--collect", "--output", "out.json", cwd=tmp_path)
+    with sqlite3.connect(tmp_path / "out.json.checkpoint.db") as db:
+        stored = dict(db.execute("SELECT subscription_id, fetched_at FROM companies WHERE status = 'done'"))
+    assert len(stored) == 11 and all(stored.values())
+
+    portal.data.by_subscription[missing["company"]["id"]] = missing
+    run_script(portal, "--collect", "--output", "out.json", "--resume", cwd=tmp_path)
+    fetched = load_json(tmp_path / "out.json.fetched.json")
+    assert {key: fetched[key] for key in stored} == stored
+    assert fetched[missing["company"]["id"]] > max(stored.values())
+
+def test_incremental_delta(portal, tmp_path):
+    run_script(portal, "--collect", "--output", "out.json", cwd=tmp_path)
+    changed, removed = portal.data.companies[2], portal.data.companies.pop(4)
+    changed["licenses"]["Licenses"][0]["TotalUnits"] += 1
+    dropped_license = changed["licenses"]["Licenses"].pop()
+    portal.data.companies.append(portal.data.companies.pop(0))  # order changes do not count
+
+    proc = run_script(portal, "--collect", "--output", "out.json", "--incremental", "--ttl", "0", cwd=tmp_path)
+    assert "Delta: 2 changed companies written to out.delta.jsonl" in proc.stdout
+    entries = {entry["company_id"]: entry for entry in map(json.loads, (tmp_path / "out.delta.jsonl").read_text().splitlines())}
+    assert entries[removed["company"]["id"]]["op"] == "remove"
+    update = entries[changed["company"]["id"]]
+    assert update["op"] == "update" and update["changed"] == ["licenses"]
+    assert update["licenses"]["removed"] == [dropped_license["LicenseId"]]
+    assert [lic["LicenseId"] for lic in update["licenses"]["changed"]] == [changed["licenses"]["Licenses"][0]["LicenseId"]]
+    assert len(load_json(tmp_path / "out.json")) == 11
+
+def test_incremental_skipped_company_is_not_removed(portal, tmp_path):
+    run_script(portal, "--collect", "--output", "out.json", cwd=tmp_path)
+    skipped, failed = portal.data.companies[1], portal.data.companies[5]
+    skipped["profile"] = dict(skipped["profile"], Id=None)
+    del portal.data.by_subscription[failed["company"]["id"]]
+
+    proc = run_script(portal, "--collect", "--output", "out.json", "--incremental", "--ttl", "0", cwd=tmp_path)
+    assert "Delta: 0 changed companies" in proc.stdout
+    assert (tmp_path / "out.delta.jsonl").read_text() == ""
+    assert "1 still-mapped companies from out.json were skipped or failed" in proc.stdout
+    assert skipped["company"]["id"] in proc.stdout
+    # The failed company keeps its previous record
+    assert failed["company"]["id"] in {record["company"]["id"] for record in load_json(tmp_path / "out.json")}
+
+def test_incremental_matches_remapped_customer(portal, tmp_path):
+    run_script(portal, "--collect", "--output", "out.json", cwd=tmp_path)
+    tenant = portal.data.companies[3]
+    old_id = tenant["company"]["id"]
+    del portal.data.by_subscription[old_id]
+    tenant["company"] = dict(tenant["company"], id="sub-remapped")
+    portal.data.by_subscription["sub-remapped"] = tenant
+
+    proc = run_script(portal, "--collect", "--output", "out.json", "--incremental", "--ttl", "0", cwd=tmp_path)
+    assert "Delta: 1 changed companies" in proc.stdout
+    [entry] = map(json.loads, (tmp_path / "out.delta.jsonl").read_text().splitlines())
+    assert entry["op"] == "update" and entry["company_id"] == "sub-remapped"
+    assert entry["previous_company_id"] == old_id and entry["customer_id"] == tenant["profile"]["Id"]
+    # The mock derives offer ids from the company id, so offers change too; licenses do not
+    assert "company" in entry["changed"] and "licenses" not in entry["changed"]
+    assert entry["licenses"] == {"added": [], "removed": [], "changed": []}
+
+def test_incremental_reuses_fresh_records(portal, tmp_path):
+    run_script(portal, "--collect", "--output", "out.json", cwd=tmp_path)
+    first = load_json(tmp_path / "out.json.fetched.json")
+    before = portal_stats(portal)["requests"]
+    proc = run_script(portal, "--collect", "--output", "out.json", "--incremental", "--ttl", "1", cwd=tmp_path)
+    assert portal_stats(portal)["requests"] - before == 2  # mapped companies + /__stats
+    assert load_json(tmp_path / "out.json.fetched.json") == first
+    assert "Delta: 0 changed companies" in proc.stdout
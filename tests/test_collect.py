@@ -0,0 +1,17 @@
+from conftest import load_json, portal_stats, run_script
+
+def test_concurrent_collection_matches_sequential(portal, tmp_path):
+    run_script(portal, "--collect", "--output", "seq.json", "--workers", "1", cwd=tmp_path)
+    run_script(portal, "--collect", "--output", "par.json", "--workers", "4", cwd=tmp_path)
+
+    sequential, parallel = load_json(tmp_path / "seq.json"), load_json(tmp_path / "par.json")
+    assert len(sequential) == 12
+    assert parallel == sequential
+    assert [record["company"]["text"] for record in parallel] == [f"Contoso {i:05d}" for i in range(12)]
+    assert all(record["customer_profile"] and record["licenses"]["Licenses"] and record["offers"] for record in parallel)
+
+def test_collection_survives_server_errors(make_portal, tmp_path):
+    portal = make_portal(error_rate=0.1, seed=3)
+    run_script(portal, "--collect", "--output", "out.json", "--workers", "4", cwd=tmp_path)
+    assert len(load_json(tmp_path / "out.json")) == 12
+    assert portal_stats(portal)["statuses"].get("500", 0) > 0
@@ -0,0 +1,113 @@
+import asyncio
+import gzip
+import importlib.util
+import threading
+import urllib.error
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from conftest import load_json, portal_stats, run_script
+from csp_export import CspDataWriter, iter_records
+from hybr_async import AsyncHybrClient
+from hybr_client import HybrClient, HybrSession, decode_body, json_dumps, json_loads
+
+BODY = b'{"items": [' + b",".join(b'{"Name": "Microsoft 365 E3"}' for _ in range(100)) + b"]}"
+
+@pytest.mark.parametrize("encoding, data", [
+    (None, BODY),
+    ("identity", BODY),
+    ("gzip", gzip.compress(BODY)),
+    ("x-gzip", gzip.compress(BODY)),
+    ("Deflate", zlib.compress(BODY)),
+    ("deflate", zlib.compress(BODY)[2:-4]),  # raw deflate, no zlib header
+])
+def test_decode_body(encoding, data):
+    assert decode_body(encoding, data) == BODY
+
+def test_unsupported_encoding():
+    with pytest.raises(urllib.error.URLError):
+        decode_body("br", b"...")
+
+@pytest.mark.parametrize("encoding, data", [
+    ("gzip", gzip.compress(BODY)[:-8]),
+    ("gzip", b"not gzip at all"),
+    ("deflate", b"not deflate either"),
+])
+def test_corrupt_body_is_a_url_error(encoding, data):
+    with pytest.raises(urllib.error.URLError, match="could not decode"):
+        decode_body(encoding, data)
+
+class CorruptGzipHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = gzip.compress(BODY)[:-8]
+        self.send_response(200)
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+@pytest.fixture
+def corrupt_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CorruptGzipHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+def test_corrupt_response_fails_only_the_call(corrupt_server):
+    with HybrClient(corrupt_server, "test", "u", "p", cache_size=0) as client:
+        assert client.make_request(corrupt_server + "/api") is None
+
+    async def fetch():
+        async with AsyncHybrClient(corrupt_server, "test", "u", "p", cache_size=0) as client:
+            return await client.make_request(corrupt_server + "/api")
+
+    assert asyncio.run(fetch()) is None
+
+def test_json_bytes_and_text():
+    assert json_loads(BODY) == json_loads(BODY.decode())
+    assert json_loads("{\"name\": \"Société\"}") == {"name": "Société"}
+    assert json_dumps({"name": "Société", "units": [1, 2]}) == '{"name":"Société","units":[1,2]}'
+
+def test_session_decodes_gzip_responses(make_portal):
+    portal = make_portal(companies=40)
+    session = HybrSession("u", "p")
+    url = portal.base_url + "/api/integrations/test/admin/service/billing/csp/companies/getCspMappedCompanies"
+    res, data = session.request("GET", url)
+    assert res.getheader("Content-Encoding") == "gzip"
+    assert json_loads(data) == [tenant["company"] for tenant in portal.data.companies]
+    assert res.wire_bytes == portal_stats(portal)["bytes"] < len(data)
+    session.close()
+
+def test_compressed_export_matches_plain(make_portal, tmp_path):
+    # Offer catalogs large enough that records span several 64 KiB read buffers
+    portal = make_portal(companies=4, offers=400)
+    run_script(portal, "--collect", "--output", "plain.json", cwd=tmp_path)
+    run_script(portal, "--collect", "--output", "packed.jsonl.gz", cwd=tmp_path)
+    plain = load_json(tmp_path / "plain.json")
+    assert list(iter_records(str(tmp_path / "plain.json"))) == plain
+    assert list(iter_records(str(tmp_path / "packed.jsonl.gz"))) == plain
+    with gzip.open(tmp_path / "packed.jsonl.gz", "rt", encoding="utf-8") as f:
+        assert len(f.readlines()) == len(plain)
+    assert (tmp_path / "packed.jsonl.gz").stat().st_size * 3 < (tmp_path / "plain.json").stat().st_size
+
+@pytest.mark.skipif(importlib.util.find_spec("zstandard") is not None, reason="zstandard is installed")
+def test_zstd_needs_zstandard(tmp_path):
+    with pytest.raises(ImportError, match="zstandard"):
+        CspDataWriter(str(tmp_path / "out.jsonl.zst"))
+
+@pytest.mark.skipif(importlib.util.find_spec("zstandard") is None, reason="zstandard is not installed")
+def test_zstd_round_trip(tmp_path):
+    path = str(tmp_path / "out.json.zst")
+    records = [{"company": {"id": f"sub-{i}"}} for i in range(3)]
+    with CspDataWriter(path) as writer:
+        for record in records:
+            writer.write(record)
+    assert list(iter_records(path)) == records
@@ -0,0 +1,49 @@
+import threading
+import time
+
+from hybr_client import Flow, Step, ordered_map
+
+class Gauge:
+    """Counts how many calls run at the same time."""
+
+    def __init__(self):
+        self.current = self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, value):
+        with self.lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+        time.sleep(0.01)
+        with self.lock:
+            self.current -= 1
+        return value
+
+def test_ordered_map_keeps_order():
+    assert list(ordered_map(lambda x: x * 2, range(50), 8)) == [x * 2 for x in range(50)]
+    assert list(ordered_map(lambda x: x, iter(range(5)), 3)) == list(range(5))
+
+def test_nested_pools_share_the_outer_budget():
+    gauge = Gauge()
+
+    def company(i):
+        return list(ordered_map(gauge, range(4), 4))
+
+    assert list(ordered_map(company, range(8), 4)) == [[0, 1, 2, 3]] * 8
+    assert gauge.peak <= 4
+
+def test_few_items_leave_threads_to_nested_pools():
+    gauge = Gauge()
+    list(ordered_map(lambda i: list(ordered_map(gauge, range(4), 4)), range(1), 4))
+    assert gauge.peak == 4
+
+def test_flow_within_pool_stays_within_budget():
+    gauge = Gauge()
+    flow = Flow([
+        Step("a", lambda x: gauge(x), needs=["x"]),
+        Step("b", lambda x: gauge(x), needs=["x"]),
+        Step("c", lambda a, b: list(ordered_map(gauge, range(3), 3)), needs=["a", "b"]),
+    ])
+    results = list(ordered_map(lambda x: flow.run(x=x), range(6), 3))
+    assert [fields["a"] for fields in results] == list(range(6))
+    assert gauge.peak <= 3
@@ -0,0 +1,96 @@
+import csv
+import importlib.util
+import json
+
+import pytest
+
+from csp_export import TABLES, ColumnarExporter, CspDataWriter, TableWriter, coerce, iter_records, to_int
+
+RECORDS = [{"company": {"id": f"sub-{i}", "text": f"Contoso {i}"}, "licenses": {"Licenses": [{"TotalUnits": i}]}}
+           for i in range(3)]
+
+def test_json_output_matches_json_dump(tmp_path):
+    path = tmp_path / "out.json"
+    with CspDataWriter(str(path)) as writer:
+        for record in RECORDS:
+            writer.write(record)
+    assert path.read_text() == json.dumps(RECORDS, indent=2)
+    assert not (tmp_path / "out.partial.json").exists()
+
+def test_empty_output_is_an_empty_array(tmp_path):
+    path = tmp_path / "out.json"
+    with CspDataWriter(str(path)):
+        pass
+    assert json.loads(path.read_text()) == []
+
+@pytest.mark.parametrize("name", ["out.jsonl", "out.json.gz", "out.jsonl.gz"])
+def test_round_trip(tmp_path, name):
+    path = str(tmp_path / name)
+    with CspDataWriter(path) as writer:
+        for record in RECORDS:
+            writer.write(record)
+    assert list(iter_records(path)) == RECORDS
+
+def test_exception_keeps_previous_output(tmp_path):
+    path = tmp_path / "out.json"
+    path.write_text("[]")
+    with pytest.raises(RuntimeError):
+        with CspDataWriter(str(path)) as writer:
+            writer.write(RECORDS[0])
+            raise RuntimeError("collection failed")
+    assert path.read_text() == "[]"
+    partial = (tmp_path / "out.partial.json").read_text()
+    assert partial.startswith("[\n") and not partial.rstrip().endswith("]")
+
+@pytest.mark.parametrize("value, expected", [
+    (12, 12), ("12", 12), ("12.0", 12), (12.0, 12), ("1e3", 1000), (True, 1), ("12345678901234567890", 12345678901234567890),
+])
+def test_to_int(value, expected):
+    assert to_int(value) == expected
+
+@pytest.mark.parametrize("value", [12.5, "12.5", "n/a", [1], float("nan")])
+def test_to_int_rejects_non_integers(value):
+    with pytest.raises(ValueError):
+        to_int(value)
+
+def test_coerce():
+    assert coerce("", "int64") is None and coerce(None, "string") is None
+    assert coerce("3.5", "float64") == 3.5
+    assert coerce({"a": 1}, "string") == '{"a": 1}'
+    assert coerce("True", "bool") is True
+    with pytest.raises(ValueError):
+        coerce("n/a", "float64")
+
+def test_table_writer_widens_instead_of_dropping(tmp_path):
+    path = tmp_path / "t.csv"
+    table = TableWriter(str(path), [("name", "string"), ("units", "int64"), ("price", "float64")])
+    table.write({"name": "a", "units": "12.0", "price": 1})
+    table.write({"name": "b", "units": 2.5, "price": "free"})
+    table.write({"name": "c", "units": "n/a", "price": None})
+    table.close()
+    with open(path, newline="") as f:
+        rows = list(csv.reader(f))
+    assert rows == [["name", "units", "price"], ["a", "12.0", "1.0"], ["b", "2.5", "free"], ["c", "n/a", ""]]
+    assert table.columns == [("name", "string"), ("units", "string"), ("price", "string")]
+    assert TABLES["licenses"][8] == ("ActiveUnits", "int64")   # module schemas are not widened
+
+def test_columnar_export_of_collected_data(tmp_path):
+    records = [{
+        "company": {"id": "sub-1", "text": "Contoso"},
+        "customer_profile": [{"Id": "cust-1", "CompanyName": "Contoso", "RelationshipToPartner": "0"}],
+        "licenses": {"Licenses": [{"LicenseId": "l1", "TotalUnits": "10.0", "ConsumedUnits": 4, "AssignedUsers": ["a"]}]},
+        "offers": [{"product_type": "OnlineServicesNCE", "offers": {"items": [{"Id": "o1", "Name": "E3"}]}}],
+    }]
+    with ColumnarExporter(str(tmp_path / "out")) as exporter:
+        for record in records:
+            exporter.add(record)
+    assert {name: table.count for name, table in exporter.tables.items()} == {"companies": 1, "licenses": 1, "offers": 1}
+    with open(tmp_path / "out" / "licenses.csv", newline="") as f:
+        row = next(csv.DictReader(f))
+    assert (row["TotalUnits"], row["ConsumedUnits"], row["assigned_users"]) == ("10", "4", "1")
+
+def test_parquet_needs_pyarrow(tmp_path):
+    if importlib.util.find_spec("pyarrow") is not None:
+        pytest.skip("pyarrow is installed")
+    with pytest.raises(ImportError, match="pyarrow is required"):
+        ColumnarExporter(str(tmp_path / "out"), "parquet")
@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+
+from hybr_client import Flow, HybrClient, Step
+
+MAPPED_COMPANIES = "/api/integrations/{{appId}}/admin/service/billing/csp/companies/getCspMappedCompanies"
+
+def test_flow_passes_fields_between_steps():
+    flow = Flow([
+        Step("total", lambda double, triple: double + triple, needs=["double", "triple"]),
+        Step("double", lambda x: x * 2, needs=["x"]),
+        Step("triple", lambda x: x * 3, needs=["x"]),
+    ])
+    assert flow.inputs == {"x"}
+    for workers in (1, 3):
+        assert flow.run(workers=workers, x=2) == {"x": 2, "double": 4, "triple": 6, "total": 10}
+
+def test_flow_skips_steps_after_a_missing_result():
+    calls = []
+    flow = Flow([
+        Step("profile", lambda x: None, needs=["x"]),
+        Step("licenses", lambda profile: calls.append(profile), needs=["profile"]),
+    ])
+    assert flow.run(x=1) == {"x": 1, "profile": None, "licenses": None}
+    assert calls == []
+
+def test_flow_rejects_bad_graphs():
+    with pytest.raises(ValueError, match="cycle"):
+        Flow([Step("a", lambda b: b, needs=["b"]), Step("b", lambda a: a, needs=["a"])])
+    with pytest.raises(ValueError, match="unique"):
+        Flow([Step("a", lambda x: x, needs=["x"]), Step("a", lambda x: x, needs=["x"])])
+    with pytest.raises(KeyError):
+        Flow([Step("a", lambda x: x, needs=["x"])]).run()
+
+def concurrent_requests(client, url, count=6):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def fetch(i):
+        barrier.wait()
+        results[i] = client.make_request(url)
+
+    threads = [threading.Thread(target=fetch, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_identical_gets_are_coalesced(make_portal):
+    portal = make_portal(latency=0.3)
+    client = HybrClient(portal.base_url, "test", "u", "p", pool_size=8, cache_size=0)
+    results = concurrent_requests(client, client.build_url(MAPPED_COMPANIES))
+    assert portal.stats["requests"] == 1
+    assert client.coalesced_requests == 5
+    assert client.metrics.summary()[MAPPED_COMPANIES]["coalesced"] == 5
+    assert all(result == results[0] for result in results) and len(results[0]) == 12
+    # Every caller decodes its own copy
+    assert len({id(result) for result in results}) == len(results)
+
+def test_coalesced_callers_share_the_error(make_portal):
+    portal = make_portal(latency=0.3)
+    client = HybrClient(portal.base_url, "test", "u", "p", pool_size=8, cache_size=0, max_retries=0)
+    results = concurrent_requests(client, portal.base_url + "/api/integrations/test/admin/service/missing")
+    assert results == [None] * 6
+    assert portal.stats["requests"] == 1
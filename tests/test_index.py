@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from conftest import load_json, run_script
+from csp_export import CspDataWriter
+from csp_index import ExportIndex, build_index, index_path_for
+
+def make_record(i):
+    return {
+        "company": {"id": f"sub-{i}", "text": f"Contoso {i} é"},
+        "customer_profile": [{"Id": f"cust-{i}", "TenantId": f"tenant-{i}", "Domain": f"Contoso{i}.onmicrosoft.com"}],
+        "licenses": {"Licenses": [{"LicenseId": f"lic-{i}-{n}", "TotalUnits": n} for n in range(2)]},
+        "offers": [],
+    }
+
+RECORDS = [make_record(i) for i in range(5)]
+
+def write_export(path, records=RECORDS):
+    with CspDataWriter(str(path)) as writer:
+        for record in records:
+            writer.write(record)
+    return str(path)
+
+@pytest.mark.parametrize("name", ["csp_data.json", "csp_data.jsonl"])
+def test_lookups(tmp_path, name):
+    export = write_export(tmp_path / name)
+    assert build_index(export, batch_size=2) == len(RECORDS)
+    with ExportIndex(export) as index:
+        assert len(index) == len(RECORDS)
+        assert index.company("sub-3") == RECORDS[3]
+        assert index.customer("cust-1") == RECORDS[1]
+        assert index.tenant("tenant-4") == RECORDS[4]
+        assert index.domain("CONTOSO2.onmicrosoft.com") == RECORDS[2]
+        record, lic = index.license("lic-0-1")
+        assert record == RECORDS[0] and lic == {"LicenseId": "lic-0-1", "TotalUnits": 1}
+        assert index.company("sub-missing") is None
+        assert index.license("lic-missing") is None
+        with pytest.raises(ValueError):
+            index.find("reseller", "x")
+
+def test_missing_index(tmp_path):
+    export = write_export(tmp_path / "csp_data.json")
+    with pytest.raises(FileNotFoundError):
+        ExportIndex(export)
+
+def test_stale_index(tmp_path):
+    export = write_export(tmp_path / "csp_data.json")
+    build_index(export)
+    write_export(export, RECORDS[:2])
+    stat = os.stat(export)
+    os.utime(export, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    with pytest.raises(ValueError):
+        ExportIndex(export)
+
+def test_compressed_export_rejected(tmp_path):
+    export = write_export(tmp_path / "csp_data.json.gz")
+    with pytest.raises(ValueError):
+        build_index(export)
+
+def test_build_index_after_collection(portal, tmp_path):
+    run_script(portal, "--collect", "--build-index", cwd=tmp_path)
+    export = str(tmp_path / "csp_data.json")
+    assert os.path.exists(index_path_for(export))
+    records = load_json(export)
+    with ExportIndex(export) as index:
+        assert len(index) == len(records)
+        assert index.company(records[-1]["company"]["id"]) == records[-1]
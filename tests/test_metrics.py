@@ -0,0 +1,82 @@
+import json
+
+from conftest import load_json, portal_stats, run_script
+from hybr_client import RequestMetrics
+
+LICENSES = "/api/integrations/{{appId}}/admin/service/billing/csp/licenses/getCustomerLicenses/{{customer_id}}"
+
+def sample_metrics():
+    metrics = RequestMetrics()
+    metrics.add_template(LICENSES)
+    for i in range(1, 101):
+        metrics.record_request(LICENSES, 200, 10, i / 1000)
+    metrics.record_request(LICENSES, 429, 0, 0.5)
+    metrics.record_request(LICENSES, None, 0, 1.0)
+    metrics.record_decode(LICENSES, 0.002)
+    metrics.record_event(LICENSES, "cache_hits")
+    return metrics
+
+def test_urls_are_grouped_by_template():
+    metrics = RequestMetrics()
+    metrics.add_template(LICENSES)
+    url = "https://portal/api/integrations/app/admin/service/billing/csp/licenses/getCustomerLicenses/c-1?page=2"
+    assert metrics.template_for(url) == LICENSES
+    assert metrics.template_for("https://portal/elsewhere") == "/elsewhere"
+
+def test_summary():
+    entry = sample_metrics().summary()[LICENSES]
+    assert entry["count"] == 102
+    assert entry["errors"] == 2
+    assert entry["statuses"] == {"200": 100, "429": 1, "error": 1}
+    assert entry["bytes"] == 1000
+    assert entry["cache_hits"] == 1 and entry["coalesced"] == 0
+    assert entry["latency_ms"]["p50"] == 51.0
+    assert entry["latency_ms"]["p99"] == 500.0
+    assert entry["decode_ms"] == {"p50": 2.0, "p95": 2.0, "p99": 2.0}
+
+def test_samples_are_capped():
+    metrics = RequestMetrics(max_samples=10)
+    for i in range(1000):
+        metrics.record_request(LICENSES, 200, 0, 0.001)
+    assert metrics.summary()[LICENSES]["count"] == 1000
+    assert len(metrics._endpoints[LICENSES]["latency"]) == 10
+
+def test_prometheus_text():
+    text = sample_metrics().to_prometheus()
+    assert f'hybr_requests_total{{endpoint="{LICENSES}",status="429"}} 1' in text
+    assert f'hybr_request_errors_total{{endpoint="{LICENSES}"}} 2' in text
+    assert f'hybr_request_latency_seconds{{endpoint="{LICENSES}",quantile="0.5"}} 0.051' in text
+    assert f'hybr_request_latency_seconds_count{{endpoint="{LICENSES}"}} 102' in text
+    assert "# TYPE hybr_json_decode_seconds summary" in text
+
+def test_write(tmp_path):
+    metrics = sample_metrics()
+    metrics.write(str(tmp_path / "metrics.json"))
+    metrics.write(str(tmp_path / "metrics.prom"))
+    assert load_json(tmp_path / "metrics.json") == json.loads(json.dumps(metrics.summary()))
+    assert (tmp_path / "metrics.prom").read_text() == metrics.to_prometheus()
+
+def test_collection_writes_metrics(make_portal, tmp_path):
+    portal = make_portal(throttle_rate=0.1, retry_after=0.01)
+    proc = run_script(portal, "--collect", "--cache-size", "0", "--metrics-output", "metrics.json", cwd=tmp_path)
+    assert "Requests per endpoint" in proc.stdout
+    summary = load_json(tmp_path / "metrics.json")
+    served = portal_stats(portal)
+    assert sum(entry["count"] for entry in summary.values()) == served["requests"]
+    statuses = {}
+    for entry in summary.values():
+        for status, n in entry["statuses"].items():
+            statuses[status] = statuses.get(status, 0) + n
+    assert statuses == served["statuses"]
+    assert summary[LICENSES]["count"] >= 12
+
+def test_merge_combines_counts_and_samples():
+    merged = RequestMetrics()
+    for _ in range(2):
+        merged.merge(json.loads(json.dumps(sample_metrics().summary(samples=True))))
+    entry = merged.summary()[LICENSES]
+    assert entry["count"] == 204
+    assert entry["statuses"] == {"200": 200, "429": 2, "error": 2}
+    assert entry["bytes"] == 2000 and entry["cache_hits"] == 2
+    assert entry["latency_ms"]["p50"] == 51.0
+    assert "latency_samples_s" not in entry
@@ -0,0 +1,87 @@
+import argparse
+import gzip
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from conftest import portal_stats
+from mock_portal import SyntheticData
+from run_benchmarks import compare, run_scenario, scenarios
+
+SERVICE = "/api/integrations/test/admin/service"
+
+def get(portal, path, headers=None):
+    """``(status, headers, raw body)`` for a GET against the portal."""
+    request = urllib.request.Request(portal.base_url + SERVICE + path, headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as res:
+            return res.status, res.headers, res.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+def test_synthetic_data_is_deterministic():
+    first, second = SyntheticData(5, connections=2), SyntheticData(5, connections=2)
+    assert [t["company"] for t in first.companies] == [t["company"] for t in second.companies]
+    assert first.offers(first.companies[0]) == second.offers(second.companies[0])
+    assert len({t["profile"]["CspPartnerConnectionId"] for t in first.companies}) == 2
+
+def test_endpoints_serve_the_export_shape(portal):
+    tenant = portal.data.companies[0]
+    status, _, body = get(portal, "/billing/csp/companies/getCspMappedCompanies")
+    assert status == 200 and json.loads(body) == [t["company"] for t in portal.data.companies]
+    customer_id = tenant["profile"]["Id"]
+    status, _, body = get(portal, f"/billing/csp/licenses/getCustomerLicenses/{customer_id}")
+    assert json.loads(body) == tenant["licenses"]
+    status, _, _ = get(portal, "/billing/csp/companies/unknownEndpoint")
+    assert status == 404
+
+def test_paging_is_capped(make_portal):
+    portal = make_portal(licenses=8, offers=30, max_page_size=5)
+    tenant = portal.data.companies[0]
+    path = f"/billing/csp/companies/getCspOffersBySubscriptionIdFromDb/{tenant['company']['id']}/{tenant['profile']['Id']}"
+    page = json.loads(get(portal, path + "?skip=10&take=50")[2])
+    assert page["items"] == portal.data.offers(tenant)[10:15]
+    assert page["filteredTotalCount"] == page["totalCount"] == 30
+    licenses = json.loads(get(portal, f"/billing/csp/licenses/getCustomerLicenses/{tenant['profile']['Id']}?page=2&page_Size=3")[2])
+    assert licenses["Licenses"] == tenant["licenses"]["Licenses"][3:6]
+
+def test_gzip_only_when_accepted(make_portal):
+    # Only bodies over 1 KiB are compressed
+    portal = make_portal(companies=40)
+    path = "/billing/csp/companies/getCspMappedCompanies"
+    _, headers, raw = get(portal, path)
+    assert headers.get("Content-Encoding") is None
+    _, headers, compressed = get(portal, path, {"Accept-Encoding": "gzip"})
+    assert headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(compressed) == raw and len(compressed) < len(raw)
+
+def test_fault_injection_and_stats(make_portal):
+    portal = make_portal(throttle_rate=0.3, error_rate=0.3, retry_after=7)
+    results = [get(portal, "/billing/csp/companies/getCspMappedCompanies") for _ in range(40)]
+    statuses = [status for status, _, _ in results]
+    assert {200, 429, 500} == set(statuses)
+    assert all(headers["Retry-After"] == "7" for status, headers, _ in results if status == 429)
+    stats = portal_stats(portal)
+    assert stats["requests"] == 40
+    assert stats["statuses"] == {str(s): statuses.count(s) for s in set(statuses)}
+    assert stats["bytes"] == sum(len(body) for _, _, body in results)
+
+def test_collect_scenario(portal):
+    args = argparse.Namespace(workers=[4], page_size=5, months="2025-01:2025-01")
+    name, extra_args, stdin = next(scenarios(args))
+    result = run_scenario(portal.base_url, name, extra_args, stdin)
+    assert result["requests"] >= 1 + 12 * 3
+    assert result["throttled"] == result["server_errors"] == 0
+    assert result["wall_s"] > 0 and result["bytes"] > 0
+
+@pytest.mark.parametrize("new, regressed", [
+    ({"wall_s": 1.1, "requests_per_s": 95, "peak_rss_mb": 50}, False),
+    ({"wall_s": 1.5, "requests_per_s": 100, "peak_rss_mb": 50}, True),
+    ({"wall_s": 1.0, "requests_per_s": 70, "peak_rss_mb": 50}, True),
+    ({"wall_s": 1.0, "requests_per_s": 100, "peak_rss_mb": 80}, True),
+])
+def test_compare(new, regressed):
+    baseline = {"results": {"collect-w1": {"wall_s": 1.0, "requests_per_s": 100, "peak_rss_mb": 50}}}
+    assert compare({"collect-w1": new, "collect-w8": new}, baseline, 0.15) is regressed
@@ -0,0 +1,69 @@
+import csp_offers
+from csp_offers import OfferCatalog, OfferIndex
+from hybr_client import HybrClient
+
+def setup(make_portal, **options):
+    portal = make_portal(offers=120, **options)
+    client = HybrClient(portal.base_url, "test", "u", "p", workers=4, cache_size=0, max_retries=0)
+    tenant = portal.data.companies[0]
+    return portal, client, tenant, (tenant["company"]["id"], tenant["profile"]["Id"])
+
+def server(client, ids, **filters):
+    return client.call("getCspOffersBySubscriptionIdFromDb", tenant_subscription_id=ids[0], customer_id=ids[1], **filters)
+
+def test_index_matches_the_endpoint(make_portal):
+    portal, client, tenant, ids = setup(make_portal)
+    catalog = OfferCatalog(client, page_size=25)
+    for filters in ({"productTypes": "OnlineServicesNCE"},
+                    {"productTypes": "License,OnlineServicesNCE", "segments": "Commercial,Education"},
+                    {"productTypes": "OnlineServicesNCE", "cspOfferCategories": "Security", "search": "visio"},
+                    {"productTypes": "License", "offerType": "Base", "skip": "3", "take": "4"}):
+        local = catalog.query(*ids, **filters)
+        expected = server(client, ids, **filters)
+        if "," in filters["productTypes"]:
+            # Items of several product types come back grouped by product type
+            local["items"].sort(key=lambda item: item["Id"])
+        assert local["items"] == expected["items"]
+        assert local["filteredTotalCount"] == expected["filteredTotalCount"]
+
+def test_builds_only_the_queried_product_types(make_portal):
+    portal, client, tenant, ids = setup(make_portal)
+    catalog = OfferCatalog(client)
+    catalog.query(*ids, productTypes="OnlineServicesNCE", segments="Commercial")
+    assert list(catalog._indexes) == [(*ids, "OnlineServicesNCE")]
+    served = portal.stats["requests"]
+    catalog.query(*ids, productTypes="OnlineServicesNCE", search="visio")
+    assert portal.stats["requests"] == served
+
+    res = catalog.query(*ids)
+    assert len(catalog._indexes) == len(catalog.product_types)
+    assert res["totalCount"] == res["filteredTotalCount"] == len(portal.data.offers(tenant))
+
+def test_unindexed_facet_falls_back_to_the_endpoint(make_portal, monkeypatch):
+    # As if the portal had renamed the field the segments facet is read from
+    monkeypatch.setitem(csp_offers.FACET_FIELDS, "segments", ["MarketSegment"])
+    portal, client, tenant, ids = setup(make_portal)
+    catalog = OfferCatalog(client)
+    filters = {"productTypes": "OnlineServicesNCE", "segments": "Commercial"}
+    res = catalog.query(*ids, **filters)
+    assert res["items"] and res == server(client, ids, **filters)
+    # Facets the index does have are still answered locally
+    served = portal.stats["requests"]
+    catalog.query(*ids, productTypes="OnlineServicesNCE", offerType="Base")
+    assert portal.stats["requests"] == served
+
+def test_unknown_product_type_goes_to_the_endpoint(make_portal):
+    portal, client, tenant, ids = setup(make_portal)
+    catalog = OfferCatalog(client)
+    assert catalog.query(*ids, productTypes="Marketplace")["items"] == []
+    assert catalog._indexes == {}
+
+def test_failed_build(make_portal):
+    portal, client, tenant, ids = setup(make_portal, error_rate=1.0)
+    assert OfferCatalog(client).query(*ids, productTypes="License") is None
+
+def test_offer_index_facets():
+    index = OfferIndex([{"Name": "Microsoft 365 E3", "Segment": "Commercial"}, {"Name": "Visio Plan 2"}], "License")
+    assert index.facet_counts("productTypes") == {"license": 2}
+    assert index.indexed("segments") and not index.indexed("offerType") and index.indexed("search")
+    assert index.query(search="vis")["items"] == [{"Name": "Visio Plan 2"}]
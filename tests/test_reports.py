@@ -0,0 +1,83 @@
+import json
+
+from conftest import run_script
+from hybr_client import HybrClient
+
+PERIODS = [(2025, 1), (2025, 2), (2025, 3)]
+
+def test_report_matrix_columns(portal):
+    with HybrClient(portal.base_url, "test", "u", "p", workers=4) as client:
+        result = client.report_matrix("topCustomersByRevenue", PERIODS, numberOfItems=2)
+    assert result["failed_cells"] == []
+    assert result["rows"] == 3 * 3 * 2   # months x currencies listed by the portal x items
+    columns = result["columns"]
+    assert all(len(values) == result["rows"] for values in columns.values())
+    assert columns["currency"][:2] == ["USD", "USD"] and columns["Currency"] == columns["currency"]
+    assert columns["month"][:6] == [1] * 6
+
+def test_failed_currency_lookup_is_a_failed_cell(portal, monkeypatch):
+    with HybrClient(portal.base_url, "test", "u", "p", workers=2) as client:
+        lookup = client.available_currency_symbols
+
+        def flaky(month, year, **inputs):
+            return None if month == 2 else lookup(month=month, year=year, **inputs)
+
+        monkeypatch.setattr(client, "available_currency_symbols", flaky)
+        result = client.report_matrix("topCustomersByRevenue", PERIODS, numberOfItems=1)
+    assert result["failed_cells"] == [{"year": 2025, "month": 2, "currency": None, "parentSubscriptionId": None}]
+    assert sorted(set(result["columns"]["month"])) == [1, 3]
+
+def test_report_matrix_cli(portal, tmp_path):
+    run_script(portal, "--report-matrix", "topProductsByRevenue,monthlyResellerMargin", "--months", "2024-12:2025-01",
+               "--currencies", "USD", "--workers", "3", cwd=tmp_path)
+    with open(tmp_path / "report_matrix.json") as f:
+        results = json.load(f)
+    assert set(results) == {"topProductsByRevenue", "monthlyResellerMargin"}
+    assert results["monthlyResellerMargin"]["columns"]["year"] == [2024] * 25 + [2025] * 25
+
+def test_reports_without_a_parent_input_ignore_parents(portal):
+    with HybrClient(portal.base_url, "test", "u", "p", workers=2) as client:
+        result = client.report_matrix("estimatedCostByServiceTypePerCustomer", PERIODS[:2], None, ["p-1", "p-2"],
+                                      customerSubscriptionId="sub-1")
+    assert result["failed_cells"] == []
+    assert result["columns"]["month"] == [1] * 25 + [2] * 25
+    assert set(result["columns"]["parentSubscriptionId"]) == {None}
+
+def test_rejected_inputs_are_failed_cells(portal):
+    with HybrClient(portal.base_url, "test", "u", "p") as client:
+        result = client.report_matrix("estimatedCostByServiceTypePerCustomer", PERIODS[:2])
+    assert result["rows"] == 0
+    assert [(cell["month"], "missing required input customerSubscriptionId" in cell["error"])
+            for cell in result["failed_cells"]] == [(1, True), (2, True)]
+
+def test_all_reports_with_parent_subscription_ids(portal, tmp_path):
+    proc = run_script(portal, "--report-matrix", "all", "--months", "2025-01:2025-01", "--currencies", "USD",
+                      "--parent-subscription-ids", "p-1,p-2", cwd=tmp_path)
+    with open(tmp_path / "report_matrix.json") as f:
+        results = json.load(f)
+    assert len(results) == 7
+    assert results["monthlyResellerMargin"]["columns"]["parentSubscriptionId"] == ["p-1"] * 25 + ["p-2"] * 25
+    # Without --tenant-subscription-id the per-customer reports cannot be fetched, but do not stop the run
+    for report in ("monthlyProductsResellerMarginBySubscription", "estimatedCostByServiceTypePerCustomer"):
+        assert len(results[report]["failed_cells"]) == 1 and results[report]["rows"] == 0
+    assert proc.stdout.count("missing required input customerSubscriptionId") == 2
+
+    run_script(portal, "--report-matrix", "all", "--months", "2025-01:2025-01", "--currencies", "USD",
+               "--parent-subscription-ids", "p-1,p-2", "--tenant-subscription-id", "sub-1", cwd=tmp_path)
+    with open(tmp_path / "report_matrix.json") as f:
+        results = json.load(f)
+    assert all(result["failed_cells"] == [] for result in results.values())
+    assert results["estimatedCostByServiceTypePerCustomer"]["rows"] == 25
+
+def test_available_currencies(portal):
+    with HybrClient(portal.base_url, "test", "u", "p", max_retries=0) as client:
+        assert client.available_currencies(1, 2025) == ["USD", "EUR", "GBP"]
+        portal.error_rate = 1.0
+        assert client.available_currencies(2, 2025) is None
+
+def test_malformed_months_is_a_usage_error(portal, tmp_path):
+    for months in ("2025/01", "2025-13", "2025-03:2025-01", "2025-01:x"):
+        proc = run_script(portal, "--report-matrix", "monthlyResellerMargin", "--months", months, cwd=tmp_path, check=False)
+        assert proc.returncode == 2
+        assert "error: --months" in proc.stderr and "Traceback" not in proc.stderr
+    assert not (tmp_path / "report_matrix.json").exists()
@@ -0,0 +1,51 @@
+import socket
+import time
+import urllib.error
+
+from conftest import portal_stats
+from hybr_client import HybrClient, RetryPolicy, is_transient_error, parse_retry_after
+
+def attempts(client):
+    return sum(endpoint["count"] for endpoint in client.metrics.summary().values())
+
+def test_delay_is_clamped():
+    policy = RetryPolicy(backoff=1, max_backoff=5)
+    assert policy.delay(0, retry_after=3) == 3
+    assert policy.delay(0, retry_after=3600) == 5
+    assert all(0 <= policy.delay(10) <= 5 for _ in range(100))
+
+def test_parse_retry_after():
+    assert parse_retry_after("2.5") == 2.5
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None and parse_retry_after(None) is None
+
+def test_transient_errors():
+    assert is_transient_error(urllib.error.URLError(ConnectionRefusedError()))
+    assert is_transient_error(urllib.error.URLError(TimeoutError()))
+    assert is_transient_error(urllib.error.URLError(socket.gaierror(socket.EAI_AGAIN, "try again")))
+    assert not is_transient_error(urllib.error.URLError(socket.gaierror(socket.EAI_NONAME, "not known")))
+    assert not is_transient_error(urllib.error.URLError("unknown url type: ftp"))
+
+def test_unknown_url_type_is_not_retried():
+    client = HybrClient("ftp://portal.example", "test", "u", "p")
+    client.retry_policy = RetryPolicy(max_retries=3, backoff=0.01)
+    assert client.available_currency_symbols(month=1, year=2025) is None
+    assert attempts(client) == 1
+
+def test_refused_connection_is_retried():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    client = HybrClient(f"http://127.0.0.1:{port}", "test", "u", "p")
+    client.retry_policy = RetryPolicy(max_retries=2, backoff=0.01)
+    assert client.available_currency_symbols(month=1, year=2025) is None
+    assert attempts(client) == 3
+
+def test_long_retry_after_is_capped(make_portal):
+    portal = make_portal(throttle_rate=1.0, retry_after=120)
+    client = HybrClient(portal.base_url, "test", "u", "p")
+    client.retry_policy = RetryPolicy(max_retries=2, max_backoff=0.05)
+    started = time.monotonic()
+    assert client.available_currency_symbols(month=1, year=2025) is None
+    assert time.monotonic() - started < 5
+    assert portal_stats(portal)["statuses"]["429"] == 3
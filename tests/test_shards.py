@@ -0,0 +1,45 @@
+import json
+
+from conftest import load_json, portal_stats, run_script
+
+def by_company(records):
+    return {record["company"]["id"]: record for record in records}
+
+def test_sharded_collection_matches_a_single_run(portal, tmp_path):
+    run_script(portal, "--collect", "--output", "single.json", cwd=tmp_path)
+    proc = run_script(portal, "--processes", "2", "--output", "sharded.json", cwd=tmp_path)
+    assert "Merged 12 companies from 2 shard outputs" in proc.stdout
+    assert by_company(load_json(tmp_path / "sharded.json")) == by_company(load_json(tmp_path / "single.json"))
+    shards = [load_json(tmp_path / f"sharded.shard-{i}-of-2.json") for i in range(2)]
+    assert all(shards) and sum(map(len, shards)) == 12
+
+def test_files_get_per_shard_names(portal, tmp_path):
+    # A company whose licenses cannot be fetched stays in its shard's checkpoint
+    del portal.data.by_customer[portal.data.companies[0]["profile"]["Id"]]
+    proc = run_script(portal, "--processes", "2", "--cache-file", "cache.db", "--checkpoint", "ckpt.db",
+                      "--metrics-output", "metrics.prom", cwd=tmp_path)
+    assert "1 companies were incomplete" in proc.stdout
+    files = {path.name for path in tmp_path.iterdir()}
+    assert {"cache.shard-0-of-2.db", "cache.shard-1-of-2.db"} <= files
+    assert "cache.db" not in files and "ckpt.db" not in files
+    assert len(files & {"ckpt.shard-0-of-2.db", "ckpt.shard-1-of-2.db"}) == 1
+
+    shard_metrics = [load_json(tmp_path / f"metrics.shard-{i}-of-2.json") for i in range(2)]
+    assert all("latency_samples_s" in entry for metrics in shard_metrics for entry in metrics.values())
+    served = portal_stats(portal)["requests"]
+    assert sum(entry["count"] for metrics in shard_metrics for entry in metrics.values()) == served
+    merged = [line.split() for line in (tmp_path / "metrics.prom").read_text().splitlines()
+              if line.startswith("hybr_requests_total{")]
+    assert sum(int(value) for _, value in merged) == served
+
+def test_sharded_incremental_delta(portal, tmp_path):
+    run_script(portal, "--processes", "2", "--output", "out.json", cwd=tmp_path)
+    tenant = portal.data.companies[3]
+    tenant["licenses"]["Licenses"][0]["TotalUnits"] += 1000
+    proc = run_script(portal, "--processes", "2", "--output", "out.json", "--incremental", "--ttl", "0",
+                      "--delta", "changes.jsonl", cwd=tmp_path)
+    assert "Delta written to changes.jsonl" in proc.stdout
+    entries = [json.loads(line) for line in (tmp_path / "changes.jsonl").read_text().splitlines()]
+    assert [(entry["op"], entry["company_id"]) for entry in entries] == [("update", tenant["company"]["id"])]
+    shard_deltas = [(tmp_path / f"changes.shard-{i}-of-2.jsonl").read_text() for i in range(2)]
+    assert sorted(shard_deltas)[0] == ""